@@ -1,6 +1,41 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from .models import *
+from .pagination import EstimatedCountPaginator
+from .snapshots import refresh_snapshots
+from .tallies import capture_participations, record_participation_changes
+
+
+def count_subquery(model, field):
+    """
+    Annotation that counts the rows of ``model`` whose ``field`` points to
+    each row of the changelist.
+
+    A correlated subquery per counter avoids the row multiplication of
+    joining several relations, so every changelist page costs the same
+    number of queries whatever its size.
+    """
+    total = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')[:1]
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def selected_options_prefetch():
+    return Prefetch('selected_options', queryset=AnswerOption.objects.select_related('option').order_by('id'))
+
+
+class EstimatedCountAdminMixin:
+    """
+    Changelist settings for the huge tables (participations, answers and
+    selected options): the paginator uses estimated or capped counts and the
+    unfiltered total is not counted, so no page runs a full ``COUNT(*)``.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 # Configuración para User con los nuevos campos
@@ -9,6 +44,7 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('role', 'register_date', 'is_active', 'is_staff')
     search_fields = ('username', 'email')
     ordering = ('-register_date',)
+    list_select_related = ('role',)
     
     # Añadir los nuevos campos a los fieldsets
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -36,10 +72,15 @@ class QuestionAdmin(admin.ModelAdmin):
     list_filter = ('type', 'survey')
     search_fields = ('content', 'survey__title')
     inlines = [OptionInline]
+    list_select_related = ('survey',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(options_total=count_subquery(Option, 'question'))
     
     def get_options_count(self, obj):
-        return obj.options.count()
+        return obj.options_total
     get_options_count.short_description = 'Nº Opciones'
+    get_options_count.admin_order_field = 'options_total'
 
 
 # Inline para las preguntas de una encuesta
@@ -69,14 +110,23 @@ class SurveyAdmin(admin.ModelAdmin):
     list_filter = ('client',)
     search_fields = ('title', 'description', 'client__username')
     inlines = [QuestionInline, SurveyInstanceInline]
+    list_select_related = ('client',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            questions_total=count_subquery(Question, 'survey'),
+            instances_total=count_subquery(SurveyInstance, 'survey'),
+        )
     
     def get_questions_count(self, obj):
-        return obj.questions.count()
+        return obj.questions_total
     get_questions_count.short_description = 'Nº Preguntas'
+    get_questions_count.admin_order_field = 'questions_total'
     
     def get_instances_count(self, obj):
-        return obj.instances.count()
+        return obj.instances_total
     get_instances_count.short_description = 'Nº Instancias'
+    get_instances_count.admin_order_field = 'instances_total'
 
 
 # Inline para las participaciones de una instancia
@@ -87,6 +137,9 @@ class ParticipationInline(admin.TabularInline):
     readonly_fields = ('date',)
     show_change_link = True
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'instance__survey')
+
 
 # Configuración para SurveyInstance
 class SurveyInstanceAdmin(admin.ModelAdmin):
@@ -95,14 +148,30 @@ class SurveyInstanceAdmin(admin.ModelAdmin):
     search_fields = ('survey__title',)
     readonly_fields = ('creation_date',)
     inlines = [ParticipationInline]
+    list_select_related = ('survey',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(participations_total=count_subquery(Participation, 'instance'))
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not Participation:
+            return super().save_formset(request, form, formset, change)
+        changed = [inline.instance.pk for inline in formset.initial_forms if inline.has_changed()]
+        before = capture_participations(changed)
+        super().save_formset(request, form, formset, change)
+        after = capture_participations(changed + [participation.pk for participation in formset.new_objects])
+        # Las participaciones borradas ya se descontaron con la señal pre_delete
+        record_participation_changes({key: value for key, value in before.items() if key in after}, after)
+        refresh_snapshots(list(after))
 
     def get_state(self, obj):
         return obj.state
     get_state.short_description = 'State'
     
     def get_participations_count(self, obj):
-        return obj.participations.count()
+        return obj.participations_total
     get_participations_count.short_description = 'Nº Participaciones'
+    get_participations_count.admin_order_field = 'participations_total'
 
 
 # Inline para AnswerOption dentro de Answer
@@ -113,6 +182,9 @@ class AnswerOptionInline(admin.TabularInline):
     readonly_fields = ('get_option_content',)
     verbose_name = 'Opción seleccionada'
     verbose_name_plural = 'Opciones seleccionadas'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('option')
     
     def get_option_content(self, obj):
         return obj.option.content if obj.option else '-'
@@ -125,6 +197,13 @@ class AnswerInline(admin.TabularInline):
     extra = 0
     fields = ('question', 'get_question_type', 'option', 'content', 'get_multiple_options', 'date')
     readonly_fields = ('date', 'get_question_type', 'get_multiple_options')
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related('question', 'option')
+            .prefetch_related(selected_options_prefetch())
+        )
     
     def get_question_type(self, obj):
         return obj.question.type
@@ -137,7 +216,7 @@ class AnswerInline(admin.TabularInline):
         if obj.question.type == 'multiple':
             # Usar el related_name correcto: selected_options
             options = obj.selected_options.all()
-            if options.exists():
+            if options:
                 return ', '.join([opt.option.content for opt in options])
             return 'Sin opciones seleccionadas'
                 
@@ -149,25 +228,46 @@ class AnswerInline(admin.TabularInline):
 
 
 # Configuración para Participation
-class ParticipationAdmin(admin.ModelAdmin):
+class ParticipationAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'instance', 'date', 'state', 'get_answers_count')
     list_filter = ('state', 'date', 'instance__survey')
     search_fields = ('user__username', 'instance__survey__title')
     readonly_fields = ('date',)
     inlines = [AnswerInline]
+    list_select_related = ('user', 'instance__survey')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(answers_total=count_subquery(Answer, 'participation'))
     
     def get_answers_count(self, obj):
-        return obj.answers.count()
+        return obj.answers_total
     get_answers_count.short_description = 'Nº Respuestas'
+    get_answers_count.admin_order_field = 'answers_total'
+    
+    def save_model(self, request, obj, form, change):
+        # Contribución a los recuentos antes de guardar el estado y las respuestas en línea
+        obj._tallies_before = capture_participations([obj.pk]) if change else {}
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        participation = form.instance
+        record_participation_changes(participation._tallies_before, capture_participations([participation.pk]))
+        # Las respuestas o el estado pueden haber cambiado: rehacer la instantánea
+        refresh_snapshots([participation.pk])
 
 
 # Configuración para Answer
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('participation', 'question', 'get_question_type', 'option', 'get_content_preview', 'get_multiple_options', 'date')
     list_filter = ('date', 'participation__instance__survey', 'question__type')
     search_fields = ('participation__user__username', 'question__content', 'content')
     readonly_fields = ('date',)
     inlines = [AnswerOptionInline]
+    list_select_related = ('participation__user', 'participation__instance__survey', 'question', 'option')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(selected_options_prefetch())
     
     def get_content_preview(self, obj):
         if obj.content:
@@ -188,14 +288,41 @@ class AnswerAdmin(admin.ModelAdmin):
             return 'Sin opciones'
         return '-'
     get_multiple_options.short_description = 'Opciones múltiples'
+    
+    def save_model(self, request, obj, form, change):
+        # La respuesta puede cambiar de participación: se miden la anterior y la nueva
+        participation_ids = {obj.participation_id}
+        if change:
+            participation_ids.update(Answer.objects.filter(pk=obj.pk).values_list('participation_id', flat=True))
+        obj._tallies_before = capture_participations(participation_ids)
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        before = form.instance._tallies_before
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots(list(before))
+    
+    def delete_model(self, request, obj):
+        before = capture_participations([obj.participation_id])
+        super().delete_model(request, obj)
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots([obj.participation_id])
+    
+    def delete_queryset(self, request, queryset):
+        before = capture_participations(set(queryset.values_list('participation_id', flat=True)))
+        super().delete_queryset(request, queryset)
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots(list(before))
 
 
 # Configuración para AnswerOption (modelo independiente)
-class AnswerOptionAdmin(admin.ModelAdmin):
+class AnswerOptionAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('answer', 'option', 'get_question', 'get_participation', 'get_option_content')
     list_filter = ('answer__question__type', 'answer__participation__instance__survey', 'answer__date')
     search_fields = ('answer__participation__user__username', 'option__content', 'answer__question__content')
     raw_id_fields = ('answer', 'option')  # Para mejor rendimiento con muchos registros
+    list_select_related = ('answer__question', 'answer__participation__user', 'option')
     
     def get_question(self, obj):
         return obj.answer.question.content[:50] + '...' if len(obj.answer.question.content) > 50 else obj.answer.question.content
@@ -209,6 +336,30 @@ class AnswerOptionAdmin(admin.ModelAdmin):
     def get_option_content(self, obj):
         return obj.option.content
     get_option_content.short_description = 'Contenido de la opción'
+    
+    def save_model(self, request, obj, form, change):
+        # La selección puede cambiar de respuesta: se miden la participación anterior y la nueva
+        participation_ids = {obj.answer.participation_id}
+        if change:
+            participation_ids.update(
+                AnswerOption.objects.filter(pk=obj.pk).values_list('answer__participation_id', flat=True)
+            )
+        before = capture_participations(participation_ids)
+        super().save_model(request, obj, form, change)
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots(list(before))
+    
+    def delete_model(self, request, obj):
+        before = capture_participations([obj.answer.participation_id])
+        super().delete_model(request, obj)
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots([obj.answer.participation_id])
+    
+    def delete_queryset(self, request, queryset):
+        before = capture_participations(set(queryset.values_list('answer__participation_id', flat=True)))
+        super().delete_queryset(request, queryset)
+        record_participation_changes(before, capture_participations(list(before)))
+        refresh_snapshots(list(before))
 
 
 # Configuración para Report
@@ -217,6 +368,7 @@ class ReportAdmin(admin.ModelAdmin):
     list_filter = ('date', 'instance__survey')
     search_fields = ('instance__survey__title', 'summary')
     readonly_fields = ('date',)
+    list_select_related = ('instance__survey',)
     
     def get_summary_preview(self, obj):
         return obj.summary[:100] + '...' if len(obj.summary) > 100 else obj.summary
@@ -228,17 +380,30 @@ class OptionAdmin(admin.ModelAdmin):
     list_display = ('content', 'question', 'get_question_survey', 'get_times_selected')
     list_filter = ('question__survey', 'question__type')
     search_fields = ('content', 'question__content')
+    list_select_related = ('question__survey',)
+    
+    def get_queryset(self, request):
+        # Veces que se ha seleccionado cada opción, en preguntas simples y múltiples
+        return super().get_queryset(request).annotate(
+            times_selected=count_subquery(Answer, 'option') + count_subquery(AnswerOption, 'option')
+        )
     
     def get_question_survey(self, obj):
         return obj.question.survey.title
     get_question_survey.short_description = 'Encuesta'
     
     def get_times_selected(self, obj):
-        # Contar cuántas veces se ha seleccionado esta opción
-        single_selections = Answer.objects.filter(option=obj).count()
-        multiple_selections = AnswerOption.objects.filter(option=obj).count()
-        return single_selections + multiple_selections
+        return obj.times_selected
     get_times_selected.short_description = 'Veces seleccionada'
+    get_times_selected.admin_order_field = 'times_selected'
+
+
+# Configuración para la bandeja de salida de correos
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'state', 'attempts', 'created_at', 'next_attempt_at', 'sent_at')
+    list_filter = ('state', 'created_at')
+    search_fields = ('to', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'claimed_by')
 
 
 # Registrar todos los modelos con sus configuraciones
@@ -252,6 +417,7 @@ admin.site.register(Participation, ParticipationAdmin)
 admin.site.register(Answer, AnswerAdmin)
 admin.site.register(AnswerOption, AnswerOptionAdmin)
 admin.site.register(Report, ReportAdmin)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
 
 
 # Personalizar el header del admin
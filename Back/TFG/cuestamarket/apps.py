@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CuestamarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cuestamarket'
+
+    def ready(self):
+        from django.core.checks import register
+
+        from . import signals  # noqa: F401
+        from .backends.pool import check_pool_size
+
+        register(check_pool_size)
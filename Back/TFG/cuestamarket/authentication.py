@@ -1,4 +1,85 @@
+import copy
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Usuarios autenticados recientemente en este proceso: id -> (caducidad, usuario)
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+# Contadores de autenticación de este proceso
+_metrics_lock = threading.Lock()
+_metrics = {
+    'validations': 0, 'validation_seconds': 0.0, 'validation_seconds_max': 0.0,
+    'rejected': {}, 'token_users': 0, 'hydrations': 0, 'cache_hits': 0, 'db_loads': 0,
+}
+
+TOKEN_USER_CLAIMS = ('role', 'is_active', 'is_staff')
+
+
+def add_user_claims(token, user):
+    """
+    Embeds the role and the active and staff flags of a user in a token.
+
+    Claims added to a refresh token are copied to the access tokens derived
+    from it. Nothing is added when ``AUTH_TOKEN_CLAIMS`` is disabled.
+    """
+    if settings.AUTH_TOKEN_CLAIMS:
+        token['role'] = user.role.name if user.role else None
+        token['is_active'] = user.is_active
+        token['is_staff'] = user.is_staff
+    return token
+
+
+def _count(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def auth_metrics():
+    """
+    Returns the authentication counters of the current process.
+
+    Returns:
+        dict: Token validations and their duration, rejected tokens by
+        reason, token users served without the database, how many of them
+        had to be hydrated, and how often the full user came from the cache
+        or from the database.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics, rejected=dict(_metrics['rejected']))
+
+    validations = metrics['validations']
+    loads = metrics['cache_hits'] + metrics['db_loads']
+    return {
+        'validations': validations,
+        'validation_ms_avg': round(metrics['validation_seconds'] / validations * 1000, 3) if validations else 0,
+        'validation_ms_max': round(metrics['validation_seconds_max'] * 1000, 3),
+        'rejected': metrics['rejected'],
+        'token_users': metrics['token_users'],
+        'hydrations': metrics['hydrations'],
+        'hydration_rate': round(metrics['hydrations'] / metrics['token_users'], 4) if metrics['token_users'] else 0,
+        'cache_hits': metrics['cache_hits'],
+        'db_loads': metrics['db_loads'],
+        'db_load_rate': round(metrics['db_loads'] / loads, 4) if loads else 0,
+    }
+
+
+def forget_cached_user(user_id):
+    """
+    Drops a user from the authentication cache of the current process.
+    """
+    with _user_cache_lock:
+        _user_cache.pop(str(user_id), None)
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -9,10 +90,17 @@ class CookieJWTAuthentication(JWTAuthentication):
     request. If the token is valid, it returns the corresponding user and
     the validated token.
 
+    The user is loaded together with its role, so permission checks never
+    query the database, and is kept in a per-process cache for
+    ``AUTH_USER_CACHE_TTL`` seconds, so most authenticated requests do not
+    query the database at all.
+
     Methods:
         authenticate(request): Extracts and validates the access token
             from the request cookies. Returns a tuple of user and validated
             token if successful, or None if not.
+        get_user(validated_token): Returns the user of a validated token,
+            from the cache when possible.
     """
 
     def authenticate(self, request):
@@ -33,11 +121,177 @@ class CookieJWTAuthentication(JWTAuthentication):
 
             return None
 
+        start = time.perf_counter()
         try:
 
             validated_token = self.get_validated_token(token)
+
+        except InvalidToken as e:
+
+            self.reject(e)
+            return None
+
+        finally:
+
+            elapsed = time.perf_counter() - start
+            with _metrics_lock:
+                _metrics['validations'] += 1
+                _metrics['validation_seconds'] += elapsed
+                _metrics['validation_seconds_max'] = max(_metrics['validation_seconds_max'], elapsed)
+
+        # Los tokens válidos de usuarios inexistentes, inactivos o con la
+        # contraseña cambiada se tratan como anónimos. Cualquier otro error
+        # (por ejemplo, de la base de datos) se propaga.
+        try:
+
             return self.get_user(validated_token), validated_token
-        
-        except Exception:
 
+        except AuthenticationFailed as e:
+
+            self.reject(e)
             return None
+
+    def reject(self, error):
+        """
+        Counts a rejected token by the code of its error.
+        """
+        codes = error.get_codes()
+        code = codes if isinstance(codes, str) else codes.get('code', 'invalid')
+        with _metrics_lock:
+            _metrics['rejected'][code] = _metrics['rejected'].get(code, 0) + 1
+
+    def get_user(self, validated_token):
+        """
+        Returns the user of a validated token, with its role already loaded.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Returns:
+            User: The authenticated user. Every call returns its own copy,
+            so views can modify it without affecting the cache.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        ttl = settings.AUTH_USER_CACHE_TTL
+        if ttl:
+            with _user_cache_lock:
+                cached = _user_cache.get(str(user_id))
+            if cached and cached[0] > time.monotonic():
+                _count('cache_hits')
+                user = copy.copy(cached[1])
+                self.check_user(user, validated_token)
+                return user
+
+        _count('db_loads')
+
+        try:
+            user = self.user_model.objects.select_related('role').get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        self.check_user(user, validated_token)
+        if ttl:
+            with _user_cache_lock:
+                _user_cache[str(user_id)] = (time.monotonic() + ttl, copy.copy(user))
+        return user
+
+    def check_user(self, user, validated_token):
+        """
+        Applies the same checks as simplejwt to a loaded user.
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+
+class TokenUser:
+    """
+    A user built from the claims of a validated access token.
+
+    It exposes the id, the role and the active and staff flags without
+    querying the database, which is enough for the permission checks of
+    read-only endpoints. Any other attribute hydrates the full ``User``
+    (from the per-process cache when possible) the first time it is read.
+
+    Attributes:
+        token (Token): The validated access token.
+        id (int): The id of the user.
+        role (SimpleNamespace): The role of the user, with its ``name``,
+            or None when the user has no role.
+        is_active (bool): Whether the user is active.
+        is_staff (bool): Whether the user is staff.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token, authentication):
+        self.token = token
+        self.id = self.pk = token[api_settings.USER_ID_CLAIM]
+        role = token['role']
+        self.role = SimpleNamespace(name=role) if role else None
+        self.is_active = token['is_active']
+        self.is_staff = token['is_staff']
+        self._authentication = authentication
+        self._user = None
+
+    @property
+    def user(self):
+        """
+        The full ``User`` of the token, loaded on first access.
+        """
+        if self._user is None:
+            _count('hydrations')
+            self._user = self._authentication.get_user(self.token)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __str__(self):
+        return f"TokenUser {self.id}"
+
+    def __eq__(self, other):
+        if isinstance(other, TokenUser):
+            return self.id == other.id
+        if isinstance(other, get_user_model()):
+            return other.pk == self.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class TokenUserAuthentication(CookieJWTAuthentication):
+    """
+    Stateless variant of ``CookieJWTAuthentication`` for read-only endpoints.
+
+    Views opt in by listing it in their ``authentication_classes``. Access
+    tokens that carry the role and flag claims authenticate a ``TokenUser``
+    without touching the database; tokens without them (issued while
+    ``AUTH_TOKEN_CLAIMS`` was disabled) fall back to the full user.
+
+    Password changes and deactivations are only noticed when the user is
+    hydrated or the access token is refreshed, so views that modify data
+    must keep using ``CookieJWTAuthentication``.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token or any(
+            claim not in validated_token for claim in TOKEN_USER_CLAIMS
+        ):
+            return super().get_user(validated_token)
+
+        user = TokenUser(validated_token, CookieJWTAuthentication())
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        _count('token_users')
+        return user
@@ -0,0 +1,9 @@
+from django.db.backends.mysql import base
+
+from ..pool import PoolMetricsMixin
+
+
+class DatabaseWrapper(PoolMetricsMixin, base.DatabaseWrapper):
+    """
+    MySQL/MariaDB backend that records the connection pool metrics.
+    """
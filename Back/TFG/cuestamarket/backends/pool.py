@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.checks import Warning
+
+# Connections kept free for the report worker, migrations and admin sessions.
+RESERVED_CONNECTIONS = 5
+
+_lock = threading.Lock()
+_open_connections = weakref.WeakSet()
+_busy_threads = set()
+_totals = {'opened': 0, 'closed': 0, 'connect_seconds': 0.0, 'connect_seconds_max': 0.0}
+
+
+class PoolMetricsMixin:
+    """
+    Database wrapper mixin that records the connections of the process.
+
+    Django keeps one connection per thread. With ``CONN_MAX_AGE`` it stays
+    open between requests, so every gunicorn thread acts as a slot of a pool
+    whose size is ``workers * threads``. The time spent opening connections
+    is the wait a request pays when no persistent connection is available.
+    """
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _open_connections.add(self)
+            _totals['opened'] += 1
+            _totals['connect_seconds'] += elapsed
+            _totals['connect_seconds_max'] = max(_totals['connect_seconds_max'], elapsed)
+
+    def close(self):
+        was_open = self.connection is not None
+        super().close()
+        if was_open and self.connection is None:
+            with _lock:
+                _open_connections.discard(self)
+                _totals['closed'] += 1
+
+
+def mark_thread_busy():
+    with _lock:
+        _busy_threads.add(threading.get_ident())
+
+
+def mark_thread_idle():
+    with _lock:
+        _busy_threads.discard(threading.get_ident())
+
+
+def pool_metrics():
+    """
+    Returns the connection metrics of the current process.
+
+    Each gunicorn worker is a separate process, so the numbers describe the
+    worker that served the request.
+
+    Returns:
+        dict: Open, in use and idle connections, totals and connection times.
+    """
+    with _lock:
+        connections = [connection for connection in _open_connections if connection.connection is not None]
+        in_use = sum(1 for connection in connections if connection._thread_ident in _busy_threads)
+        totals = dict(_totals)
+
+    database = settings.DATABASES['default']
+    opened = totals['opened']
+    return {
+        'pid': os.getpid(),
+        'vendor': connections[0].vendor if connections else None,
+        'pool_size': settings.DB_POOL_SIZE,
+        'threads_per_worker': settings.GUNICORN_THREADS,
+        'open': len(connections),
+        'in_use': in_use,
+        'idle': len(connections) - in_use,
+        'opened_total': opened,
+        'closed_total': totals['closed'],
+        'connect_wait_ms_avg': round(totals['connect_seconds'] / opened * 1000, 2) if opened else 0,
+        'connect_wait_ms_max': round(totals['connect_seconds_max'] * 1000, 2),
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'conn_health_checks': database.get('CONN_HEALTH_CHECKS', False),
+    }
+
+
+def check_pool_size(app_configs, **kwargs):
+    """
+    Warns when the gunicorn workers could open more persistent connections
+    than the database accepts.
+    """
+    available = settings.DB_MAX_CONNECTIONS - RESERVED_CONNECTIONS
+    if settings.DB_POOL_SIZE > available:
+        return [Warning(
+            f"GUNICORN_WORKERS * GUNICORN_THREADS = {settings.DB_POOL_SIZE} persistent connections "
+            f"exceed the {available} available with DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS}.",
+            hint='Reduce the gunicorn workers or threads, or raise max_connections in MariaDB.',
+            id='cuestamarket.W001',
+        )]
+    return []
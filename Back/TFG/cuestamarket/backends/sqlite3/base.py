@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PoolMetricsMixin
+
+
+class DatabaseWrapper(PoolMetricsMixin, base.DatabaseWrapper):
+    """
+    SQLite backend that records the connection pool metrics.
+    """
@@ -0,0 +1,162 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+CHART_CACHE_TIMEOUT = 24 * 60 * 60
+CHART_RENDER_TIMEOUT = 30
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ChartDataError(ValueError):
+    """
+    Raised when the data received cannot be plotted.
+    """
+
+
+class ChartTimeoutError(Exception):
+    """
+    Raised when the render pool does not return a chart within
+    ``CHART_RENDER_TIMEOUT`` seconds.
+    """
+
+
+def render_line_chart(data, image_format='png'):
+    """
+    Renders the given data as a line plot and returns the image bytes.
+
+    The figure is built with matplotlib's object oriented API on an Agg
+    canvas, so it never touches the global pyplot state and is safe to run
+    in threads or in a worker process.
+
+    Args:
+        data (list): Rows (lists or dicts) with at least two columns.
+        image_format (str): Either 'png' or 'svg'.
+
+    Returns:
+        bytes: The rendered image.
+
+    Raises:
+        ChartDataError: If the data has fewer than two columns.
+    """
+    import pandas as pd
+    import seaborn as sns
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    df = pd.DataFrame(data)
+    if df.empty or df.shape[1] < 2:
+        raise ChartDataError("Datos insuficientes")
+
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots()
+    sns.lineplot(data=df, ax=axes)
+    axes.set_title("Gráfico Generado")
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def render_bar_chart(labels, values, xlabel='', image_format='png'):
+    """
+    Renders a horizontal bar chart and returns the image bytes.
+
+    Args:
+        labels (list): The label of each bar, drawn top to bottom.
+        values (list): The length of each bar.
+        xlabel (str): The label of the value axis.
+        image_format (str): Either 'png' or 'svg'.
+
+    Returns:
+        bytes: The rendered image.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(6, 0.5 + 0.4 * len(labels)))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots()
+    axes.barh(labels, values)
+    axes.invert_yaxis()
+    axes.set_xlabel(xlabel)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def chart_cache_key(data, image_format):
+    """
+    Builds the cache key of a chart from a hash of its input data.
+    """
+    payload = json.dumps(data, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(f'{image_format}:{payload}'.encode()).hexdigest()
+    return f'chart:{digest}'
+
+
+def _get_executor():
+    """
+    Returns the process pool used to render charts, or ``None`` when
+    ``CHART_RENDER_PROCESSES`` is 0 and charts are rendered in-process.
+    """
+    global _executor
+    processes = getattr(settings, 'CHART_RENDER_PROCESSES', 0)
+    if processes <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+def get_chart(data, image_format='png'):
+    """
+    Returns the rendered chart of ``data``, reusing a cached image when the
+    same data was already plotted.
+
+    Args:
+        data (list): Rows (lists or dicts) with at least two columns.
+        image_format (str): Either 'png' or 'svg'.
+
+    The process pool only isolates matplotlib from the request workers: the
+    calling thread still waits for the image, up to ``CHART_RENDER_TIMEOUT``.
+
+    Returns:
+        bytes: The rendered image.
+
+    Raises:
+        ChartTimeoutError: If the pool did not render the chart in time.
+    """
+    key = chart_cache_key(data, image_format)
+    image = cache.get(key)
+    if image is None:
+        executor = _get_executor()
+        if executor is None:
+            image = render_line_chart(data, image_format)
+        else:
+            future = executor.submit(render_line_chart, data, image_format)
+            try:
+                image = future.result(timeout=CHART_RENDER_TIMEOUT)
+            except FutureTimeoutError:
+                # Only drops the render if it is still queued; a running one finishes in its process
+                future.cancel()
+                raise ChartTimeoutError(f'La gráfica no se generó en {CHART_RENDER_TIMEOUT} segundos')
+        cache.set(key, image, CHART_CACHE_TIMEOUT)
+    return image
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .tallies import instance_revision
+
+
+def make_etag(*parts):
+    """
+    Builds a strong ETag from the given change markers.
+    """
+    marker = ':'.join(str(part) for part in parts)
+    return quote_etag(hashlib.sha1(marker.encode()).hexdigest())
+
+
+def instance_results_etag(instance, *parts):
+    """
+    Builds the ETag of a response derived from the results of an instance.
+
+    It changes whenever the results revision, the survey definition or the
+    state of the instance change.
+    """
+    return make_etag(
+        instance.id, instance_revision(instance), instance.survey.version,
+        instance.state, instance.closure_date, *parts
+    )
+
+
+def not_modified(request, etag):
+    """
+    Returns a 304 response when the request's ``If-None-Match`` matches ``etag``,
+    or ``None`` when the full response has to be built.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def with_etag(response, etag):
+    """
+    Attaches ``etag`` to a response and asks clients to revalidate it on every use.
+    """
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,402 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from .models import Answer, AnswerOption, Option, Participation
+from .stats import MULTIPLE_CHOICE_TYPES, SINGLE_CHOICE_TYPES
+from .tallies import instance_revision
+
+# Cubos de resultados que cada proceso mantiene en memoria (los de las
+# instancias consultadas más recientemente)
+CUBE_CACHE_SIZE = 8
+CROSSTAB_DIMENSIONS = (2, 3)
+
+
+class CrosstabError(ValueError):
+    """
+    Raised when a crosstab names questions or options the instance does not have.
+    """
+
+
+class ChoiceColumn(ABC):
+    """
+    The answers of every participation of an instance to a choice question.
+
+    Attributes:
+        question_id (int): The question.
+        content (str): The text of the question.
+        type (str): The type of the question.
+        option_ids (list): The options of the question, in id order. The
+            position of an option in this list is its index in the column.
+        option_contents (list): The text of each option.
+    """
+    def __init__(self, question, options):
+        self.question_id = question.id
+        self.content = question.content
+        self.type = question.type
+        self.option_ids = [option.id for option in options]
+        self.option_contents = [option.content for option in options]
+        self._indexes = {option_id: index for index, option_id in enumerate(self.option_ids)}
+
+    def option_index(self, option_id):
+        if option_id not in self._indexes:
+            raise CrosstabError(f"Option {option_id} does not belong to question {self.question_id}.")
+        return self._indexes[option_id]
+
+    def describe(self):
+        return {
+            'question_id': self.question_id,
+            'content': self.content,
+            'type': self.type,
+            'options': [
+                {'id': option_id, 'content': content}
+                for option_id, content in zip(self.option_ids, self.option_contents)
+            ],
+        }
+
+    @abstractmethod
+    def indicators(self, rows):
+        """
+        Returns a boolean matrix with one row per selected participation and
+        one column per option, true where the option was chosen.
+
+        Args:
+            rows (ndarray): The positions of the participations to include.
+        """
+
+    @abstractmethod
+    def selects(self, option_indexes):
+        """
+        Returns the boolean mask of the participations that chose any of the
+        given options.
+        """
+
+    @abstractmethod
+    def expand(self, rows, cells):
+        """
+        Adds this question as a new dimension of crosstab cells.
+
+        Args:
+            rows (ndarray): The participation of every entry.
+            cells (ndarray): The cell of every entry in the dimensions added
+                so far.
+
+        Returns:
+            tuple: The rows and cells of the entries with this dimension,
+            one per option chosen: entries that did not answer are dropped
+            and entries with several options are repeated.
+        """
+
+
+class SingleChoiceColumn(ChoiceColumn):
+    """
+    A single choice question stored as one option index per participation,
+    -1 for the participations that did not answer it.
+    """
+    def __init__(self, question, options, codes):
+        super().__init__(question, options)
+        self.codes = codes
+
+    def indicators(self, rows):
+        import numpy as np
+
+        return self.codes[rows][:, None] == np.arange(len(self.option_ids), dtype=self.codes.dtype)
+
+    def selects(self, option_indexes):
+        import numpy as np
+
+        return np.isin(self.codes, option_indexes)
+
+    def expand(self, rows, cells):
+        codes = self.codes[rows]
+        answered = codes >= 0
+        return rows[answered], cells[answered] * len(self.option_ids) + codes[answered]
+
+
+class MultipleChoiceColumn(ChoiceColumn):
+    """
+    A multiple choice question stored as one bitset per participation: bit
+    ``i`` (little endian within each byte) is set when option ``i`` was chosen.
+    """
+    def __init__(self, question, options, bits):
+        super().__init__(question, options)
+        self.bits = bits
+
+    def indicators(self, rows):
+        import numpy as np
+
+        return np.unpackbits(self.bits[rows], axis=1, count=len(self.option_ids), bitorder='little').astype(bool)
+
+    def selects(self, option_indexes):
+        import numpy as np
+
+        mask = np.zeros(len(self.bits), dtype=bool)
+        for index in option_indexes:
+            mask |= (self.bits[:, index >> 3] >> (index & 7)) & 1 == 1
+        return mask
+
+    def expand(self, rows, cells):
+        import numpy as np
+
+        entries, options = np.nonzero(self.indicators(rows))
+        return rows[entries], cells[entries] * len(self.option_ids) + options
+
+
+class ResultCube:
+    """
+    Columnar, in-memory copy of the choice answers of a survey instance.
+
+    Every participation is a row and every choice question a column, so a
+    cross-tabulation is a couple of array operations per question and one
+    ``bincount`` instead of a join of answer tables.
+
+    Attributes:
+        participation_ids (ndarray): The participations, in id order.
+        states (ndarray): The state of each participation, as an index
+            into ``state_names``.
+        state_names (list): The participation states found.
+        columns (dict): ``ChoiceColumn`` of every choice question by id.
+        built_ms (float): The time it took to build the cube.
+    """
+    def __init__(self, participation_ids, states, state_names, columns, built_ms=0.0):
+        self.participation_ids = participation_ids
+        self.states = states
+        self.state_names = state_names
+        self.columns = columns
+        self.built_ms = built_ms
+
+    def column(self, question_id):
+        if question_id not in self.columns:
+            raise CrosstabError(f"Question {question_id} is not a choice question of this survey.")
+        return self.columns[question_id]
+
+    def mask(self, filters=None, states=None):
+        """
+        Returns the boolean mask of the participations in any of ``states``
+        (all of them when empty) that chose, for every question in
+        ``filters``, at least one of the given options.
+
+        Args:
+            filters (dict): Option ids by question id.
+            states (list): Participation states.
+        """
+        import numpy as np
+
+        mask = np.ones(len(self.participation_ids), dtype=bool)
+        if states:
+            codes = [code for code, name in enumerate(self.state_names) if name in states]
+            mask &= np.isin(self.states, codes)
+        for question_id, option_ids in (filters or {}).items():
+            column = self.column(question_id)
+            mask &= column.selects([column.option_index(option_id) for option_id in option_ids])
+        return mask
+
+    def crosstab(self, question_ids, filters=None, states=None):
+        """
+        Counts the participations by the options chosen in two or three questions.
+
+        A participation that chose several options of a multiple choice
+        question is counted once for each of them.
+
+        Args:
+            question_ids (list): The questions crossed, in dimension order.
+            filters (dict): Option ids by question id the participations
+                must have chosen (see ``mask``).
+            states (list): Participation states to include.
+
+        Returns:
+            dict: The number of participations included, the description
+            of every dimension and the counts, nested in dimension order
+            (``counts[i][j][k]`` for options ``i``, ``j`` and ``k``).
+        """
+        import numpy as np
+
+        if len(question_ids) not in CROSSTAB_DIMENSIONS:
+            raise CrosstabError("A crosstab needs two or three questions.")
+        columns = [self.column(question_id) for question_id in question_ids]
+        mask = self.mask(filters, states)
+
+        # Cada entrada es una participación y la celda a la que suma; cada
+        # pregunta de opción múltiple la repite por cada opción elegida
+        rows = np.flatnonzero(mask)
+        cells = np.zeros(len(rows), dtype=np.int64)
+        for column in columns:
+            rows, cells = column.expand(rows, cells)
+
+        shape = tuple(len(column.option_ids) for column in columns)
+        counts = np.bincount(cells, minlength=int(np.prod(shape))).reshape(shape)
+
+        return {
+            'participations': int(mask.sum()),
+            'dimensions': [column.describe() for column in columns],
+            'counts': counts.tolist(),
+        }
+
+
+def _id_indexes(sorted_ids, ids):
+    """
+    Returns the position of each id of ``ids`` in ``sorted_ids``, or -1
+    for the ids that are not there.
+    """
+    import numpy as np
+
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+def build_result_cube(instance):
+    """
+    Builds the ``ResultCube`` of an instance.
+
+    The participations, the chosen options of single choice answers and the
+    selected options of multiple choice answers are read with one query each
+    and turned into arrays without per-answer Python objects.
+
+    Args:
+        instance (SurveyInstance): The instance, with its survey loaded.
+
+    Returns:
+        ResultCube: The cube of the instance.
+    """
+    import numpy as np
+
+    start = time.perf_counter()
+    questions = list(
+        instance.survey.questions.filter(type__in=SINGLE_CHOICE_TYPES + MULTIPLE_CHOICE_TYPES).order_by('order', 'id')
+    )
+    options = {}
+    for option in Option.objects.filter(question__in=questions).order_by('id'):
+        options.setdefault(option.question_id, []).append(option)
+
+    rows = list(Participation.objects.filter(instance=instance).order_by('id').values_list('id', 'state'))
+    participation_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    state_names = sorted({row[1] for row in rows})
+    state_codes = {name: code for code, name in enumerate(state_names)}
+    states = np.fromiter((state_codes[row[1]] for row in rows), dtype=np.int8, count=len(rows))
+
+    # Una fila (participación, opción) por cada opción elegida, sea de
+    # Answer.option o de AnswerOption
+    selections = np.array(
+        list(
+            Answer.objects.filter(participation__instance=instance, option__isnull=False)
+            .order_by().values_list('participation_id', 'option_id')
+        ) + list(
+            AnswerOption.objects.filter(answer__participation__instance=instance)
+            .order_by().values_list('answer__participation_id', 'option_id')
+        ),
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+    # Posición de cada opción elegida en la lista de opciones de su pregunta
+    option_ids = np.array(sorted(option.id for question_options in options.values() for option in question_options), dtype=np.int64)
+    option_questions = np.empty(len(option_ids), dtype=np.int64)
+    option_indexes = np.empty(len(option_ids), dtype=np.int64)
+    for question_id, question_options in options.items():
+        for index, option in enumerate(question_options):
+            position = np.searchsorted(option_ids, option.id)
+            option_questions[position] = question_id
+            option_indexes[position] = index
+
+    participations = _id_indexes(participation_ids, selections[:, 0])
+    chosen = _id_indexes(option_ids, selections[:, 1])
+    valid = (participations >= 0) & (chosen >= 0)
+    participations, chosen = participations[valid], chosen[valid]
+    chosen_questions = option_questions[chosen]
+    chosen_indexes = option_indexes[chosen]
+
+    order = np.argsort(chosen_questions, kind='stable')
+    participations, chosen_questions, chosen_indexes = participations[order], chosen_questions[order], chosen_indexes[order]
+
+    columns = {}
+    for question in questions:
+        question_options = options.get(question.id, [])
+        low, high = np.searchsorted(chosen_questions, [question.id, question.id + 1])
+        rows_of_question, indexes = participations[low:high], chosen_indexes[low:high]
+        if question.type in SINGLE_CHOICE_TYPES:
+            codes = np.full(len(participation_ids), -1, dtype=np.int16)
+            codes[rows_of_question] = indexes
+            columns[question.id] = SingleChoiceColumn(question, question_options, codes)
+        else:
+            chosen_matrix = np.zeros((len(participation_ids), len(question_options)), dtype=bool)
+            chosen_matrix[rows_of_question, indexes] = True
+            bits = np.packbits(chosen_matrix, axis=1, bitorder='little')
+            columns[question.id] = MultipleChoiceColumn(question, question_options, bits)
+
+    return ResultCube(
+        participation_ids, states, state_names, columns,
+        built_ms=(time.perf_counter() - start) * 1000
+    )
+
+
+_cubes = OrderedDict()
+_cubes_lock = threading.Lock()
+
+
+def get_result_cube(instance):
+    """
+    Returns the ``ResultCube`` of an instance, from the cache of this process
+    when its results and survey have not changed since it was built.
+
+    Args:
+        instance (SurveyInstance): The instance, with its survey loaded.
+    """
+    key = (instance_revision(instance), instance.survey.version)
+    with _cubes_lock:
+        cached = _cubes.get(instance.id)
+        if cached is not None and cached[0] == key:
+            _cubes.move_to_end(instance.id)
+            return cached[1]
+
+    cube = build_result_cube(instance)
+    with _cubes_lock:
+        _cubes[instance.id] = (key, cube)
+        _cubes.move_to_end(instance.id)
+        while len(_cubes) > CUBE_CACHE_SIZE:
+            _cubes.popitem(last=False)
+    return cube
+
+
+def forget_result_cubes():
+    """
+    Empties the cube cache of this process.
+    """
+    with _cubes_lock:
+        _cubes.clear()
+
+
+def _parse_ids(value, name):
+    try:
+        return [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CrosstabError(f"Invalid {name}: {value!r}.")
+
+
+def parse_crosstab_query(query_params):
+    """
+    Reads the parameters of a crosstab request.
+
+    ``questions`` lists the two or three questions crossed, ``filter``
+    (repeatable) restricts the participations to those that chose any of
+    some options of another question (``filter=<question>:<option>,<option>``)
+    and ``state`` (repeatable) restricts them to some participation states.
+
+    Returns:
+        dict: The keyword arguments of ``ResultCube.crosstab``.
+    """
+    question_ids = _parse_ids(query_params.get('questions', ''), 'questions')
+    if len(question_ids) not in CROSSTAB_DIMENSIONS:
+        raise CrosstabError("A crosstab needs two or three questions.")
+
+    filters = {}
+    for value in query_params.getlist('filter'):
+        question, _, option_ids = value.partition(':')
+        question_id, option_ids = _parse_ids(question, 'filter'), _parse_ids(option_ids, 'filter')
+        if len(question_id) != 1 or not option_ids:
+            raise CrosstabError(f"Invalid filter: {value!r}, expected <question>:<option>,<option>.")
+        filters.setdefault(question_id[0], []).extend(option_ids)
+
+    states = [state for value in query_params.getlist('state') for state in value.split(',') if state]
+    return {'question_ids': question_ids, 'filters': filters, 'states': states}
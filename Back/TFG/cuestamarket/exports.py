@@ -0,0 +1,146 @@
+import csv
+import tempfile
+
+from .models import Option
+from .snapshots import load_answers
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_STATES = ['in_progress', 'completed']
+XLSX_READ_SIZE = 64 * 1024
+
+
+def iter_participation_chunks(instance, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the exportable participations of an instance in keyset-paginated chunks.
+
+    Each chunk is a list of ``(participation, answers_by_question)`` pairs,
+    newest participation first, with the answers in the format of
+    ``snapshots.build_snapshots``. Completed participations are read from
+    their snapshot and the answers of the rest are batch-loaded per chunk,
+    so every chunk costs at most three queries regardless of its size and
+    memory use stays bounded.
+
+    Args:
+        instance (SurveyInstance): The instance to export.
+        chunk_size (int): Number of participations loaded per chunk.
+    """
+    participations = (
+        instance.participations.filter(state__in=EXPORT_STATES)
+        .select_related('user')
+        .order_by('-id')
+    )
+    last_id = None
+    while True:
+        page = participations if last_id is None else participations.filter(id__lt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+
+        answers = load_answers((participation.id, participation.snapshot) for participation in chunk)
+        yield [(participation, answers[participation.id]) for participation in chunk]
+        last_id = chunk[-1].id
+
+
+def format_answer(question, answer, option_contents):
+    """
+    Renders the answer to a question as the text shown in an export cell.
+
+    Args:
+        question (Question): The question answered.
+        answer (dict): The answer, as loaded by ``load_answers``, or None.
+        option_contents (dict): The content of every option by id.
+    """
+    if answer is None:
+        return 'Sin respuesta'
+
+    if question.type == 'multiple':
+        selected_options = [
+            option_contents[option_id] for option_id in answer.get('options', []) if option_id in option_contents
+        ]
+        if selected_options:
+            return '; '.join(selected_options)
+        return 'Sin opciones seleccionadas'
+
+    if question.type == 'single':
+        if answer.get('option') in option_contents:
+            return option_contents[answer['option']]
+        return 'Sin opción seleccionada'
+
+    if question.type in ['open', 'text', 'textarea']:
+        if answer.get('content'):
+            return answer['content']
+        return 'Sin respuesta de texto'
+
+    return f'Tipo no soportado: {question.type}'
+
+
+def export_headers(questions):
+    return ['usuario', 'fecha_participacion', 'estado'] + [question.content for question in questions]
+
+
+def iter_export_rows(instance, questions, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one list of cell values per exportable participation of an instance.
+
+    Args:
+        instance (SurveyInstance): The instance to export.
+        questions (list): The questions of the survey, in column order.
+        chunk_size (int): Number of participations loaded per chunk.
+    """
+    option_contents = dict(
+        Option.objects.filter(question__in=[question.id for question in questions]).values_list('id', 'content')
+    )
+    for chunk in iter_participation_chunks(instance, chunk_size):
+        for participation, answers in chunk:
+            row = [
+                participation.user.username if participation.user else 'Anónimo',
+                participation.date.strftime('%Y-%m-%d %H:%M:%S'),
+                participation.state
+            ]
+            row.extend(format_answer(question, answers.get(question.id), option_contents) for question in questions)
+            yield row
+
+
+class Echo:
+    """
+    File-like object whose ``write`` returns the value instead of storing it,
+    so ``csv.writer`` can be used to produce streamed lines.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(instance, questions):
+    """
+    Yields the export of an instance as CSV text, one line at a time.
+    """
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(export_headers(questions))
+    for row in iter_export_rows(instance, questions):
+        yield writer.writerow(row)
+
+
+def stream_xlsx(instance, questions):
+    """
+    Yields the export of an instance as XLSX bytes.
+
+    The workbook is built with openpyxl in write-only mode, which flushes
+    every row to a temporary file instead of keeping the sheet in memory.
+    The finished file is then streamed in fixed-size blocks.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Respuestas')
+    sheet.append(export_headers(questions))
+    for row in iter_export_rows(instance, questions):
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            block = output.read(XLSX_READ_SIZE)
+            if not block:
+                break
+            yield block
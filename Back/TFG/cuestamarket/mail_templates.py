@@ -0,0 +1,134 @@
+import os
+import re
+import threading
+
+from django.contrib.auth.tokens import default_token_generator
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.html import escape, strip_tags
+from django.utils.http import urlsafe_base64_encode
+
+PLACEHOLDER = '__MAIL_FIELD_{}__'
+PLACEHOLDER_PATTERN = re.compile(r'__MAIL_FIELD_(\d+)__')
+
+
+def _nested_context(fields):
+    """
+    Builds a template context where every dotted field path resolves to its
+    placeholder, e.g. ``user.username`` -> ``{'user': {'username': ...}}``.
+    """
+    context = {}
+    for index, field in enumerate(fields):
+        *parents, name = field.split('.')
+        node = context
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = PLACEHOLDER.format(index)
+    return context
+
+
+def _split(rendered):
+    """
+    Splits a rendered template into its static parts and the indexes of the
+    fields between them.
+    """
+    parts = PLACEHOLDER_PATTERN.split(rendered)
+    return parts[0::2], [int(index) for index in parts[1::2]]
+
+
+def _join(compiled, values):
+    static_parts, field_indexes = compiled
+    pieces = [static_parts[0]]
+    for index, static in zip(field_indexes, static_parts[1:]):
+        pieces.append(values[index])
+        pieces.append(static)
+    return ''.join(pieces)
+
+
+class MailTemplate:
+    """
+    An email template rendered once per process and then filled per message.
+
+    The HTML template is rendered with a placeholder in place of every
+    per-user field, and the result is split into static parts. The plain
+    text alternative is computed once as well, either with ``strip_tags`` or
+    from its own template. Composing a message only joins the static parts
+    with the (escaped) field values.
+
+    Fields must be printed verbatim by the templates, without filters.
+
+    Attributes:
+        subject (str): The subject of the emails.
+        html_template (str): The name of the HTML template.
+        fields (list): The dotted paths of the per-message fields.
+        text_template (str): Optional name of a plain text template. When
+            missing, the text is the HTML without its tags.
+    """
+    def __init__(self, subject, html_template, fields, text_template=None):
+        self.subject = subject
+        self.html_template = html_template
+        self.fields = list(fields)
+        self.text_template = text_template
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def compile(self):
+        if self._compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    context = _nested_context(self.fields)
+                    html = render_to_string(self.html_template, context)
+                    if self.text_template:
+                        text = render_to_string(self.text_template, context)
+                    else:
+                        text = strip_tags(html)
+                    self._compiled = (_split(html), _split(text))
+        return self._compiled
+
+    def compose(self, **values):
+        """
+        Fills the template with the values of one message.
+
+        Args:
+            **values: The value of every field, keyed by its dotted path
+                with the dots replaced by underscores (``user_username``).
+
+        Returns:
+            tuple: The subject, the plain text body and the HTML body.
+        """
+        html, text = self.compile()
+        raw = [str(values[field.replace('.', '_')]) for field in self.fields]
+        return self.subject, _join(text, raw), _join(html, [escape(value) for value in raw])
+
+
+ACTIVATION_MAIL = MailTemplate(
+    'Activa tu cuenta', 'emails/activation_mail.html', ['user.username', 'activation_url']
+)
+PASSWORD_RESET_MAIL = MailTemplate(
+    'Restablecer contraseña', 'emails/password_reset_mail.html', ['user.username', 'reset_url'],
+    text_template='emails/password_reset_mail.txt'
+)
+
+
+def user_token_path(user):
+    """
+    Returns the ``<uid>/<token>`` path identifying a one-time link for a user.
+    """
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    return f"{uid}/{token}"
+
+
+def compose_activation_email(user):
+    frontend_base_url = os.getenv('FRONTEND_URL', 'http://127.0.0.1:5173')
+    return ACTIVATION_MAIL.compose(
+        user_username=user.username,
+        activation_url=f"{frontend_base_url}/activar/{user_token_path(user)}"
+    )
+
+
+def compose_password_reset_email(user):
+    return PASSWORD_RESET_MAIL.compose(
+        user_username=user.username,
+        reset_url=f"{os.getenv('FRONTEND_URL')}/reset-password/{user_token_path(user)}"
+    )
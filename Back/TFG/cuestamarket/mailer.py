@@ -0,0 +1,148 @@
+import uuid
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 3600
+# A batch still being sent after this many seconds is considered abandoned.
+SEND_TIMEOUT = 300
+
+
+def enqueue_email(subject, body, to, html_body=''):
+    """
+    Stores an email in the outbox to be delivered by ``run_mail_worker``.
+
+    Args:
+        subject (str): The subject of the email.
+        body (str): The plain text body.
+        to (str | list): The recipient or recipients.
+        html_body (str): The optional HTML alternative.
+
+    Returns:
+        OutgoingEmail: The queued email.
+    """
+    if isinstance(to, str):
+        to = [to]
+    return OutgoingEmail.objects.create(subject=subject, body=body, to=','.join(to), html_body=html_body or '')
+
+
+def retry_delay(attempts):
+    """
+    Returns the exponential backoff applied after the given failed attempts.
+    """
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def requeue_stale_emails():
+    """
+    Gives back to the queue the emails whose worker died while sending them.
+
+    Returns:
+        int: The number of emails recovered.
+    """
+    stale = OutgoingEmail.objects.filter(state='sending', next_attempt_at__lt=timezone.now())
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        state='failed', error='El envío superó el tiempo máximo.'
+    )
+    return failed + stale.update(state='pending')
+
+
+def claim_batch(size):
+    """
+    Atomically claims up to ``size`` pending emails for the calling worker.
+
+    The claim is a conditional UPDATE that tags the rows with a batch token,
+    so two workers never send the same email.
+
+    Returns:
+        list: The claimed emails.
+    """
+    now = timezone.now()
+    ids = list(
+        OutgoingEmail.objects.filter(state='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:size]
+    )
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    OutgoingEmail.objects.filter(id__in=ids, state='pending').update(
+        state='sending', claimed_by=token, attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=SEND_TIMEOUT)
+    )
+    return list(OutgoingEmail.objects.filter(claimed_by=token, state='sending').order_by('id'))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.body, to=email.to.split(','), connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _schedule_retry(email, error):
+    if email.attempts >= MAX_ATTEMPTS:
+        email.state = 'failed'
+    else:
+        email.state = 'pending'
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.error = str(error)
+    email.save(update_fields=['state', 'next_attempt_at', 'error'])
+
+
+def send_batch(emails, connection=None):
+    """
+    Delivers claimed emails reusing a single connection of the email backend.
+
+    Delivered emails are marked as sent with one UPDATE at the end of the
+    batch. Failed ones are scheduled for a new attempt with exponential
+    backoff, or marked as failed after ``MAX_ATTEMPTS``.
+
+    Args:
+        emails (list): The emails returned by ``claim_batch``.
+        connection: An email backend instance (the configured one by default).
+
+    Returns:
+        int: The number of emails delivered.
+    """
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _schedule_retry(email, e)
+        return 0
+
+    sent_ids = []
+    try:
+        for email in emails:
+            try:
+                build_message(email, connection).send()
+            except Exception as e:
+                _schedule_retry(email, e)
+            else:
+                sent_ids.append(email.id)
+    finally:
+        connection.close()
+        OutgoingEmail.objects.filter(id__in=sent_ids).update(state='sent', sent_at=timezone.now(), error='')
+    return len(sent_ids)
+
+
+def process_outbox(batch_size):
+    """
+    Claims and delivers one batch of pending emails.
+
+    Returns:
+        tuple: The number of emails claimed and delivered.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+    return len(emails), send_batch(emails)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from cuestamarket.snapshots import SNAPSHOT_BATCH_SIZE, backfill_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Writes the answer snapshot of the completed participations stored before
+    snapshots existed, so their results and exports stop reading the answer
+    tables.
+    """
+    help = 'Write the answer snapshot of completed participations that have none.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE, help='Participations written per batch.')
+        parser.add_argument('--rebuild', action='store_true', help='Also rewrite the snapshots that already exist.')
+
+    def handle(self, *args, **options):
+        written = backfill_snapshots(max(options['batch_size'], 1), rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f"{written} participation snapshot(s) written"))
@@ -0,0 +1,138 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from cuestamarket.crosstabs import build_result_cube
+from cuestamarket.models import Answer, AnswerOption, Option, Participation, Question, Survey, SurveyInstance, User
+from cuestamarket.survey_writes import bulk_insert
+
+BATCH_SIZE = 5000
+OPTIONS_PER_QUESTION = 5
+
+
+class Command(BaseCommand):
+    """
+    Fills a throwaway test database with one instance and many participations
+    and compares a two-way crosstab computed with the ORM (a self join of the
+    answers) with the ``ResultCube`` used by the crosstab endpoint: the time
+    to build the cube and the time of 2-way, 3-way and filtered crosstabs.
+
+    The configured database is never touched: the benchmark runs on the test
+    database of the default connection, which is destroyed at the end.
+    """
+    help = 'Benchmark crosstabs of an instance with the ORM and with the columnar result cube.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participations', type=int, default=100000, help='Number of synthetic participations.')
+        parser.add_argument('--questions', type=int, default=6, help='Number of questions (every third one is multiple choice).')
+        parser.add_argument('--repeat', type=int, default=20, help='Executions of each crosstab to time (the median is reported).')
+
+    def populate(self, participations, questions):
+        client = User.objects.create(username='bench_client', email='bench_client@example.com')
+        survey = Survey.objects.create(client=client, title='Benchmark', description='Synthetic dataset')
+        instance = SurveyInstance.objects.create(survey=survey)
+        Question.objects.bulk_create([
+            Question(survey=survey, content=f'Question {number}', type='multiple' if number % 3 == 2 else 'single', order=number)
+            for number in range(questions)
+        ])
+        question_list = list(survey.questions.order_by('id'))
+        Option.objects.bulk_create([
+            Option(question=question, content=f'Option {number}')
+            for question in question_list
+            for number in range(OPTIONS_PER_QUESTION)
+        ])
+        options = {}
+        for option_id, question_id in Option.objects.filter(question__survey=survey).order_by('id').values_list('id', 'question_id'):
+            options.setdefault(question_id, []).append(option_id)
+
+        User.objects.bulk_create([
+            User(username=f'bench_user_{number}', email=f'bench_user_{number}@example.com')
+            for number in range(participations)
+        ], batch_size=BATCH_SIZE)
+        user_ids = User.objects.filter(username__startswith='bench_user_').order_by('id').values_list('id', flat=True)
+        Participation.objects.bulk_create([
+            Participation(user_id=user_id, instance=instance, state='in_progress' if number % 5 == 0 else 'completed')
+            for number, user_id in enumerate(user_ids)
+        ], batch_size=BATCH_SIZE)
+
+        participation_ids = list(Participation.objects.filter(instance=instance).order_by('id').values_list('id', flat=True))
+        for start in range(0, len(participation_ids), BATCH_SIZE // questions):
+            batch = participation_ids[start:start + BATCH_SIZE // questions]
+            answers, selections = [], []
+            for participation_id in batch:
+                for number, question in enumerate(question_list):
+                    choices = options[question.id]
+                    # Respuestas correlacionadas entre preguntas para que las tablas no sean uniformes
+                    choice = (participation_id * (number + 1) + participation_id // 7) % len(choices)
+                    if question.type == 'multiple':
+                        answers.append(Answer(participation_id=participation_id, question=question))
+                        selections.append({choices[choice], choices[(choice + participation_id % 3) % len(choices)]})
+                    else:
+                        answers.append(Answer(participation_id=participation_id, question=question, option_id=choices[choice]))
+                        selections.append(set())
+            bulk_insert(Answer, answers, Answer.objects.filter(participation_id__in=batch))
+            AnswerOption.objects.bulk_create([
+                AnswerOption(answer_id=answer.id, option_id=option_id)
+                for answer, option_ids in zip(answers, selections)
+                for option_id in option_ids
+            ])
+        return instance, question_list, options
+
+    def time(self, function, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            instance, questions, question_options = self.populate(options['participations'], options['questions'])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{options['participations']} participations, {len(questions)} questions "
+                f"(created in {time.perf_counter() - start:.1f} s)"
+            ))
+            first, second = [question for question in questions if question.type == 'single'][:2]
+            third = next((question for question in questions if question.type == 'multiple'), questions[-1])
+
+            def orm_crosstab():
+                return list(
+                    Answer.objects.filter(participation__instance=instance, question=first, participation__answers__question=second)
+                    .order_by().values('option_id', 'participation__answers__option_id').annotate(total=Count('id'))
+                )
+
+            orm_ms = self.time(orm_crosstab, min(options['repeat'], 3))
+            self.stdout.write(f"ORM 2-way crosstab (self join of the answers): {orm_ms:,.1f} ms")
+
+            cube = build_result_cube(instance)
+            self.stdout.write(f"Result cube built in {cube.built_ms:,.1f} ms")
+
+            # Both ways must count the same before their timings are compared
+            expected = [[0] * len(question_options[second.id]) for _ in question_options[first.id]]
+            for row in orm_crosstab():
+                expected[question_options[first.id].index(row['option_id'])][
+                    question_options[second.id].index(row['participation__answers__option_id'])
+                ] = row['total']
+            if cube.crosstab([first.id, second.id])['counts'] != expected:
+                raise CommandError('The cube 2-way crosstab does not match the ORM counts.')
+            self.stdout.write('Cube 2-way counts match the ORM')
+
+            filters = {third.id: [question_options[third.id][0]]}
+            for name, arguments in [
+                ('2-way crosstab', {'question_ids': [first.id, second.id]}),
+                ('3-way crosstab', {'question_ids': [first.id, second.id, third.id]}),
+                ('2-way crosstab filtered by another answer and state', {
+                    'question_ids': [first.id, second.id], 'filters': filters, 'states': ['completed']
+                }),
+            ]:
+                elapsed = self.time(lambda: cube.crosstab(**arguments), options['repeat'])
+                self.stdout.write(f"Cube {name}: {elapsed:,.2f} ms")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cuestamarket.models import Survey
+from cuestamarket.survey_transfer import iter_jsonl, iter_survey_records
+
+
+class Command(BaseCommand):
+    """
+    Writes a survey, and optionally its instances with their responses, in
+    the JSON Lines format read by ``import_survey``.
+    """
+    help = 'Export a survey (and optionally its instances with responses) as JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, help='Survey to export.')
+        parser.add_argument('--responses', action='store_true', help='Export every instance with its responses.')
+        parser.add_argument('--instance', type=int, action='append', default=[], help='Export only these instances (repeatable).')
+        parser.add_argument('--output', '-o', default='-', help='File to write (standard output by default).')
+
+    def handle(self, *args, **options):
+        try:
+            survey = Survey.objects.get(id=options['survey_id'])
+        except Survey.DoesNotExist:
+            raise CommandError(f"Survey {options['survey_id']} does not exist.")
+
+        instances = []
+        if options['instance']:
+            instances = survey.instances.filter(id__in=options['instance']).order_by('id')
+            missing = set(options['instance']) - {instance.id for instance in instances}
+            if missing:
+                raise CommandError(f"Instances {sorted(missing)} do not belong to survey {survey.id}.")
+        elif options['responses']:
+            instances = survey.instances.order_by('id')
+
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        try:
+            for line in iter_jsonl(iter_survey_records(survey, instances)):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
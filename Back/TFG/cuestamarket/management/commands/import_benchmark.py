@@ -0,0 +1,80 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Importing the WSGI application and resolving the URLconf is what every
+# gunicorn worker does before serving its first request.
+STARTUP_SNIPPET = (
+    "import mi_tfg.wsgi; "
+    "from django.urls import get_resolver; "
+    "get_resolver().url_patterns"
+)
+
+# Packages that must only be imported when a chart, report or export is used.
+HEAVY_MODULES = ['pandas', 'numpy', 'matplotlib', 'seaborn', 'weasyprint', 'openpyxl']
+
+
+def parse_importtime(output):
+    """
+    Parses the output of ``python -X importtime``.
+
+    Returns:
+        list: Tuples of (module, self_us, cumulative_us, depth).
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    """
+    Measures the import cost of ``mi_tfg.wsgi`` with ``python -X importtime``
+    and fails when the heavy scientific stack is loaded at startup or the
+    import time goes over budget.
+    """
+    help = 'Benchmark the startup import time of mi_tfg.wsgi and guard against regressions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Number of cold imports to measure (the median is reported).')
+        parser.add_argument('--max-ms', type=float, default=None, help='Fail if the median import time exceeds this many milliseconds.')
+        parser.add_argument('--top', type=int, default=10, help='Number of most expensive top-level imports to show.')
+
+    def measure(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'mi_tfg.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SNIPPET],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Importing mi_tfg.wsgi failed:\n{result.stderr[-2000:]}")
+        return parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        runs = [self.measure() for _ in range(max(options['runs'], 1))]
+        totals = [sum(cumulative for _, _, cumulative, depth in modules if depth == 0) for modules in runs]
+        median_ms = statistics.median(totals) / 1000
+
+        modules = runs[-1]
+        imported = {name for name, _, _, _ in modules}
+        top_level = sorted((module for module in modules if module[3] == 0), key=lambda module: module[2], reverse=True)
+
+        self.stdout.write(f"Startup import time: {median_ms:.1f} ms (median of {len(runs)} runs)")
+        for name, _, cumulative, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        heavy = sorted(module for module in HEAVY_MODULES if module in imported)
+        if heavy:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(heavy)}")
+        if options['max_ms'] is not None and median_ms > options['max_ms']:
+            raise CommandError(f"Startup import time {median_ms:.1f} ms exceeds the {options['max_ms']} ms budget")
+
+        self.stdout.write(self.style.SUCCESS('No heavy modules imported at startup.'))
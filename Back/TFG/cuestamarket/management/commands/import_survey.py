@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cuestamarket.models import User
+from cuestamarket.survey_transfer import TRANSFER_CHUNK_SIZE, SurveyImportError, import_survey
+
+
+class Command(BaseCommand):
+    """
+    Imports a JSON Lines file written by ``export_survey`` (or the export
+    endpoints) as a new survey, with its instances and responses.
+
+    Unlike the import endpoint, participants are matched to the existing
+    users by username, and unknown ones are created as inactive users.
+    """
+    help = 'Import a survey exported as JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read ("-" for standard input).')
+        parser.add_argument('--client', required=True, help='Username of the owner of the imported survey.')
+        parser.add_argument('--chunk-size', type=int, default=TRANSFER_CHUNK_SIZE, help='Participations written per batch.')
+
+    def handle(self, *args, **options):
+        try:
+            client = User.objects.get(username=options['client'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['client']} does not exist.")
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            importer = import_survey(source, client, max(options['chunk_size'], 1), map_users=True)
+        except SurveyImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        totals = importer.totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Survey {importer.survey.id} imported: {totals['questions']} questions, "
+            f"{len(importer.instances)} instances, {totals['participations']} participations, "
+            f"{totals['answers']} answers"
+        ))
@@ -0,0 +1,164 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+# The schema right before and right after the hot path indexes were added.
+BEFORE_INDEXES = ('cuestamarket', '0008_reportjob')
+AFTER_INDEXES = ('cuestamarket', '0009_indexes')
+
+BATCH_SIZE = 5000
+OPTIONS_PER_QUESTION = 4
+
+
+class Command(BaseCommand):
+    """
+    Fills a throwaway test database with a synthetic dataset and prints the
+    query plan and timing of the participation/answer hot paths, first on the
+    schema without the hot path indexes and then with them.
+
+    The dataset is created with the historical models of the schema before
+    the indexes, as the current models have columns added by later
+    migrations.
+
+    The configured database is never touched: the benchmark runs on the test
+    database of the default connection, which is destroyed at the end.
+    """
+    help = 'Compare the query plans of the hot paths before and after the index migration.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=1000000, help='Number of synthetic answers to create.')
+        parser.add_argument('--instances', type=int, default=200, help='Number of survey instances to spread them over.')
+        parser.add_argument('--questions', type=int, default=20, help='Number of questions of the synthetic survey.')
+        parser.add_argument('--repeat', type=int, default=20, help='Executions of each query to time (the median is reported).')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state(target).apps
+
+    def populate(self, apps, answers, instances, questions):
+        User, Survey, Question, Option, SurveyInstance, Participation, Answer = (
+            apps.get_model('cuestamarket', name)
+            for name in ['User', 'Survey', 'Question', 'Option', 'SurveyInstance', 'Participation', 'Answer']
+        )
+        client = User.objects.create(username='bench_client', email='bench_client@example.com')
+        survey = Survey.objects.create(client=client, title='Benchmark', description='Synthetic dataset')
+        Question.objects.bulk_create([
+            Question(survey=survey, content=f'Question {number}', type='single', order=number)
+            for number in range(questions)
+        ])
+        question_list = list(survey.questions.order_by('id'))
+        Option.objects.bulk_create([
+            Option(question=question, content=f'Option {number}')
+            for question in question_list
+            for number in range(OPTIONS_PER_QUESTION)
+        ])
+        options = {}
+        for option_id, question_id in Option.objects.filter(question__survey=survey).values_list('id', 'question_id'):
+            options.setdefault(question_id, []).append(option_id)
+
+        # A quarter of the instances are drafts, a quarter closed and the rest open.
+        now = timezone.now()
+        SurveyInstance.objects.bulk_create([
+            SurveyInstance(
+                survey=survey,
+                closure_date=None if number % 4 == 0 else now + timedelta(days=-30 if number % 4 == 1 else 30)
+            )
+            for number in range(instances)
+        ])
+        instance_ids = list(SurveyInstance.objects.filter(survey=survey).values_list('id', flat=True))
+
+        participations = max(answers // questions, 1)
+        users_per_instance = -(-participations // instances)
+        User.objects.bulk_create([
+            User(username=f'bench_user_{number}', email=f'bench_user_{number}@example.com')
+            for number in range(users_per_instance)
+        ], batch_size=BATCH_SIZE)
+        user_ids = list(User.objects.filter(username__startswith='bench_user_').values_list('id', flat=True))
+
+        Participation.objects.bulk_create([
+            Participation(user_id=user_id, instance_id=instance_id, state='in_progress' if number % 4 == 0 else 'completed')
+            for instance_id in instance_ids
+            for number, user_id in enumerate(user_ids)
+        ][:participations], batch_size=BATCH_SIZE)
+
+        batch = []
+        participation_ids = Participation.objects.order_by('id').values_list('id', flat=True)
+        for participation_id in participation_ids.iterator(chunk_size=BATCH_SIZE):
+            for question in question_list:
+                choices = options[question.id]
+                batch.append(Answer(
+                    participation_id=participation_id,
+                    question=question,
+                    option_id=choices[participation_id % len(choices)]
+                ))
+            if len(batch) >= BATCH_SIZE:
+                Answer.objects.bulk_create(batch)
+                batch = []
+        Answer.objects.bulk_create(batch)
+
+        participation = Participation.objects.order_by('id')[participations // 2]
+        return {
+            'instance_id': participation.instance_id,
+            'user_id': participation.user_id,
+            'participation_id': participation.id,
+            'question_id': question_list[len(question_list) // 2].id,
+            'now': now,
+        }
+
+    def hot_queries(self, apps, sample):
+        Participation, Answer, SurveyInstance = (
+            apps.get_model('cuestamarket', name) for name in ['Participation', 'Answer', 'SurveyInstance']
+        )
+        return [
+            ('Participations of an instance by state', Participation.objects.filter(
+                instance_id=sample['instance_id'], state='completed')),
+            ('Participation of a user in an instance', Participation.objects.filter(
+                user_id=sample['user_id'], instance_id=sample['instance_id'])),
+            ('Answer of a participation to a question', Answer.objects.filter(
+                participation_id=sample['participation_id'], question_id=sample['question_id'])),
+            ('Answers to a question within an instance', Answer.objects.filter(
+                participation__instance_id=sample['instance_id'], question_id=sample['question_id'])),
+            ('Open instances', SurveyInstance.objects.filter(
+                closure_date__isnull=False, closure_date__gt=sample['now'])),
+        ]
+
+    def report(self, title, apps, sample, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in self.hot_queries(apps, sample):
+            queryset = queryset.order_by().values_list('id', flat=True)
+            timings = []
+            for _ in range(max(repeat, 1)):
+                start = time.perf_counter()
+                rows = len(list(queryset.all()))
+                timings.append(time.perf_counter() - start)
+
+            self.stdout.write(f"{name}: {rows} rows, {statistics.median(timings) * 1000:.2f} ms")
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {line}")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            apps = self.migrate(BEFORE_INDEXES)
+
+            start = time.perf_counter()
+            sample = self.populate(apps, options['answers'], max(options['instances'], 1), max(options['questions'], 1))
+            self.stdout.write(
+                f"Created {apps.get_model('cuestamarket', 'Answer').objects.count()} answers in "
+                f"{apps.get_model('cuestamarket', 'Participation').objects.count()} participations "
+                f"in {time.perf_counter() - start:.1f} s"
+            )
+
+            self.report('Before the hot path indexes', apps, sample, options['repeat'])
+            apps = self.migrate(AFTER_INDEXES)
+            self.report('After the hot path indexes', apps, sample, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
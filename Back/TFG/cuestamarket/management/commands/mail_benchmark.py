@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from cuestamarket.mail_templates import ACTIVATION_MAIL
+
+
+class Command(BaseCommand):
+    """
+    Measures how many activation emails per second are composed by rendering
+    the template for every message, as the views used to do, and by filling
+    the pre-rendered ``ACTIVATION_MAIL`` template.
+    """
+    help = 'Benchmark the composition of activation emails (messages/second).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=5000, help='Number of emails to compose with each method.')
+
+    def render(self, username, activation_url):
+        html = render_to_string('emails/activation_mail.html', {
+            'user': {'username': username},
+            'activation_url': activation_url,
+        })
+        return strip_tags(html), html
+
+    def compose(self, username, activation_url):
+        _, text, html = ACTIVATION_MAIL.compose(user_username=username, activation_url=activation_url)
+        return text, html
+
+    def handle(self, *args, **options):
+        messages = [
+            (f'user{number}', f'http://127.0.0.1:5173/activar/MT{number}/token-{number}')
+            for number in range(max(options['messages'], 1))
+        ]
+
+        # Both methods must produce the same email.
+        if self.render(*messages[0]) != self.compose(*messages[0]):
+            raise CommandError('The pre-rendered template does not match the rendered one.')
+
+        for name, method in [('render_to_string + strip_tags', self.render), ('pre-rendered template', self.compose)]:
+            start = time.perf_counter()
+            for username, activation_url in messages:
+                method(username, activation_url)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{name}: {len(messages) / elapsed:,.0f} messages/s")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cuestamarket.token_state import PRUNE_BATCH_SIZE, prune_tokens
+
+
+class Command(BaseCommand):
+    """
+    Deletes the expired refresh tokens from the outstanding and blacklisted
+    token tables, which otherwise grow with every login and logout.
+    """
+    help = 'Delete the expired outstanding and blacklisted refresh tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE, help='Tokens deleted per statement.')
+        parser.add_argument('--interval', type=float, default=None, help='Keep running and prune every this many seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            outstanding, blacklisted = prune_tokens(max(options['batch_size'], 1))
+            self.stdout.write(f"{outstanding} outstanding and {blacklisted} blacklisted token(s) deleted")
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
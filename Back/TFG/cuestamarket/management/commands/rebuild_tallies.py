@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cuestamarket.models import SurveyInstance
+from cuestamarket.tallies import rebuild_tallies, verify_tallies
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds or verifies the result tallies of survey instances from the raw
+    participation, answer and answer option rows.
+    """
+    help = 'Rebuild (or verify with --verify) the result tallies of survey instances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('instance_ids', nargs='*', type=int, help='Instances to process (all by default).')
+        parser.add_argument('--verify', action='store_true', help='Only report mismatches, do not modify anything.')
+
+    def handle(self, *args, **options):
+        instances = SurveyInstance.objects.order_by('id')
+        if options['instance_ids']:
+            instances = instances.filter(id__in=options['instance_ids'])
+
+        inconsistent = 0
+        for instance in instances.iterator():
+            if options['verify']:
+                mismatches = verify_tallies(instance)
+                if mismatches:
+                    inconsistent += 1
+                    for kind, key, stored, actual in mismatches:
+                        self.stdout.write(f"Instance {instance.id}: {kind} {key} stored={stored} actual={actual}")
+            else:
+                rebuild_tallies(instance)
+                self.stdout.write(f"Instance {instance.id}: tallies rebuilt")
+
+        if inconsistent:
+            raise CommandError(f"{inconsistent} instance(s) have inconsistent tallies.")
+        if options['verify']:
+            self.stdout.write(self.style.SUCCESS('All tallies are consistent.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cuestamarket.mailer import process_outbox, requeue_stale_emails
+
+
+class Command(BaseCommand):
+    """
+    Local worker that delivers the emails queued in the outbox, so the
+    registration and password reset views never wait for the SMTP server.
+    """
+    help = 'Deliver the emails queued in the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver the pending emails and exit.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the outbox is empty.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails sent per SMTP connection.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or getattr(settings, 'MAIL_BATCH_SIZE', 50)
+
+        while True:
+            close_old_connections()
+            recovered = requeue_stale_emails()
+            if recovered:
+                self.stdout.write(f"{recovered} stale email(s) recovered")
+
+            claimed, sent = process_outbox(batch_size)
+            if claimed:
+                self.stdout.write(f"{sent}/{claimed} email(s) delivered")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
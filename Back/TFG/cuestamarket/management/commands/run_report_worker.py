@@ -0,0 +1,51 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cuestamarket.reports import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    """
+    Local worker that consumes the report jobs queued in the database and
+    renders their PDFs outside of the gunicorn request workers.
+    """
+    help = 'Process queued report generation jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the pending jobs and exit.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--nice', type=int, default=10, help='Niceness increment applied to the worker process.')
+
+    def handle(self, *args, **options):
+        if options['nice'] and hasattr(os, 'nice'):
+            # Lower the scheduling priority so rendering never starves the API workers.
+            os.nice(options['nice'])
+
+        max_running = getattr(settings, 'REPORT_MAX_RUNNING', 1)
+        timeout = timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 600))
+
+        while True:
+            close_old_connections()
+            # Every poll, so a job orphaned by another worker never blocks the queue
+            recovered = requeue_stale_jobs(timeout)
+            if recovered:
+                self.stdout.write(f"{recovered} stale job(s) recovered")
+
+            job = claim_next_job(max_running)
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Job {job.id}: generating report for instance {job.instance_id}")
+            job = run_job(job)
+            if job.state == 'done':
+                self.stdout.write(self.style.SUCCESS(f"Job {job.id}: done"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job {job.id}: {job.state} ({job.error})"))
@@ -0,0 +1,88 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cuestamarket.models import User
+from cuestamarket.token_state import FilteredRefreshToken, blacklist_filter
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    """
+    Measures how many refresh tokens per second are checked and turned into
+    access tokens, as ``CookieTokenRefreshView`` does, while the blacklist
+    grows. Each size is measured with the plain simplejwt check, which
+    queries the blacklist every time, and with ``FilteredRefreshToken``.
+
+    The configured database is never touched: the benchmark runs on the test
+    database of the default connection, which is destroyed at the end.
+    """
+    help = 'Benchmark refresh throughput (refreshes/second) as the token blacklist grows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='0,100000,1000000',
+            help='Comma separated numbers of blacklisted tokens to measure with.'
+        )
+        parser.add_argument('--refreshes', type=int, default=2000, help='Refreshes timed for each size and method.')
+
+    def grow_blacklist(self, user, current, target):
+        expires_at = timezone.now() + timedelta(days=7)
+        while current < target:
+            size = min(BATCH_SIZE, target - current)
+            tokens = OutstandingToken.objects.bulk_create([
+                OutstandingToken(user=user, jti=uuid.uuid4().hex, token='', expires_at=expires_at)
+                for _ in range(size)
+            ])
+            if not all(token.pk for token in tokens):
+                tokens = OutstandingToken.objects.filter(jti__in=[token.jti for token in tokens])
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens])
+            current += size
+        return current
+
+    def measure(self, token_class, tokens):
+        start = time.perf_counter()
+        for token in tokens:
+            str(token_class(token).access_token)
+        return len(tokens) / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = User.objects.create(username='bench_user', email='bench_user@example.com')
+            tokens = [str(RefreshToken.for_user(user)) for _ in range(max(options['refreshes'], 1))]
+
+            blacklisted = 0
+            for size in sizes:
+                start = time.perf_counter()
+                blacklisted = self.grow_blacklist(user, blacklisted, size)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{blacklisted} blacklisted tokens (created in {time.perf_counter() - start:.1f} s)"
+                ))
+
+                plain = self.measure(RefreshToken, tokens)
+                self.stdout.write(f"simplejwt blacklist query: {plain:,.0f} refreshes/s")
+
+                blacklist_filter.reset()
+                with override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=2):
+                    start = time.perf_counter()
+                    blacklist_filter.sync()
+                    rebuild = time.perf_counter() - start
+                    filtered = self.measure(FilteredRefreshToken, tokens)
+                self.stdout.write(
+                    f"bloom filter: {filtered:,.0f} refreshes/s "
+                    f"(filter built in {rebuild * 1000:.0f} ms, {len(blacklist_filter.bloom.bits) / 1024:,.0f} KiB)"
+                )
+        finally:
+            blacklist_filter.reset()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,90 @@
+# Generated by Django 5.1.2 on 2026-10-18 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_tallies(apps, schema_editor):
+    Participation = apps.get_model('cuestamarket', 'Participation')
+    Answer = apps.get_model('cuestamarket', 'Answer')
+    AnswerOption = apps.get_model('cuestamarket', 'AnswerOption')
+    ParticipationTally = apps.get_model('cuestamarket', 'ParticipationTally')
+    QuestionTally = apps.get_model('cuestamarket', 'QuestionTally')
+    OptionTally = apps.get_model('cuestamarket', 'OptionTally')
+
+    ParticipationTally.objects.bulk_create([
+        ParticipationTally(instance_id=row['instance_id'], state=row['state'], count=row['total'])
+        for row in Participation.objects.order_by().values('instance_id', 'state').annotate(total=Count('id'))
+    ], batch_size=1000)
+    QuestionTally.objects.bulk_create([
+        QuestionTally(instance_id=row['participation__instance_id'], question_id=row['question_id'], answers_count=row['total'])
+        for row in Answer.objects.order_by().values('participation__instance_id', 'question_id').annotate(total=Count('id'))
+    ], batch_size=1000)
+
+    selections = {}
+    single_rows = (
+        Answer.objects.filter(option__isnull=False).order_by()
+        .values('participation__instance_id', 'option_id').annotate(total=Count('id'))
+    )
+    multiple_rows = (
+        AnswerOption.objects.order_by()
+        .values('answer__participation__instance_id', 'option_id').annotate(total=Count('id'))
+    )
+    for row in single_rows:
+        key = (row['participation__instance_id'], row['option_id'])
+        selections[key] = selections.get(key, 0) + row['total']
+    for row in multiple_rows:
+        key = (row['answer__participation__instance_id'], row['option_id'])
+        selections[key] = selections.get(key, 0) + row['total']
+    OptionTally.objects.bulk_create([
+        OptionTally(instance_id=instance_id, option_id=option_id, selections_count=total)
+        for (instance_id, option_id), total in selections.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuestamarket', '0004_alter_question_options_question_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selections_count', models.IntegerField(default=0)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='option_tallies', to='cuestamarket.surveyinstance')),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='cuestamarket.option')),
+            ],
+            options={
+                'unique_together': {('instance', 'option')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ParticipationTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participation_tallies', to='cuestamarket.surveyinstance')),
+            ],
+            options={
+                'unique_together': {('instance', 'state')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answers_count', models.IntegerField(default=0)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_tallies', to='cuestamarket.surveyinstance')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='cuestamarket.question')),
+            ],
+            options={
+                'unique_together': {('instance', 'question')},
+            },
+        ),
+        migrations.RunPython(populate_tallies, migrations.RunPython.noop),
+    ]
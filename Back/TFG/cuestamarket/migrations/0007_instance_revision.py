@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 04:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuestamarket', '0006_survey_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstanceRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveBigIntegerField(default=0)),
+                ('instance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revision', to='cuestamarket.surveyinstance')),
+            ],
+        ),
+    ]
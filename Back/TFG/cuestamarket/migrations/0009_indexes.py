@@ -0,0 +1,76 @@
+# Generated by Django 5.1.2 on 2026-10-18 04:16
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+populate_tallies = import_module('cuestamarket.migrations.0005_tallies').populate_tallies
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keeps a single participation per user and instance, and a single answer
+    per participation and question, so the unique constraints can be added.
+
+    The completed participation is kept over in-progress ones, and the most
+    recent row wins among equals. Tallies are rebuilt if anything was removed.
+    """
+    Participation = apps.get_model('cuestamarket', 'Participation')
+    Answer = apps.get_model('cuestamarket', 'Answer')
+    removed = False
+
+    duplicated = (
+        Participation.objects.order_by().values('user_id', 'instance_id')
+        .annotate(total=Count('id')).filter(total__gt=1)
+    )
+    for row in duplicated:
+        participations = Participation.objects.filter(user_id=row['user_id'], instance_id=row['instance_id'])
+        kept = (
+            participations.filter(state='completed').order_by('-id').first()
+            or participations.order_by('-id').first()
+        )
+        participations.exclude(id=kept.id).delete()
+        removed = True
+
+    duplicated = (
+        Answer.objects.order_by().values('participation_id', 'question_id')
+        .annotate(total=Count('id'), last_id=Max('id')).filter(total__gt=1)
+    )
+    for row in duplicated:
+        Answer.objects.filter(
+            participation_id=row['participation_id'], question_id=row['question_id']
+        ).exclude(id=row['last_id']).delete()
+        removed = True
+
+    if removed:
+        for name in ('ParticipationTally', 'QuestionTally', 'OptionTally'):
+            apps.get_model('cuestamarket', name).objects.all().delete()
+        populate_tallies(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuestamarket', '0008_reportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('participation', 'question')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='participation',
+            unique_together={('user', 'instance')},
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['instance', 'state'], name='participation_instance_state'),
+        ),
+        migrations.AddIndex(
+            model_name='surveyinstance',
+            index=models.Index(fields=['closure_date'], name='instance_closure_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuestamarket', '0010_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participation',
+            name='snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
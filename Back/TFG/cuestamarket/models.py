@@ -56,10 +56,12 @@ class Survey(models.Model):
         client (ForeignKey): The client associated with the survey.
         title (str): The title of the survey.
         description (str): A detailed description of the survey.
+        version (int): Stamp increased every time the survey definition changes.
     """
     client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='surveys')
     title = models.CharField(max_length=100)
     description = models.TextField()
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         """
@@ -142,6 +144,9 @@ class SurveyInstance(models.Model):
             return 'closed'
         return 'open'
 
+    class Meta:
+        indexes = [models.Index(fields=['closure_date'], name='instance_closure_date_idx')]
+
     def __str__(self):
         return f"Instance of {self.survey.title} - {self.creation_date.date()}"
 
@@ -159,12 +164,19 @@ class Participation(models.Model):
         instance (ForeignKey): The instance of the survey associated with the participation.
         date (DateTimeField): The date when the participation was registered.
         state (CharField): The state of the participation.
+        snapshot (JSONField): The answers of a completed participation keyed by
+            question id, written once when it is completed (see ``snapshots``).
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='participations')
     instance = models.ForeignKey(SurveyInstance, on_delete=models.CASCADE, related_name='participations')
     date = models.DateTimeField(auto_now_add=True)
     state = models.CharField(max_length=20, default='in_progress')
+    snapshot = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        unique_together = ['user', 'instance']
+        indexes = [models.Index(fields=['instance', 'state'], name='participation_instance_state')]
 
     def __str__(self):
         return f"{self.user.username} - {self.instance.survey.title}"
@@ -191,8 +203,11 @@ class Answer(models.Model):
     content = models.TextField(null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        unique_together = ['participation', 'question']
+
     def __str__(self):
-        return f"Answer to {self.question.id} by {self.participation.user.username}"
+        return f"Answer to {self.question_id} by {self.participation.user.username}"
     
 
 class AnswerOption(models.Model):
@@ -239,3 +254,160 @@ class Report(models.Model):
 
     def __str__(self):
         return f"Report for {self.instance.survey.title}"
+
+
+class ParticipationTally(models.Model):
+    """
+    Model storing the number of participations of an instance in a given state.
+
+    Tallies are maintained incrementally when participations are submitted or
+    deleted, so statistics can be read without scanning the participations.
+
+    Attributes:
+        instance (ForeignKey): The survey instance the tally belongs to.
+        state (CharField): The participation state being counted.
+        count (IntegerField): The number of participations in that state.
+    """
+    instance = models.ForeignKey(SurveyInstance, on_delete=models.CASCADE, related_name='participation_tallies')
+    state = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['instance', 'state']
+
+    def __str__(self):
+        return f"{self.instance_id} - {self.state}: {self.count}"
+
+
+class QuestionTally(models.Model):
+    """
+    Model storing the number of answers given to a question in an instance.
+
+    Attributes:
+        instance (ForeignKey): The survey instance the tally belongs to.
+        question (ForeignKey): The question being counted.
+        answers_count (IntegerField): The number of answers to the question.
+    """
+    instance = models.ForeignKey(SurveyInstance, on_delete=models.CASCADE, related_name='question_tallies')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='tallies')
+    answers_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['instance', 'question']
+
+    def __str__(self):
+        return f"{self.instance_id} - Q{self.question_id}: {self.answers_count}"
+
+
+class OptionTally(models.Model):
+    """
+    Model storing the number of times an option was selected in an instance.
+
+    Both single choice (``Answer.option``) and multiple choice
+    (``AnswerOption``) selections are counted.
+
+    Attributes:
+        instance (ForeignKey): The survey instance the tally belongs to.
+        option (ForeignKey): The option being counted.
+        selections_count (IntegerField): The number of selections of the option.
+    """
+    instance = models.ForeignKey(SurveyInstance, on_delete=models.CASCADE, related_name='option_tallies')
+    option = models.ForeignKey(Option, on_delete=models.CASCADE, related_name='tallies')
+    selections_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['instance', 'option']
+
+    def __str__(self):
+        return f"{self.instance_id} - O{self.option_id}: {self.selections_count}"
+
+
+class InstanceRevision(models.Model):
+    """
+    Model storing a change counter for the results of a survey instance.
+
+    The counter is increased whenever participations or answers of the
+    instance change, and is used as a cheap marker to build HTTP ETags.
+
+    Attributes:
+        instance (OneToOneField): The survey instance being tracked.
+        revision (PositiveBigIntegerField): The number of recorded changes.
+    """
+    instance = models.OneToOneField(SurveyInstance, on_delete=models.CASCADE, related_name='revision')
+    revision = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.instance_id} - r{self.revision}"
+
+
+class ReportJob(models.Model):
+    """
+    Model representing a queued request to generate the report of an instance.
+
+    Jobs are stored in the database and consumed by the ``run_report_worker``
+    management command, so no external message broker is needed.
+
+    Attributes:
+        instance (ForeignKey): The survey instance to report on.
+        requested_by (ForeignKey): The user who requested the report.
+        state (CharField): One of 'pending', 'running', 'done' or 'failed'.
+        attempts (PositiveIntegerField): How many times a worker picked the job.
+        error (TextField): The error message of the last failed attempt.
+        created_at (DateTimeField): When the job was enqueued.
+        started_at (DateTimeField): When a worker last started the job.
+        finished_at (DateTimeField): When the job finished.
+    """
+    instance = models.ForeignKey(SurveyInstance, on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    state = models.CharField(max_length=20, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['state', 'created_at'])]
+
+    def __str__(self):
+        return f"Report job {self.id} for instance {self.instance_id} ({self.state})"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Model representing an email waiting in the outbox to be delivered.
+
+    Views only store the message; the ``run_mail_worker`` management command
+    delivers the pending messages in batches over a single SMTP connection
+    and retries failed deliveries with an exponential backoff.
+
+    Attributes:
+        subject (CharField): The subject of the email.
+        to (TextField): The recipients, separated by commas.
+        body (TextField): The plain text body.
+        html_body (TextField): The optional HTML alternative.
+        state (CharField): One of 'pending', 'sending', 'sent' or 'failed'.
+        attempts (PositiveIntegerField): How many deliveries were attempted.
+        error (TextField): The error of the last failed attempt.
+        claimed_by (CharField): The batch of the worker delivering the email.
+        created_at (DateTimeField): When the email was queued.
+        next_attempt_at (DateTimeField): When the email may be sent (again).
+        sent_at (DateTimeField): When the email was delivered.
+    """
+    subject = models.CharField(max_length=255)
+    to = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    state = models.CharField(max_length=20, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['state', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.state})"
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination used by every list endpoint.
+
+    Pages are located with a ``WHERE id < <cursor>`` condition on a unique,
+    stable ordering instead of an OFFSET, so a deep page costs the same as
+    the first one. The total number of rows is only counted when the client
+    asks for it with ``?count=true``.
+
+    Views can change the ordering with a ``cursor_ordering`` attribute.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ['1', 'true', 'yes']:
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response_schema
+
+
+def estimated_table_rows(model, using='default'):
+    """
+    Returns the number of rows of a model's table according to the database
+    statistics, without counting them.
+
+    MySQL/MariaDB keep an estimate in ``information_schema.TABLES``. SQLite
+    only has one in ``sqlite_stat1`` after ``ANALYZE`` has been run.
+
+    Returns:
+        int: The estimated number of rows, or None when the database has no
+        statistics for the table.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                    'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table]
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None else None
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                # El primer número de cada fila es el de filas de la tabla (o del índice)
+                counts = [int(stat.split()[0]) for (stat,) in cursor.fetchall()]
+                return max(counts) if counts else None
+    except DatabaseError:
+        # sqlite_stat1 no existe hasta ejecutar ANALYZE
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that avoids ``COUNT(*)`` over huge tables.
+
+    Without filters or searches the count is the estimate of the table
+    statistics, once the table has at least ``estimate_threshold`` rows
+    (smaller tables are counted exactly). With filters, rows are counted up
+    to ``filtered_count_cap``, so the changelist shows at most that many
+    results and pages.
+
+    Use it together with ``show_full_result_count = False``, otherwise the
+    admin counts the whole table again for the "N total" link.
+    """
+    estimate_threshold = 100000
+    filtered_count_cap = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        if not queryset.query.where and not queryset.query.distinct:
+            estimate = estimated_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+            return queryset.count()
+
+        return min(queryset[:self.filtered_count_cap + 1].count(), self.filtered_count_cap)
@@ -0,0 +1,14 @@
+from rest_framework.parsers import BaseParser
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Parser for JSON Lines request bodies.
+
+    The body is not read: ``request.data`` is the request stream itself, so
+    views can process huge uploads line by line.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream
@@ -0,0 +1,159 @@
+from django.utils.dateparse import parse_datetime
+
+from .models import Answer
+from .survey_cache import get_survey_definition
+
+
+def _summary(answers_data, answered):
+    return {
+        'total_questions': len(answers_data),
+        'answered_questions': answered,
+        'completion_percentage': round(answered / len(answers_data) * 100, 2) if answers_data else 0
+    }
+
+
+def build_answers_data(participation):
+    """
+    Serializes the answers of a participation, in question order, together
+    with the completion summary.
+
+    The answers are read with their question and option in one query and
+    their selected options in another, and the summary is computed while
+    the answers are serialized.
+
+    Returns:
+        tuple: The list of answers and the summary dict.
+    """
+    answers = (
+        Answer.objects.filter(participation=participation)
+        .select_related('question', 'option')
+        .prefetch_related('selected_options')
+        .order_by('question__order', 'id')
+    )
+
+    answers_data = []
+    answered = 0
+    for answer in answers:
+        question = answer.question
+        if question.type == 'single' and answer.option_id:
+            selected_options = [answer.option_id]
+        elif question.type == 'multiple':
+            selected_options = [selected.option_id for selected in answer.selected_options.all()]
+        else:
+            selected_options = []
+
+        if answer.content or selected_options:
+            answered += 1
+        answers_data.append({
+            'question': {
+                'id': question.id,
+                'content': question.content,
+                'type': question.type,
+                'order': question.order
+            },
+            'content': answer.content,
+            'selected_options': selected_options,
+            'date': answer.date
+        })
+
+    return answers_data, _summary(answers_data, answered)
+
+
+def build_answers_from_snapshot(participation):
+    """
+    Serializes the answers of a participation from its snapshot and the
+    cached survey definition, without reading the answer tables. Questions
+    and options deleted since the snapshot was taken are left out, as their
+    answers would have been deleted with them.
+
+    Returns:
+        tuple: The list of answers and the summary dict.
+    """
+    snapshot = participation.snapshot
+    answers_data = []
+    answered = 0
+    for question in get_survey_definition(participation.instance):
+        entry = snapshot.get(str(question['id']))
+        if entry is None:
+            continue
+        # Las opciones borradas después de la instantánea ya no se muestran
+        option_ids = {option['id'] for option in question.get('options', [])}
+        if question['type'] == 'single' and entry.get('option') in option_ids:
+            selected_options = [entry['option']]
+        elif question['type'] == 'multiple':
+            selected_options = [option_id for option_id in entry.get('options', []) if option_id in option_ids]
+        else:
+            selected_options = []
+
+        content = entry.get('content')
+        if content or selected_options:
+            answered += 1
+        answers_data.append({
+            'question': {
+                'id': question['id'],
+                'content': question['content'],
+                'type': question['type'],
+                'order': question['order']
+            },
+            'content': content,
+            'selected_options': selected_options,
+            'date': parse_datetime(entry['date']) if entry.get('date') else None
+        })
+
+    return answers_data, _summary(answers_data, answered)
+
+
+def get_answers_data(participation):
+    """
+    Returns the serialized answers and summary of a participation.
+
+    Completed participations are served from their snapshot, so only the
+    participation row is read (the survey definition comes from the cache).
+    The others are read from the answer tables.
+
+    Args:
+        participation (Participation): The participation, with its instance
+            and survey loaded.
+
+    Returns:
+        tuple: The list of answers and the summary dict.
+    """
+    if participation.snapshot is not None:
+        return build_answers_from_snapshot(participation)
+    return build_answers_data(participation)
+
+
+def build_participation_results(participation):
+    """
+    Builds the payload of the participation results endpoint.
+
+    Args:
+        participation (Participation): The participation, with its user,
+            instance and survey loaded.
+
+    Returns:
+        dict: The participation, survey, instance, answers and summary.
+    """
+    instance = participation.instance
+    survey = instance.survey
+    answers_data, summary = get_answers_data(participation)
+    return {
+        'participation': {
+            'id': participation.id,
+            'date': participation.date,
+            'state': participation.state,
+            'user': participation.user.username if participation.user else 'Anonymous'
+        },
+        'survey': {
+            'id': survey.id,
+            'title': survey.title,
+            'description': survey.description
+        },
+        'instance': {
+            'id': instance.id,
+            'creation_date': instance.creation_date,
+            'state': instance.state
+        },
+        'answers': answers_data,
+        'summary': summary
+    }
@@ -0,0 +1,60 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Base of the renderers that only let a format pass content negotiation
+    for views that build their own streamed response.
+
+    Responses that still go through the renderer (errors such as 401, 403
+    or 404 raised before the stream is built) are rendered as JSON, with a
+    JSON content type, instead of handing the data dict to Django.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+
+class CSVRenderer(PassthroughRenderer):
+    """
+    Renderer that lets ``?format=csv`` pass content negotiation for views
+    that build their own streamed CSV response.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class XLSXRenderer(PassthroughRenderer):
+    """
+    Renderer that lets ``?format=xlsx`` pass content negotiation for views
+    that build their own streamed XLSX response.
+    """
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+    charset = None
+    render_style = 'binary'
+
+
+class JSONLinesRenderer(PassthroughRenderer):
+    """
+    Renderer that lets ``?format=jsonl`` pass content negotiation for views
+    that build their own streamed JSON Lines response.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+
+class PDFRenderer(PassthroughRenderer):
+    """
+    Renderer that lets ``Accept: application/pdf`` pass content negotiation
+    for views that return a PDF file.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
@@ -0,0 +1,152 @@
+import base64
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .charts import render_bar_chart
+from .models import Report, ReportJob, SurveyInstance
+from .stats import CHOICE_TYPES, instance_statistics
+
+REPORTS_DIR = 'reports'
+ACTIVE_JOB_STATES = ['pending', 'running']
+MAX_ATTEMPTS = 3
+
+
+def enqueue_report(instance, user=None):
+    """
+    Queues the generation of the report of an instance.
+
+    If a job for the instance is already pending or running, that job is
+    returned instead of queuing a new one. The instance row is locked while
+    looking for it, so concurrent requests for the same instance queue a
+    single job.
+
+    Returns:
+        tuple: The job and whether it was created.
+    """
+    with transaction.atomic():
+        SurveyInstance.objects.select_for_update().only('id').get(id=instance.id)
+        job = instance.report_jobs.filter(state__in=ACTIVE_JOB_STATES).order_by('-id').first()
+        if job:
+            return job, False
+        return ReportJob.objects.create(instance=instance, requested_by=user), True
+
+
+def requeue_stale_jobs(timeout):
+    """
+    Gives back to the queue the jobs whose worker died while running them.
+
+    Jobs that already used all their attempts are marked as failed.
+
+    Returns:
+        int: The number of jobs recovered.
+    """
+    limit = timezone.now() - timeout
+    stale = ReportJob.objects.filter(state='running', started_at__lt=limit)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        state='failed', error='El trabajo superó el tiempo máximo de ejecución.', finished_at=timezone.now()
+    )
+    return failed + stale.update(state='pending')
+
+
+def claim_next_job(max_running):
+    """
+    Atomically claims the oldest pending job for the calling worker.
+
+    The active jobs are locked while the running ones are counted and the
+    claim is written, so concurrent workers claim one at a time: two workers
+    can never run the same job, and no job is claimed while ``max_running``
+    jobs are already running, which caps the CPU spent on reports across all
+    workers.
+
+    Returns:
+        ReportJob: The claimed job, or ``None`` if nothing can be run now.
+    """
+    with transaction.atomic():
+        jobs = list(
+            ReportJob.objects.select_for_update()
+            .filter(state__in=ACTIVE_JOB_STATES).order_by('created_at', 'id')
+        )
+        if sum(job.state == 'running' for job in jobs) >= max_running:
+            return None
+
+        job = next((job for job in jobs if job.state == 'pending'), None)
+        if job is None:
+            return None
+        job.state = 'running'
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['state', 'started_at', 'attempts'])
+        return job
+
+
+def run_job(job):
+    """
+    Generates the report of a claimed job and records its outcome.
+    """
+    try:
+        generate_report(job.instance)
+    except Exception as e:
+        job.state = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+        job.error = str(e)
+    else:
+        job.state = 'done'
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['state', 'error', 'finished_at'])
+    return job
+
+
+def report_summary(statistics):
+    return (
+        f"{statistics['total_participations']} participaciones, "
+        f"{statistics['completed_participations']} completadas "
+        f"({statistics['completion_rate']}%)."
+    )
+
+
+def generate_report(instance):
+    """
+    Renders the PDF report of an instance under ``MEDIA_ROOT`` and stores it
+    in the instance's ``Report``.
+
+    Returns:
+        Report: The created or updated report.
+    """
+    from weasyprint import HTML
+
+    statistics = instance_statistics(instance)
+    for question_stat in statistics['questions_statistics']:
+        if question_stat['question_type'] in CHOICE_TYPES and question_stat['options_stats']:
+            options = question_stat['options_stats']
+            image = render_bar_chart(
+                [option['option_content'] for option in options],
+                [option['selections_count'] for option in options],
+                xlabel='Selecciones'
+            )
+            question_stat['chart'] = 'data:image/png;base64,' + base64.b64encode(image).decode()
+
+    html = render_to_string('reports/instance_report.html', {
+        'instance': instance,
+        'survey': instance.survey,
+        'statistics': statistics,
+        'generated_at': timezone.now(),
+    })
+
+    pdf_route = os.path.join(REPORTS_DIR, f'instance_{instance.id}.pdf')
+    pdf_path = os.path.join(settings.MEDIA_ROOT, pdf_route)
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a half-written PDF.
+    temporary_path = f'{pdf_path}.tmp'
+    HTML(string=html).write_pdf(temporary_path)
+    os.replace(temporary_path, pdf_path)
+
+    report, _ = Report.objects.update_or_create(
+        instance=instance,
+        defaults={'summary': report_summary(statistics), 'pdf_route': pdf_route, 'date': timezone.now()}
+    )
+    return report
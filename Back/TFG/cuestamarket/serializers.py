@@ -1,7 +1,16 @@
 from django.utils import timezone
 from rest_framework import serializers
-from .models import User, Role, Survey, Question, Option, Answer, Participation, SurveyInstance, Report, AnswerOption
+from .models import User, Role, Survey, Question, Option, Answer, Participation, SurveyInstance, Report, AnswerOption, ReportJob, ParticipationTally
+from rest_framework.reverse import reverse
+from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from .stats import tallied_participation_counts
+from .survey_cache import invalidate_survey_definition
+from .survey_writes import create_options, create_questions, update_options, update_questions
+from .authentication import add_user_claims
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 User = get_user_model()
 
@@ -38,6 +47,15 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token pair serializer that embeds the role and the active and staff
+    flags of the user as claims of the tokens.
+    """
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
 class RoleSerializer(serializers.ModelSerializer):
     """
     Serializer for Role model.
@@ -178,8 +196,7 @@ class QuestionSerializer(serializers.ModelSerializer):
         """
         options_data = validated_data.pop('options', [])
         question = Question.objects.create(**validated_data)
-        for option_data in options_data:
-            Option.objects.create(question=question, **option_data)
+        create_options([(question, option_data) for option_data in options_data])
         return question
 
     def update(self, instance, validated_data):
@@ -199,10 +216,8 @@ class QuestionSerializer(serializers.ModelSerializer):
         instance.type = validated_data.get('type', instance.type)
         instance.save()
         
-        instance.options.all().delete()
-        
-        for option_data in options_data:
-            Option.objects.create(question=instance, **option_data)
+        # Solo se modifican las opciones que han cambiado
+        update_options(instance, options_data)
         
         return instance
 
@@ -241,14 +256,11 @@ class SurveySerializer(serializers.ModelSerializer):
             Survey: The newly created Survey.
         """
         questions_data = validated_data.pop('questions')
-        survey = Survey.objects.create(client=self.context['request'].user, **validated_data)
-        
-        for question_data in questions_data:
-            options_data = question_data.pop('options', [])
-            question = Question.objects.create(survey=survey, **question_data)
-            for option_data in options_data:
-                Option.objects.create(question=question, **option_data)
+        with transaction.atomic():
+            survey = Survey.objects.create(client=self.context['request'].user, **validated_data)
+            create_questions(survey, questions_data)
         
+        prefetch_related_objects([survey], 'questions__options')
         return survey
 
     def update(self, instance, validated_data):
@@ -266,22 +278,39 @@ class SurveySerializer(serializers.ModelSerializer):
         
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            # Solo se modifican las preguntas y opciones que han cambiado
+            update_questions(instance, questions_data)
         
-        instance.questions.all().delete()
-        
-        for question_data in questions_data:
-            options_data = question_data.pop('options', [])
-            question = Question.objects.create(survey=instance, **question_data)
-            for option_data in options_data:
-                Option.objects.create(question=question, **option_data)
-        
-        return instance
+        invalidate_survey_definition(instance)
+        # Se devuelve una copia con las preguntas precargadas: la vista descarta
+        # la caché de prefetch de la instancia original al terminar la edición
+        return Survey.objects.prefetch_related('questions__options').get(pk=instance.pk)
 
     def get_instances_count(self, obj):
+        # Precomputed by SurveyInstanceSerializer.setup_eager_loading when available
+        if hasattr(obj, 'instances_total'):
+            return obj.instances_total
         return obj.instances.count()
-        
-    
+
+
+class SurveySummarySerializer(SurveySerializer):
+    """
+    Read-only summary of a Survey without its questions, used in listings.
+    """
+    class Meta(SurveySerializer.Meta):
+        fields = ['id', 'title', 'description', 'client', 'instances_count']
+
+
+def _aggregate_subquery(queryset, group_by, aggregate):
+    """
+    Wraps an aggregate over a correlated queryset as a subquery annotation
+    that evaluates to 0 when there are no rows.
+    """
+    total = queryset.order_by().values(group_by).annotate(total=aggregate).values('total')[:1]
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
 
 class SurveyInstanceSerializer(serializers.ModelSerializer):
     survey = SurveySerializer(read_only=True)
@@ -301,24 +330,88 @@ class SurveyInstanceSerializer(serializers.ModelSerializer):
             'days_active'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Annotates the counters of every instance and loads the survey with its
+        questions and options, so serializing a queryset takes a constant
+        number of queries regardless of its size.
+
+        Args:
+            queryset (QuerySet): The SurveyInstance queryset to serialize.
+
+        Returns:
+            QuerySet: The annotated queryset.
+        """
+        return SurveyInstanceSerializer.annotate_counts(queryset).prefetch_related('survey__questions__options')
+
+    @staticmethod
+    def annotate_counts(queryset):
+        """
+        Annotates the question, instance and participation counters read by
+        the serializer. Participations are read from their tallies.
+        """
+        return queryset.select_related('survey').annotate(
+            questions_total=_aggregate_subquery(
+                Question.objects.filter(survey=OuterRef('survey_id')), 'survey', Count('id')
+            ),
+            survey_instances_total=_aggregate_subquery(
+                SurveyInstance.objects.filter(survey=OuterRef('survey_id')), 'survey', Count('id')
+            ),
+            participations_total=_aggregate_subquery(
+                ParticipationTally.objects.filter(instance=OuterRef('pk')), 'instance', Sum('count')
+            ),
+            completed_total=_aggregate_subquery(
+                ParticipationTally.objects.filter(instance=OuterRef('pk'), state='completed'), 'instance', Sum('count')
+            ),
+        )
+
     def create(self, validated_data):
         survey = validated_data.pop('survey_id')
         instance = SurveyInstance.objects.create(survey=survey, **validated_data)
         return instance
+
+    def to_representation(self, obj):
+        if hasattr(obj, 'survey_instances_total'):
+            obj.survey.instances_total = obj.survey_instances_total
+        return super().to_representation(obj)
+
     def get_total_questions(self, obj):
+        if hasattr(obj, 'questions_total'):
+            return obj.questions_total
         return obj.survey.questions.count()
     
+    def _participation_counts(self, obj):
+        if not hasattr(obj, '_participation_counts'):
+            obj._participation_counts = tallied_participation_counts(obj)
+        return obj._participation_counts
+
     def get_total_participations(self, obj):
-        return obj.participations.count()
+        if hasattr(obj, 'participations_total'):
+            return obj.participations_total
+        return sum(self._participation_counts(obj).values())
     
     def get_completed_participations(self, obj):
-        return obj.participations.filter(state='completed').count()
+        if hasattr(obj, 'completed_total'):
+            return obj.completed_total
+        return self._participation_counts(obj).get('completed', 0)
     
     def get_days_active(self, obj):
         if obj.closure_date:
             return (obj.closure_date - obj.creation_date).days
         return (timezone.now() - obj.creation_date).days
 
+class SurveyInstanceListSerializer(SurveyInstanceSerializer):
+    """
+    Slim representation of a SurveyInstance for listings: the survey is
+    summarized without its questions.
+    """
+    survey = SurveySummarySerializer(read_only=True)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return SurveyInstanceSerializer.annotate_counts(queryset)
+
 class OptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Option
@@ -359,4 +452,22 @@ class ParticipationSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'date', 'state', 'total_answers']
     
     def get_total_answers(self, obj):
-        return obj.answers.count()
\ No newline at end of file
+        if hasattr(obj, 'answers_total'):
+            return obj.answers_total
+        return obj.answers.count()
+
+class ReportSerializer(serializers.ModelSerializer):
+    pdf_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Report
+        fields = ['id', 'date', 'summary', 'pdf_route', 'pdf_url']
+
+    def get_pdf_url(self, obj):
+        # Descarga autenticada a través de la API: MEDIA_ROOT no se sirve públicamente
+        return reverse('survey-instance-report-pdf', args=[obj.instance_id], request=self.context.get('request'))
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'state', 'attempts', 'error', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,80 @@
+from django.core.signals import request_finished, request_started
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import forget_cached_user
+from .backends.pool import mark_thread_busy, mark_thread_idle
+from .models import Participation, Survey, SurveyInstance, User
+from .survey_cache import forget_survey_definitions
+from .tallies import forget_participation, forget_participations
+
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _deleted_participations(origin):
+    """
+    Returns the participations deleted together by ``origin``: a queryset of
+    participations, or one or several users being deleted.
+    """
+    if _origin_model(origin) is Participation:
+        return origin
+    users = origin if isinstance(origin, QuerySet) else [origin]
+    # Las participaciones en encuestas del propio cliente se borran con sus instancias
+    return Participation.objects.filter(user__in=users).exclude(instance__survey__client__in=users)
+
+
+@receiver(pre_delete, sender=Participation)
+def remove_participation_from_tallies(sender, instance, origin=None, **kwargs):
+    """
+    Keeps the result tallies in sync when a participation is deleted.
+
+    Deletions cascaded from surveys and instances are skipped, as the tallies
+    of the instance are deleted with it. Deletions of several participations
+    (querysets, or cascades from users) are removed from the tallies in bulk
+    when their first participation is reached, and skipped for the rest.
+    """
+    model = _origin_model(origin)
+    if model in (Survey, SurveyInstance):
+        return
+    if origin is instance or model not in (Participation, User):
+        forget_participation(instance)
+        return
+    if not getattr(origin, '_tallies_forgotten', False):
+        forget_participations(_deleted_participations(origin))
+        origin._tallies_forgotten = True
+
+
+@receiver(pre_delete, sender=Survey)
+def remove_survey_definitions_from_cache(sender, instance, **kwargs):
+    """
+    Drops the cached public definitions of a survey that is being deleted.
+    """
+    forget_survey_definitions(instance)
+
+
+@receiver(request_started)
+def track_request_started(sender, **kwargs):
+    """
+    Marks the connection of the current thread as in use for the pool metrics.
+    """
+    mark_thread_busy()
+
+
+@receiver(request_finished)
+def track_request_finished(sender, **kwargs):
+    """
+    Marks the connection of the current thread as idle for the pool metrics.
+    """
+    mark_thread_idle()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def remove_user_from_auth_cache(sender, instance, **kwargs):
+    """
+    Drops a modified or deleted user from the authentication cache of this process.
+    """
+    forget_cached_user(instance.pk)
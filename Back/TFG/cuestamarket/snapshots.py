@@ -0,0 +1,141 @@
+from .models import Answer, AnswerOption, Participation
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _answer_entry(option_id, option_ids, content, date):
+    """
+    Returns the compact form of an answer: only the values it has are kept.
+    """
+    entry = {'date': _isoformat(date)}
+    if option_id is not None:
+        entry['option'] = option_id
+    if option_ids:
+        entry['options'] = option_ids
+    if content is not None:
+        entry['content'] = content
+    return entry
+
+
+def build_snapshots(participation_ids):
+    """
+    Reads the answers of several participations from the answer tables,
+    with two queries whatever the number of participations.
+
+    Args:
+        participation_ids (list): The participations to read.
+
+    Returns:
+        dict: For every participation id, its answers keyed by question id.
+        Each answer is a dict with its ``date`` and, when set, its
+        ``option``, its selected ``options`` (in selection order) and its
+        ``content``.
+    """
+    selected = {}
+    for answer_id, option_id in (
+        AnswerOption.objects.filter(answer__participation_id__in=participation_ids)
+        .order_by('id').values_list('answer_id', 'option_id')
+    ):
+        selected.setdefault(answer_id, []).append(option_id)
+
+    snapshots = {participation_id: {} for participation_id in participation_ids}
+    for answer_id, participation_id, question_id, option_id, content, date in (
+        Answer.objects.filter(participation_id__in=participation_ids).order_by('id')
+        .values_list('id', 'participation_id', 'question_id', 'option_id', 'content', 'date')
+    ):
+        snapshots[participation_id].setdefault(
+            question_id, _answer_entry(option_id, selected.get(answer_id), content, date)
+        )
+    return snapshots
+
+
+def build_snapshot(participation):
+    """
+    Returns the snapshot of a participation, ready to be stored in its
+    ``snapshot`` field.
+    """
+    answers = build_snapshots([participation.id])[participation.id]
+    return {str(question_id): entry for question_id, entry in answers.items()}
+
+
+def write_snapshots(participation_ids):
+    """
+    Stores the snapshot of several completed participations, with two
+    queries to read their answers and one to write them.
+    """
+    if not participation_ids:
+        return
+    Participation.objects.bulk_update([
+        Participation(id=participation_id, snapshot={
+            str(question_id): entry for question_id, entry in answers.items()
+        })
+        for participation_id, answers in build_snapshots(participation_ids).items()
+    ], ['snapshot'])
+
+
+def refresh_snapshots(participation_ids):
+    """
+    Rewrites the snapshot of participations whose answers or state have been
+    modified outside of a submission (from the admin). Completed
+    participations get a new snapshot and the others lose theirs.
+    """
+    completed = list(
+        Participation.objects.filter(id__in=participation_ids, state='completed').values_list('id', flat=True)
+    )
+    Participation.objects.filter(id__in=participation_ids, snapshot__isnull=False).exclude(id__in=completed).update(snapshot=None)
+    write_snapshots(completed)
+
+
+def load_answers(participations):
+    """
+    Returns the answers of several participations, keyed by question id.
+
+    Participations with a snapshot are served from it; the answers of the
+    others are read from the answer tables with two queries.
+
+    Args:
+        participations (iterable): ``(id, snapshot)`` pairs.
+
+    Returns:
+        dict: For every participation id, its answers keyed by question id,
+        in the format of ``build_snapshots``.
+    """
+    answers, missing = {}, []
+    for participation_id, snapshot in participations:
+        if snapshot is None:
+            missing.append(participation_id)
+        else:
+            answers[participation_id] = {int(question_id): entry for question_id, entry in snapshot.items()}
+    if missing:
+        answers.update(build_snapshots(missing))
+    return answers
+
+
+def backfill_snapshots(batch_size=SNAPSHOT_BATCH_SIZE, rebuild=False):
+    """
+    Writes the snapshot of the completed participations that do not have one,
+    in batches of ``batch_size`` participations with three queries each.
+
+    Args:
+        batch_size (int): Participations processed per batch.
+        rebuild (bool): Whether to rewrite the snapshots that already exist.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    participations = Participation.objects.filter(state='completed').order_by('id')
+    if not rebuild:
+        participations = participations.filter(snapshot__isnull=True)
+    written = 0
+    last_id = 0
+    while True:
+        ids = list(participations.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return written
+        write_snapshots(ids)
+        written += len(ids)
+        last_id = ids[-1]
@@ -0,0 +1,240 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Participation, Answer, AnswerOption, ParticipationTally, QuestionTally, OptionTally
+
+SINGLE_CHOICE_TYPES = ('single', 'single_choice')
+MULTIPLE_CHOICE_TYPES = ('multiple', 'multiple_choice')
+CHOICE_TYPES = SINGLE_CHOICE_TYPES + MULTIPLE_CHOICE_TYPES
+OPEN_TYPES = ('open', 'text', 'textarea')
+
+SAMPLE_ANSWERS_LIMIT = 5
+
+
+def participation_counts(instance):
+    """
+    Counts the participations of an instance grouped by state.
+
+    Args:
+        instance (SurveyInstance): The instance to aggregate.
+
+    Returns:
+        dict: Mapping of participation state to number of participations.
+    """
+    rows = (
+        Participation.objects.filter(instance=instance)
+        .order_by()
+        .values('state')
+        .annotate(total=Count('id'))
+    )
+    return {row['state']: row['total'] for row in rows}
+
+
+def answer_counts(instance):
+    """
+    Counts the answers of an instance grouped by question.
+
+    Returns:
+        dict: Mapping of question id to number of answers.
+    """
+    rows = (
+        Answer.objects.filter(participation__instance=instance)
+        .order_by()
+        .values('question_id')
+        .annotate(total=Count('id'))
+    )
+    return {row['question_id']: row['total'] for row in rows}
+
+
+def option_counts(instance):
+    """
+    Counts how many times each option of an instance was selected.
+
+    Single choice selections are stored in ``Answer.option`` and multiple
+    choice selections in ``AnswerOption``; both are aggregated with one
+    grouped query each and merged.
+
+    Returns:
+        dict: Mapping of option id to number of selections.
+    """
+    counts = {}
+    single_rows = (
+        Answer.objects.filter(participation__instance=instance, option__isnull=False)
+        .order_by()
+        .values('option_id')
+        .annotate(total=Count('id'))
+    )
+    multiple_rows = (
+        AnswerOption.objects.filter(answer__participation__instance=instance)
+        .order_by()
+        .values('option_id')
+        .annotate(total=Count('id'))
+    )
+    for row in list(single_rows) + list(multiple_rows):
+        counts[row['option_id']] = counts.get(row['option_id'], 0) + row['total']
+    return counts
+
+
+def sample_answers(instance, limit=SAMPLE_ANSWERS_LIMIT):
+    """
+    Fetches up to ``limit`` non-empty text answers per question in one query.
+
+    Returns:
+        dict: Mapping of question id to a list of answer contents.
+    """
+    rows = (
+        Answer.objects.filter(participation__instance=instance, content__isnull=False)
+        .exclude(content='')
+        .annotate(position=Window(RowNumber(), partition_by=F('question_id'), order_by=F('id').asc()))
+        .filter(position__lte=limit)
+        .order_by('question_id', 'position')
+        .values_list('question_id', 'content')
+    )
+    samples = {}
+    for question_id, content in rows:
+        samples.setdefault(question_id, []).append(content)
+    return samples
+
+
+def build_instance_statistics(instance, states, answers, options, samples):
+    """
+    Builds the statistics payload of an instance from precomputed counts.
+
+    Args:
+        instance (SurveyInstance): The instance the counts belong to.
+        states (dict): Participations per state.
+        answers (dict): Answers per question id.
+        options (dict): Selections per option id.
+        samples (dict): Sample text answers per question id.
+
+    Returns:
+        dict: The statistics payload served by the API.
+    """
+    total_participations = sum(states.values())
+    completed_participations = states.get('completed', 0)
+    in_progress_participations = states.get('in_progress', 0)
+
+    completion_rate = 0
+    if total_participations > 0:
+        completion_rate = (completed_participations / total_participations) * 100
+
+    questions_stats = []
+    for question in instance.survey.questions.prefetch_related('options'):
+        question_stat = {
+            'question_id': question.id,
+            'question_content': question.content,
+            'question_type': question.type,
+            'answers_count': answers.get(question.id, 0),
+            'options_stats': []
+        }
+
+        if question.type in CHOICE_TYPES:
+            for option in question.options.all():
+                option_selections = options.get(option.id, 0)
+
+                percentage = 0
+                if completed_participations > 0:
+                    percentage = (option_selections / completed_participations) * 100
+
+                question_stat['options_stats'].append({
+                    'option_id': option.id,
+                    'option_content': option.content,
+                    'selections_count': option_selections,
+                    'percentage': round(percentage, 2)
+                })
+
+        elif question.type in OPEN_TYPES:
+            question_stat['sample_answers'] = samples.get(question.id, [])
+
+        questions_stats.append(question_stat)
+
+    return {
+        'total_participations': total_participations,
+        'completed_participations': completed_participations,
+        'in_progress_participations': in_progress_participations,
+        'completion_rate': round(completion_rate, 2),
+        'creation_date': instance.creation_date,
+        'closure_date': instance.closure_date,
+        'state': instance.state,
+        'questions_statistics': questions_stats
+    }
+
+
+def tallied_participation_counts(instance):
+    """
+    Reads the participations of an instance per state from its tallies.
+
+    Returns:
+        dict: Mapping of participation state to number of participations.
+    """
+    return dict(
+        ParticipationTally.objects.filter(instance=instance).values_list('state', 'count')
+    )
+
+
+def tallied_answer_counts(instance):
+    """
+    Reads the answers of an instance per question from its tallies.
+
+    Returns:
+        dict: Mapping of question id to number of answers.
+    """
+    return dict(
+        QuestionTally.objects.filter(instance=instance).values_list('question_id', 'answers_count')
+    )
+
+
+def tallied_option_counts(instance):
+    """
+    Reads the selections of an instance per option from its tallies.
+
+    Returns:
+        dict: Mapping of option id to number of selections.
+    """
+    return dict(
+        OptionTally.objects.filter(instance=instance).values_list('option_id', 'selections_count')
+    )
+
+
+def raw_instance_statistics(instance):
+    """
+    Computes the statistics of an instance with a fixed number of queries.
+
+    Every count is obtained through grouped aggregates over the raw rows, so
+    the number of queries does not depend on the number of questions or options.
+
+    Args:
+        instance (SurveyInstance): The instance to aggregate.
+
+    Returns:
+        dict: The statistics payload served by the API.
+    """
+    return build_instance_statistics(
+        instance,
+        participation_counts(instance),
+        answer_counts(instance),
+        option_counts(instance),
+        sample_answers(instance),
+    )
+
+
+def instance_statistics(instance):
+    """
+    Builds the statistics of an instance from its maintained tallies.
+
+    Reading the tallies costs O(questions + options) regardless of how many
+    responses have been stored.
+
+    Args:
+        instance (SurveyInstance): The instance to aggregate.
+
+    Returns:
+        dict: The statistics payload served by the API.
+    """
+    return build_instance_statistics(
+        instance,
+        tallied_participation_counts(instance),
+        tallied_answer_counts(instance),
+        tallied_option_counts(instance),
+        sample_answers(instance),
+    )
@@ -0,0 +1,169 @@
+from django.db import IntegrityError, transaction
+
+from .models import Answer, AnswerOption, Option, Participation
+from .tallies import answer_deltas
+
+OPEN_ANSWER_TYPES = ['open', 'text', 'textarea']
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_or_create_participation(user, instance):
+    """
+    Returns the participation of an authenticated user in an instance,
+    creating it in progress if it does not exist. Must run inside the
+    transaction of the submission.
+
+    When a concurrent submission creates the participation first, the
+    insert fails on the (user, instance) unique constraint and is rolled
+    back to its savepoint. The row is then read with a locking read, which
+    sees the committed row even under REPEATABLE READ, where a plain read
+    would still use the snapshot taken before it.
+
+    Returns:
+        tuple: The participation and whether it was created.
+    """
+    participation = Participation.objects.filter(user=user, instance=instance).first()
+    if participation is not None:
+        return participation, False
+    try:
+        with transaction.atomic():
+            return Participation.objects.create(user=user, instance=instance, state='in_progress'), True
+    except IntegrityError:
+        return Participation.objects.select_for_update().get(user=user, instance=instance), False
+
+
+def load_question_map(survey):
+    """
+    Preloads the questions of a survey and the valid option ids of each one.
+
+    Args:
+        survey (Survey): The survey being answered.
+
+    Returns:
+        tuple: Mapping of question id to question and mapping of question id
+        to the set of its option ids.
+    """
+    questions = {question.id: question for question in survey.questions.all()}
+    options = {}
+    for option_id, question_id in Option.objects.filter(question__survey=survey).values_list('id', 'question_id'):
+        options.setdefault(question_id, set()).add(option_id)
+    return questions, options
+
+
+def parse_answers(question_map, answers_data):
+    """
+    Validates a submitted answers payload against a preloaded question map.
+
+    Entries for unknown questions are ignored and only options belonging to
+    the answered question are kept. When a question is answered more than
+    once, the last entry wins.
+
+    Args:
+        question_map (tuple): The result of ``load_question_map``.
+        answers_data (list): The ``answers`` list of the request.
+
+    Returns:
+        list: One dict per answered question with the keys ``question``,
+        ``option_id``, ``option_ids`` and ``content``.
+    """
+    questions, options = question_map
+    entries = {}
+
+    for answer_data in answers_data:
+        if not isinstance(answer_data, dict):
+            continue
+
+        question_id = _to_id(answer_data.get('question_id'))
+        question = questions.get(question_id)
+        if question is None:
+            continue
+
+        valid_options = options.get(question_id, set())
+        entry = {'question': question, 'option_id': None, 'option_ids': [], 'content': None}
+
+        if question.type == 'single':
+            option_id = _to_id(answer_data.get('option_id') or answer_data.get('selectedOption'))
+            if option_id in valid_options:
+                entry['option_id'] = option_id
+
+        elif question.type == 'multiple':
+            option_ids = answer_data.get('option_ids') or answer_data.get('selectedOptions') or []
+            if isinstance(option_ids, list):
+                for option_id in map(_to_id, option_ids):
+                    if option_id in valid_options and option_id not in entry['option_ids']:
+                        entry['option_ids'].append(option_id)
+
+        elif question.type in OPEN_ANSWER_TYPES:
+            content = answer_data.get('content')
+            content = content.strip() if isinstance(content, str) else ''
+            if content:
+                entry['content'] = content
+
+        entries[question_id] = entry
+
+    return list(entries.values())
+
+
+def save_answers(participation, entries, replace=True):
+    """
+    Writes the parsed answers of a participation in bulk.
+
+    Previous answers to the submitted questions are deleted in one statement,
+    then every ``Answer`` and every ``AnswerOption`` is inserted with a single
+    ``bulk_create`` each.
+
+    Args:
+        participation (Participation): The participation being answered.
+        entries (list): The result of ``parse_answers``.
+        replace (bool): Whether previous answers may exist and must be removed.
+
+    Returns:
+        tuple: The ``answer_deltas`` of the removed answers and of the new ones,
+        ready to be passed to ``record_answers_change``.
+    """
+    question_ids = [entry['question'].id for entry in entries]
+    removed = ({}, {})
+
+    if replace and question_ids:
+        stale = Answer.objects.filter(participation=participation, question_id__in=question_ids)
+        removed = answer_deltas(stale)
+        stale.delete()
+
+    answers = Answer.objects.bulk_create([
+        Answer(
+            participation=participation,
+            question=entry['question'],
+            option_id=entry['option_id'],
+            content=entry['content']
+        )
+        for entry in entries
+    ])
+
+    # Not every backend returns primary keys from a bulk insert (e.g. MySQL).
+    if any(answer.pk is None for answer in answers):
+        answer_ids = dict(
+            Answer.objects.filter(participation=participation, question_id__in=question_ids)
+            .values_list('question_id', 'id')
+        )
+        for answer in answers:
+            answer.pk = answer_ids[answer.question_id]
+
+    AnswerOption.objects.bulk_create([
+        AnswerOption(answer=answer, option_id=option_id)
+        for answer, entry in zip(answers, entries)
+        for option_id in entry['option_ids']
+    ])
+
+    added_questions = {question_id: 1 for question_id in question_ids}
+    added_options = {}
+    for entry in entries:
+        for option_id in entry['option_ids'] + ([entry['option_id']] if entry['option_id'] else []):
+            added_options[option_id] = added_options.get(option_id, 0) + 1
+
+    return removed, (added_questions, added_options)
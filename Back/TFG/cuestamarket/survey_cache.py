@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db.models import F, Prefetch
+
+from .models import Option, Survey
+
+SURVEY_DEFINITION_TIMEOUT = 60 * 60
+CHOICE_QUESTION_TYPES = ['single', 'multiple']
+
+
+def survey_definition_key(instance_id, version):
+    return f'survey-definition:{instance_id}:{version}'
+
+
+def build_survey_definition(survey):
+    """
+    Serializes the questions of a survey, with the options of choice questions,
+    as plain data ready to be cached.
+    """
+    questions = survey.questions.prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('id'))
+    )
+    questions_data = []
+    for question in questions:
+        question_data = {
+            'id': question.id,
+            'content': question.content,
+            'type': question.type,
+            'order': question.order
+        }
+        if question.type in CHOICE_QUESTION_TYPES:
+            question_data['options'] = [
+                {'id': option.id, 'content': option.content}
+                for option in question.options.all()
+            ]
+        questions_data.append(question_data)
+    return questions_data
+
+
+def get_survey_definition(instance):
+    """
+    Returns the serialized questions of an instance, from the cache when possible.
+
+    Entries are keyed by instance id and survey version, so bumping the
+    version makes every process miss and rebuild, whatever cache backend
+    is configured.
+
+    Args:
+        instance (SurveyInstance): The instance, with its survey loaded.
+
+    Returns:
+        list: The questions payload of the public survey endpoint.
+    """
+    key = survey_definition_key(instance.id, instance.survey.version)
+    questions_data = cache.get(key)
+    if questions_data is None:
+        questions_data = build_survey_definition(instance.survey)
+        cache.set(key, questions_data, SURVEY_DEFINITION_TIMEOUT)
+    return questions_data
+
+
+def forget_survey_definitions(survey):
+    """
+    Drops the cached definitions of every instance of a survey at its current version.
+    """
+    instance_ids = survey.instances.values_list('id', flat=True)
+    cache.delete_many([survey_definition_key(instance_id, survey.version) for instance_id in instance_ids])
+
+
+def invalidate_survey_definition(survey):
+    """
+    Invalidates the cached definitions of a survey after it has been modified.
+
+    The stored version is increased atomically, so processes holding an old
+    entry in a local cache stop using it as soon as they read the survey.
+    """
+    forget_survey_definitions(survey)
+    Survey.objects.filter(pk=survey.pk).update(version=F('version') + 1)
+    survey.refresh_from_db(fields=['version'])
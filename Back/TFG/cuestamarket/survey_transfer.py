@@ -0,0 +1,419 @@
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Answer, AnswerOption, Option, Participation, Survey, SurveyInstance, User
+from .snapshots import load_answers, write_snapshots
+from .survey_writes import OPTION_FIELDS, QUESTION_FIELDS, bulk_insert, create_questions
+from .tallies import rebuild_tallies
+
+FORMAT_NAME = 'cuestamarket-survey'
+FORMAT_VERSION = 1
+TRANSFER_CHUNK_SIZE = 1000
+# Los participantes importados se crean inactivos con este dominio de correo
+PLACEHOLDER_EMAIL_DOMAIN = 'import.invalid'
+DATE_BATCH_SIZE = 500
+JSONL_CONTENT_TYPE = 'application/x-ndjson'
+
+
+class SurveyImportError(ValueError):
+    """
+    Raised when a survey file is malformed.
+
+    Attributes:
+        line (int): The line of the file with the error, if known.
+    """
+    def __init__(self, message, line=None):
+        self.line = line
+        super().__init__(f"Line {line}: {message}" if line else message)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _iter_participation_records(instance, option_ids, chunk_size):
+    """
+    Yields the participation records of an instance, reading participations
+    with one query per chunk. Completed participations come with their
+    snapshot; the answers of the rest are read with two more queries.
+
+    ``option_ids`` maps the id of every question of the survey to the set of
+    its option ids, so answers to questions or options deleted after a snapshot was taken
+    are left out.
+    """
+    participations = instance.participations.order_by('id').values_list('id', 'user__username', 'date', 'state', 'snapshot')
+    last_id = 0
+    while True:
+        chunk = list(participations.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        answers = load_answers((row[0], row[4]) for row in chunk)
+
+        for participation_id, username, date, state, snapshot in chunk:
+            yield {
+                'record': 'participation',
+                'id': participation_id,
+                'instance': instance.id,
+                'user': username,
+                'date': _isoformat(date),
+                'state': state,
+                'answers': [
+                    _answer_record(question_id, entry, option_ids[question_id])
+                    for question_id, entry in answers[participation_id].items()
+                    if question_id in option_ids
+                ],
+            }
+        last_id = chunk[-1][0]
+
+
+def _answer_record(question_id, entry, option_ids):
+    return {
+        'question': question_id,
+        'option': entry.get('option') if entry.get('option') in option_ids else None,
+        'options': [option_id for option_id in entry.get('options', []) if option_id in option_ids],
+        'content': entry.get('content'),
+        'date': entry.get('date'),
+    }
+
+
+def iter_survey_records(survey, instances=(), chunk_size=TRANSFER_CHUNK_SIZE):
+    """
+    Yields the records of a survey export.
+
+    The export starts with a format record and the survey, followed by one
+    record per question (with its options), and for every requested
+    instance, the instance record followed by one record per participation
+    with its answers. Ids are those of the source database and are only used
+    to link the records of the file.
+
+    Args:
+        survey (Survey): The survey to export.
+        instances (iterable): Instances of the survey to export with their
+            responses. Only the definition is exported when empty.
+        chunk_size (int): Participations read per chunk.
+    """
+    yield {'record': 'format', 'name': FORMAT_NAME, 'version': FORMAT_VERSION}
+    yield {'record': 'survey', 'id': survey.id, 'title': survey.title, 'description': survey.description}
+
+    options = {}
+    for option in Option.objects.filter(question__survey=survey).order_by('id'):
+        options.setdefault(option.question_id, []).append(
+            {'id': option.id, **{field: getattr(option, field) for field in OPTION_FIELDS}}
+        )
+    option_ids = {}
+    for question in survey.questions.order_by('order', 'id'):
+        option_ids[question.id] = {option['id'] for option in options.get(question.id, [])}
+        yield {
+            'record': 'question',
+            'id': question.id,
+            **{field: getattr(question, field) for field in QUESTION_FIELDS},
+            'options': options.get(question.id, []),
+        }
+
+    for instance in instances:
+        yield {
+            'record': 'instance',
+            'id': instance.id,
+            'creation_date': _isoformat(instance.creation_date),
+            'closure_date': _isoformat(instance.closure_date),
+        }
+        yield from _iter_participation_records(instance, option_ids, chunk_size)
+
+
+def iter_jsonl(records):
+    """
+    Encodes records as JSON Lines, one line at a time.
+    """
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _parse_date(value, line):
+    if value is None:
+        return None
+    date = parse_datetime(value) if isinstance(value, str) else None
+    if date is None:
+        raise SurveyImportError(f"Invalid date: {value!r}", line)
+    return date
+
+
+def _restore_dates(model, objects, dates):
+    """
+    Sets the ``date`` of objects created with ``bulk_create`` to the given
+    values, which ``auto_now_add`` replaced with the current time.
+    """
+    dated = []
+    for obj, date in zip(objects, dates):
+        if date is not None:
+            obj.date = date
+            dated.append(obj)
+    if dated:
+        model.objects.bulk_update(dated, ['date'], batch_size=DATE_BATCH_SIZE)
+
+
+class SurveyImporter:
+    """
+    Imports a survey export as a new survey owned by ``client``.
+
+    Records are fed one at a time. Questions are created together before
+    the first instance, and participations are buffered and written in
+    chunks with ``bulk_create``, so memory use does not depend on the number
+    of participations.
+
+    By default every participant of the file becomes an inactive placeholder
+    user of this import (``import:<survey id>:<n>``, a name registration
+    does not accept), so a file can neither attach participations to real
+    accounts nor take usernames. With ``map_users`` (only for the
+    ``import_survey`` management command) participants are matched by
+    username, and unknown ones are created as inactive users without a
+    usable password.
+
+    Attributes:
+        client (User): The owner of the imported survey.
+        chunk_size (int): Participations written per chunk.
+        map_users (bool): Whether participants are matched to existing users.
+        survey (Survey): The imported survey, once its record is read.
+        instances (list): The imported instances.
+        totals (dict): Number of questions, participations and answers imported.
+    """
+    def __init__(self, client, chunk_size=TRANSFER_CHUNK_SIZE, map_users=False):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.map_users = map_users
+        self.survey = None
+        self.instances = []
+        self.totals = {'questions': 0, 'participations': 0, 'answers': 0}
+        self._format_seen = False
+        self._questions = []
+        self._question_ids = {}
+        self._option_ids = {}
+        self._instance_ids = {}
+        self._participations = []
+        self._placeholder_ids = {}
+
+    def feed(self, record, line=None):
+        if not isinstance(record, dict):
+            raise SurveyImportError('Every line must be a JSON object.', line)
+        kind = record.get('record')
+
+        if not self._format_seen:
+            if kind != 'format' or record.get('name') != FORMAT_NAME:
+                raise SurveyImportError('The file does not start with a survey export format record.', line)
+            if record.get('version') != FORMAT_VERSION:
+                raise SurveyImportError(f"Unsupported format version: {record.get('version')!r}", line)
+            self._format_seen = True
+            return
+
+        try:
+            if kind == 'survey':
+                self._add_survey(record, line)
+            elif self.survey is None:
+                raise SurveyImportError('The survey record must come before any other record.', line)
+            elif kind == 'question':
+                if self._question_ids or self.instances:
+                    raise SurveyImportError('Questions must come before the instances.', line)
+                self._questions.append((record, line))
+            elif kind == 'instance':
+                self._add_instance(record, line)
+            elif kind == 'participation':
+                self._participations.append((record, line))
+                if len(self._participations) >= self.chunk_size:
+                    self._flush_participations()
+            else:
+                raise SurveyImportError(f"Unknown record type: {kind!r}", line)
+        except (KeyError, TypeError) as e:
+            raise SurveyImportError(f"Invalid {kind} record: {e}", line)
+
+    def finish(self):
+        """
+        Writes the buffered records and rebuilds the tallies of the imported
+        instances.
+
+        Returns:
+            Survey: The imported survey.
+        """
+        if self.survey is None:
+            raise SurveyImportError('The file contains no survey.')
+        self._flush_questions()
+        self._flush_participations()
+        for instance in self.instances:
+            rebuild_tallies(instance)
+        return self.survey
+
+    def _add_survey(self, record, line):
+        if self.survey is not None:
+            raise SurveyImportError('The file contains more than one survey.', line)
+        self.survey = Survey.objects.create(
+            client=self.client, title=record['title'], description=record.get('description', '')
+        )
+
+    def _flush_questions(self):
+        if self._question_ids or not self._questions:
+            return
+        questions = create_questions(self.survey, [
+            {
+                **{field: record[field] for field in QUESTION_FIELDS if field in record},
+                'options': [
+                    {field: option[field] for field in OPTION_FIELDS}
+                    for option in record.get('options', [])
+                ],
+            }
+            for record, line in self._questions
+        ])
+
+        # Las opciones de cada pregunta se crearon en el orden del fichero
+        created_options = {}
+        for option_id, question_id in (
+            Option.objects.filter(question__survey=self.survey).order_by('id').values_list('id', 'question_id')
+        ):
+            created_options.setdefault(question_id, []).append(option_id)
+
+        for (record, line), question in zip(self._questions, questions):
+            self._question_ids[record['id']] = question.id
+            for option, option_id in zip(record.get('options', []), created_options.get(question.id, [])):
+                self._option_ids[option['id']] = option_id
+        self.totals['questions'] = len(questions)
+        self._questions = []
+
+    def _add_instance(self, record, line):
+        self._flush_questions()
+        self._flush_participations()
+        instance = SurveyInstance.objects.create(
+            survey=self.survey, closure_date=_parse_date(record.get('closure_date'), line)
+        )
+        creation_date = _parse_date(record.get('creation_date'), line)
+        if creation_date:
+            SurveyInstance.objects.filter(pk=instance.pk).update(creation_date=creation_date)
+            instance.creation_date = creation_date
+        self._instance_ids[record['id']] = instance.id
+        self.instances.append(instance)
+
+    def _user_ids(self, usernames):
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        missing = [username for username in usernames if username not in users]
+        if missing:
+            User.objects.bulk_create([
+                User(
+                    username=username, email=f"{username}@{PLACEHOLDER_EMAIL_DOMAIN}",
+                    is_active=False, password=make_password(None)
+                )
+                for username in missing
+            ])
+            users.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        return users
+
+    def _placeholder_user_ids(self, usernames):
+        missing = [username for username in usernames if username not in self._placeholder_ids]
+        if missing:
+            start = len(self._placeholder_ids)
+            names = {
+                username: f"import:{self.survey.id}:{number}"
+                for number, username in enumerate(missing, start=start + 1)
+            }
+            User.objects.bulk_create([
+                User(
+                    username=name, email=f"{name.replace(':', '.')}@{PLACEHOLDER_EMAIL_DOMAIN}",
+                    is_active=False, password=make_password(None)
+                )
+                for name in names.values()
+            ])
+            ids = dict(User.objects.filter(username__in=names.values()).values_list('username', 'id'))
+            self._placeholder_ids.update({username: ids[name] for username, name in names.items()})
+        return self._placeholder_ids
+
+    def _option_id(self, option_id, line):
+        if option_id is None:
+            return None
+        if option_id not in self._option_ids:
+            raise SurveyImportError(f"Unknown option: {option_id!r}", line)
+        return self._option_ids[option_id]
+
+    def _flush_participations(self):
+        if not self._participations:
+            return
+        chunk, self._participations = self._participations, []
+        usernames = list({record['user'] for record, line in chunk})
+        users = self._user_ids(usernames) if self.map_users else self._placeholder_user_ids(usernames)
+
+        participations, participation_dates = [], []
+        for record, line in chunk:
+            if record['instance'] not in self._instance_ids:
+                raise SurveyImportError(f"Unknown instance: {record['instance']!r}", line)
+            participations.append(Participation(
+                user_id=users[record['user']],
+                instance_id=self._instance_ids[record['instance']],
+                state=record.get('state', 'in_progress'),
+            ))
+            participation_dates.append(_parse_date(record.get('date'), line))
+        bulk_insert(Participation, participations, Participation.objects.filter(
+            instance_id__in={participation.instance_id for participation in participations},
+            user_id__in={participation.user_id for participation in participations},
+        ))
+
+        answers, answer_dates, selected = [], [], []
+        for (record, line), participation in zip(chunk, participations):
+            for answer in record.get('answers', []):
+                if answer['question'] not in self._question_ids:
+                    raise SurveyImportError(f"Unknown question: {answer['question']!r}", line)
+                answers.append(Answer(
+                    participation_id=participation.id,
+                    question_id=self._question_ids[answer['question']],
+                    option_id=self._option_id(answer.get('option'), line),
+                    content=answer.get('content'),
+                ))
+                answer_dates.append(_parse_date(answer.get('date'), line))
+                selected.append([self._option_id(option_id, line) for option_id in answer.get('options', [])])
+        bulk_insert(Answer, answers, Answer.objects.filter(
+            participation_id__in=[participation.id for participation in participations]
+        ))
+        AnswerOption.objects.bulk_create([
+            AnswerOption(answer_id=answer.id, option_id=option_id)
+            for answer, option_ids in zip(answers, selected)
+            for option_id in option_ids
+        ])
+
+        # bulk_create aplica auto_now_add: se restauran las fechas originales
+        _restore_dates(Participation, participations, participation_dates)
+        _restore_dates(Answer, answers, answer_dates)
+        write_snapshots([participation.id for participation in participations if participation.state == 'completed'])
+        self.totals['participations'] += len(participations)
+        self.totals['answers'] += len(answers)
+
+
+def import_survey(lines, client, chunk_size=TRANSFER_CHUNK_SIZE, map_users=False):
+    """
+    Imports a survey export in JSON Lines format in a single transaction.
+
+    Args:
+        lines (iterable): The lines of the file, as text or bytes.
+        client (User): The owner of the imported survey.
+        chunk_size (int): Participations written per chunk.
+        map_users (bool): Whether participants are matched to existing
+            users by username (see ``SurveyImporter``).
+
+    Returns:
+        SurveyImporter: The finished importer, with the survey, the
+        instances and the totals.
+    """
+    importer = SurveyImporter(client, chunk_size, map_users)
+    try:
+        with transaction.atomic():
+            for number, line in enumerate(lines, start=1):
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise SurveyImportError(f"Invalid JSON: {e}", number)
+                importer.feed(record, number)
+            importer.finish()
+    except IntegrityError as e:
+        # Por ejemplo, dos participaciones del mismo usuario en una instancia
+        raise SurveyImportError(f"Duplicated records: {e}")
+    return importer
@@ -0,0 +1,176 @@
+from django.db.models import Prefetch
+
+from .models import Option, Question
+
+QUESTION_FIELDS = ['content', 'type', 'order']
+OPTION_FIELDS = ['content']
+
+
+def _field_values(model, fields, data):
+    """
+    Returns the value of every field in ``data``, or the model default for
+    the fields that are missing, as a fresh create would store.
+    """
+    return {
+        field: data[field] if field in data else model._meta.get_field(field).get_default()
+        for field in fields
+    }
+
+
+def bulk_insert(model, objects, queryset):
+    """
+    Inserts objects with a single ``bulk_create`` and makes sure all of them
+    get their primary key.
+
+    Backends that cannot return the ids of a bulk insert (MySQL) leave them
+    empty; they are then read back from ``queryset``, which must select the
+    new rows only. A single multi-row INSERT assigns consecutive ids in
+    insertion order, so ordering by id matches them with the objects.
+    """
+    if not objects:
+        return objects
+    model.objects.bulk_create(objects)
+    if any(obj.pk is None for obj in objects):
+        for obj, pk in zip(objects, queryset.order_by('id').values_list('id', flat=True)):
+            obj.pk = pk
+    return objects
+
+
+def create_questions(survey, questions_data, exclude_ids=()):
+    """
+    Creates the questions of a survey and their options with one INSERT for
+    the questions and one for all the options.
+
+    Args:
+        survey (Survey): The survey that receives the questions.
+        questions_data (list): Validated question dicts, each with an
+            optional ``options`` list of option dicts.
+        exclude_ids (iterable): Ids of questions the survey already had,
+            needed to read back the new ids on MySQL.
+
+    Returns:
+        list: The created questions.
+    """
+    questions = []
+    options_data = []
+    for question_data in questions_data:
+        question_data = dict(question_data)
+        options_data.append(question_data.pop('options', None) or [])
+        questions.append(Question(survey=survey, **question_data))
+
+    bulk_insert(Question, questions, Question.objects.filter(survey=survey).exclude(id__in=list(exclude_ids)))
+    create_options([
+        (question, option_data)
+        for question, question_options in zip(questions, options_data)
+        for option_data in question_options
+    ])
+    return questions
+
+
+def create_options(pairs):
+    """
+    Creates options with a single INSERT.
+
+    Args:
+        pairs (list): ``(question, option_data)`` tuples.
+    """
+    Option.objects.bulk_create([Option(question=question, **option_data) for question, option_data in pairs])
+
+
+def copy_questions(source_survey, target_survey):
+    """
+    Copies the questions and options of a survey into another one, with two
+    queries to read them and two INSERTs to write them.
+
+    Args:
+        source_survey (Survey): The survey to copy from.
+        target_survey (Survey): The survey to copy to.
+
+    Returns:
+        list: The questions created in ``target_survey``.
+    """
+    questions = source_survey.questions.prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('id'))
+    )
+    return create_questions(target_survey, [
+        {
+            **{field: getattr(question, field) for field in QUESTION_FIELDS},
+            'options': [{field: getattr(option, field) for field in OPTION_FIELDS} for option in question.options.all()],
+        }
+        for question in questions
+    ])
+
+
+def _sync_options(pairs):
+    """
+    Applies the option lists of several questions, matching the existing
+    options by position.
+
+    Args:
+        pairs (list): ``(question, options_data)`` tuples, where the options
+            of ``question`` are already prefetched in id order.
+    """
+    changed, new, removed = [], [], []
+    for question, options_data in pairs:
+        existing = list(question.options.all())
+        for option, option_data in zip(existing, options_data):
+            values = _field_values(Option, OPTION_FIELDS, option_data)
+            if any(getattr(option, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(option, field, value)
+                changed.append(option)
+        new.extend((question, option_data) for option_data in options_data[len(existing):])
+        removed.extend(option.id for option in existing[len(options_data):])
+
+    if removed:
+        Option.objects.filter(id__in=removed).delete()
+    if changed:
+        Option.objects.bulk_update(changed, OPTION_FIELDS)
+    create_options(new)
+
+
+def update_options(question, options_data):
+    """
+    Replaces the options of a question, only touching the ones that changed.
+    """
+    question = Question.objects.prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('id'))
+    ).get(pk=question.pk)
+    _sync_options([(question, options_data or [])])
+
+
+def update_questions(survey, questions_data):
+    """
+    Replaces the questions of a survey, only touching what changed.
+
+    Questions are matched with the existing ones by position (in their
+    ``order``), and so are the options of every question. Matched rows are
+    updated only when a field differs, extra entries are created in bulk and
+    the questions and options left over are deleted. The number of queries
+    does not depend on the number of questions.
+
+    Args:
+        survey (Survey): The survey to update.
+        questions_data (list): Validated question dicts, each with an
+            optional ``options`` list of option dicts.
+    """
+    existing = list(survey.questions.prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('id'))
+    ).order_by('order', 'id'))
+
+    changed, option_pairs = [], []
+    for question, question_data in zip(existing, questions_data):
+        values = _field_values(Question, QUESTION_FIELDS, question_data)
+        if any(getattr(question, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(question, field, value)
+            changed.append(question)
+        option_pairs.append((question, question_data.get('options') or []))
+
+    removed = [question.id for question in existing[len(questions_data):]]
+    if removed:
+        Question.objects.filter(id__in=removed).delete()
+    if changed:
+        Question.objects.bulk_update(changed, QUESTION_FIELDS)
+    _sync_options(option_pairs)
+    create_questions(survey, questions_data[len(existing):], exclude_ids=[question.id for question in existing])
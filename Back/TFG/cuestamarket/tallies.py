@@ -0,0 +1,269 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import Answer, AnswerOption, Participation, ParticipationTally, QuestionTally, OptionTally, InstanceRevision
+from .stats import (
+    participation_counts, answer_counts, option_counts,
+    tallied_participation_counts, tallied_answer_counts, tallied_option_counts,
+)
+
+
+def _apply(model, key_field, count_field, instance_id, deltas):
+    """
+    Adds the given deltas to the tallies of an instance.
+
+    Missing tally rows are created first and then every row is incremented
+    with a single UPDATE, so the cost does not depend on the number of keys.
+
+    Args:
+        model (Model): The tally model to update.
+        key_field (str): The field identifying each tally row.
+        count_field (str): The field holding the counter.
+        instance_id (int): The survey instance the tallies belong to.
+        deltas (dict): Mapping of key to the amount to add.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    model.objects.bulk_create(
+        [model(instance_id=instance_id, **{key_field: key}) for key in deltas],
+        ignore_conflicts=True
+    )
+    increment = Case(
+        *[When(**{key_field: key}, then=Value(delta)) for key, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    model.objects.filter(
+        instance_id=instance_id, **{f'{key_field}__in': list(deltas)}
+    ).update(**{count_field: F(count_field) + increment})
+
+
+def touch_instance(instance_id):
+    """
+    Increases the results revision of an instance, used to build its ETags.
+    """
+    revisions = InstanceRevision.objects.filter(instance_id=instance_id)
+    if not revisions.update(revision=F('revision') + 1):
+        InstanceRevision.objects.bulk_create([InstanceRevision(instance_id=instance_id)], ignore_conflicts=True)
+        revisions.update(revision=F('revision') + 1)
+
+
+def instance_revision(instance):
+    """
+    Returns the current results revision of an instance.
+    """
+    revision = InstanceRevision.objects.filter(instance=instance).values_list('revision', flat=True).first()
+    return revision or 0
+
+
+def _subtract(current, previous):
+    keys = set(current) | set(previous)
+    return {key: current.get(key, 0) - previous.get(key, 0) for key in keys}
+
+
+def answer_deltas(answers):
+    """
+    Counts a set of answers grouped by question and by selected option.
+
+    Args:
+        answers (QuerySet): The answers to count.
+
+    Returns:
+        tuple: Mapping of question id to answers and mapping of option id to selections.
+    """
+    questions = {
+        row['question_id']: row['total']
+        for row in answers.order_by().values('question_id').annotate(total=Count('id'))
+    }
+    options = {}
+    single_rows = answers.filter(option__isnull=False).order_by().values('option_id').annotate(total=Count('id'))
+    multiple_rows = (
+        AnswerOption.objects.filter(answer__in=answers.values('id'))
+        .order_by()
+        .values('option_id')
+        .annotate(total=Count('id'))
+    )
+    for row in list(single_rows) + list(multiple_rows):
+        options[row['option_id']] = options.get(row['option_id'], 0) + row['total']
+    return questions, options
+
+
+def record_state_change(instance_id, old_state, new_state):
+    """
+    Moves one participation of an instance from ``old_state`` to ``new_state``.
+
+    Either state may be ``None`` for participations being created or deleted.
+    """
+    if old_state == new_state:
+        return
+    deltas = {}
+    if old_state is not None:
+        deltas[old_state] = -1
+    if new_state is not None:
+        deltas[new_state] = 1
+    _apply(ParticipationTally, 'state', 'count', instance_id, deltas)
+    touch_instance(instance_id)
+
+
+def record_answers(instance_id, questions, options, sign=1):
+    """
+    Adds (or with ``sign=-1`` removes) answer counts to the tallies of an instance.
+
+    Args:
+        instance_id (int): The survey instance the answers belong to.
+        questions (dict): Answers per question id.
+        options (dict): Selections per option id.
+        sign (int): 1 to add the counts, -1 to remove them.
+    """
+    _apply(QuestionTally, 'question_id', 'answers_count', instance_id,
+           {key: sign * value for key, value in questions.items()})
+    _apply(OptionTally, 'option_id', 'selections_count', instance_id,
+           {key: sign * value for key, value in options.items()})
+
+
+def record_answers_change(instance_id, before, after):
+    """
+    Records the difference between two ``answer_deltas`` snapshots of a participation.
+    """
+    record_answers(
+        instance_id,
+        _subtract(after[0], before[0]),
+        _subtract(after[1], before[1])
+    )
+    # Answers may change their content without altering any counter
+    if before[0] or after[0]:
+        touch_instance(instance_id)
+
+
+def forget_participation(participation):
+    """
+    Removes a participation and its answers from the tallies of its instance.
+    """
+    questions, options = answer_deltas(Answer.objects.filter(participation=participation))
+    record_state_change(participation.instance_id, participation.state, None)
+    record_answers(participation.instance_id, questions, options, sign=-1)
+
+
+def forget_participations(participations):
+    """
+    Removes several participations and their answers from the tallies of
+    their instances.
+
+    The participations, answers and selections are counted with grouped
+    queries, so the cost depends on the number of instances involved and not
+    on the number of participations.
+
+    Args:
+        participations (QuerySet): The participations being deleted.
+    """
+    participation_ids = participations.order_by().values('id')
+    answers = Answer.objects.filter(participation__in=participation_ids).order_by()
+    states, questions, options = {}, {}, {}
+
+    for row in participations.order_by().values('instance_id', 'state').annotate(total=Count('id')):
+        states.setdefault(row['instance_id'], {})[row['state']] = -row['total']
+    for row in answers.values('participation__instance_id', 'question_id').annotate(total=Count('id')):
+        questions.setdefault(row['participation__instance_id'], {})[row['question_id']] = row['total']
+    for row in list(
+        answers.filter(option__isnull=False).values('participation__instance_id', 'option_id').annotate(total=Count('id'))
+    ) + list(
+        AnswerOption.objects.filter(answer__participation__in=participation_ids).order_by()
+        .values('answer__participation__instance_id', 'option_id').annotate(total=Count('id'))
+    ):
+        instance_id = row.get('participation__instance_id') or row.get('answer__participation__instance_id')
+        instance_options = options.setdefault(instance_id, {})
+        instance_options[row['option_id']] = instance_options.get(row['option_id'], 0) + row['total']
+
+    for instance_id, deltas in states.items():
+        _apply(ParticipationTally, 'state', 'count', instance_id, deltas)
+        record_answers(instance_id, questions.get(instance_id, {}), options.get(instance_id, {}), sign=-1)
+        touch_instance(instance_id)
+
+
+def capture_participations(participation_ids):
+    """
+    Reads what a set of participations contributes to the tallies, so a
+    change made outside of the submission views (from the admin) can be
+    recorded with ``record_participation_changes``.
+
+    Returns:
+        dict: For every existing participation id, its instance id, its
+        state and the ``answer_deltas`` of its answers.
+    """
+    return {
+        participation_id: (instance_id, state, answer_deltas(Answer.objects.filter(participation_id=participation_id)))
+        for participation_id, instance_id, state in (
+            Participation.objects.filter(id__in=participation_ids).values_list('id', 'instance_id', 'state')
+        )
+    }
+
+
+def record_participation_changes(before, after):
+    """
+    Records the difference between two ``capture_participations`` results,
+    including participations created, deleted or moved to another instance.
+    """
+    for participation_id in set(before) | set(after):
+        old, new = before.get(participation_id), after.get(participation_id)
+        if old and new and old[0] == new[0]:
+            record_state_change(new[0], old[1], new[1])
+            record_answers_change(new[0], old[2], new[2])
+            continue
+        if old:
+            record_state_change(old[0], old[1], None)
+            record_answers(old[0], *old[2], sign=-1)
+        if new:
+            record_state_change(new[0], None, new[1])
+            record_answers(new[0], *new[2])
+
+
+def _nonzero(counts):
+    return {key: value for key, value in counts.items() if value}
+
+
+def verify_tallies(instance):
+    """
+    Compares the stored tallies of an instance with the raw rows.
+
+    Returns:
+        list: Tuples of (kind, key, stored, actual) for every mismatch.
+    """
+    stored = (
+        tallied_participation_counts(instance),
+        tallied_answer_counts(instance),
+        tallied_option_counts(instance)
+    )
+    actual = (participation_counts(instance), answer_counts(instance), option_counts(instance))
+    mismatches = []
+    for kind, stored_counts, actual_counts in zip(('state', 'question', 'option'), stored, actual):
+        stored_counts, actual_counts = _nonzero(stored_counts), _nonzero(actual_counts)
+        for key in sorted(set(stored_counts) | set(actual_counts), key=str):
+            if stored_counts.get(key, 0) != actual_counts.get(key, 0):
+                mismatches.append((kind, key, stored_counts.get(key, 0), actual_counts.get(key, 0)))
+    return mismatches
+
+
+def rebuild_tallies(instance):
+    """
+    Recomputes every tally of an instance from the raw rows.
+    """
+    with transaction.atomic():
+        ParticipationTally.objects.filter(instance=instance).delete()
+        QuestionTally.objects.filter(instance=instance).delete()
+        OptionTally.objects.filter(instance=instance).delete()
+
+        ParticipationTally.objects.bulk_create([
+            ParticipationTally(instance=instance, state=state, count=total)
+            for state, total in participation_counts(instance).items()
+        ])
+        QuestionTally.objects.bulk_create([
+            QuestionTally(instance=instance, question_id=question_id, answers_count=total)
+            for question_id, total in answer_counts(instance).items()
+        ])
+        OptionTally.objects.bulk_create([
+            OptionTally(instance=instance, option_id=option_id, selections_count=total)
+            for option_id, total in option_counts(instance).items()
+        ])
+        touch_instance(instance.id)
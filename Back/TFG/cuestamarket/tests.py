@@ -1,3 +1,678 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import itertools
+import unittest
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .crosstabs import forget_result_cubes
+from .models import (
+    Answer, AnswerOption, Option, Participation, ParticipationTally, Question, Report, ReportJob, Role, Survey,
+    SurveyInstance, User
+)
+from .pagination import EstimatedCountPaginator
+from .reports import claim_next_job, enqueue_report, requeue_stale_jobs
+from .submissions import get_or_create_participation
+from .survey_transfer import JSONL_CONTENT_TYPE, iter_jsonl, iter_survey_records
+from .tallies import answer_deltas, instance_revision, record_answers, record_state_change, verify_tallies
+from .token_state import FilteredRefreshToken, blacklist_filter, prune_tokens
+
+# Consultas máximas de una página del listado de cualquier modelo del admin
+ADMIN_CHANGELIST_QUERY_BUDGET = 12
+
+
+class AdminChangelistQueryBudgetTest(TestCase):
+    """
+    Every changelist page of the admin must cost a constant number of
+    queries: the same with a few rows as with many, and never more than
+    ``ADMIN_CHANGELIST_QUERY_BUDGET``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'admin', 'voter']:
+            Role.objects.get_or_create(name=name)
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin-password'
+        )
+
+    def populate(self, surveys):
+        client = User.objects.create_user(
+            username=f'client{surveys}', email=f'client{surveys}@example.com', password='client-password'
+        )
+        for survey_number in range(surveys):
+            survey = Survey.objects.create(client=client, title=f'Survey {survey_number}', description='')
+            single = Question.objects.create(survey=survey, content='Single', type='single', order=0)
+            multiple = Question.objects.create(survey=survey, content='Multiple', type='multiple', order=1)
+            single_options = [Option.objects.create(question=single, content=f'S{number}') for number in range(2)]
+            multiple_options = [Option.objects.create(question=multiple, content=f'M{number}') for number in range(2)]
+            instance = SurveyInstance.objects.create(survey=survey)
+            Report.objects.create(instance=instance, summary='Resumen', pdf_route='reports/report.pdf')
+
+            for voter_number in range(2):
+                voter = User.objects.create_user(
+                    username=f'voter{surveys}_{survey_number}_{voter_number}',
+                    email=f'voter{surveys}_{survey_number}_{voter_number}@example.com',
+                    password='voter-password'
+                )
+                participation = Participation.objects.create(user=voter, instance=instance, state='completed')
+                Answer.objects.create(participation=participation, question=single, option=single_options[voter_number])
+                answer = Answer.objects.create(participation=participation, question=multiple)
+                for option in multiple_options:
+                    AnswerOption.objects.create(answer=answer, option=option)
+
+    def changelist_queries(self):
+        queries = {}
+        for model in admin.site._registry:
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            queries[model._meta.label] = len(context.captured_queries)
+        return queries
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin_user)
+
+        self.populate(1)
+        few_rows = self.changelist_queries()
+        self.populate(5)
+        many_rows = self.changelist_queries()
+
+        for label, count in many_rows.items():
+            with self.subTest(model=label):
+                self.assertEqual(count, few_rows[label])
+                self.assertLessEqual(count, ADMIN_CHANGELIST_QUERY_BUDGET)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """
+    The admin paginator of the huge tables uses the table statistics when
+    there are no filters and caps the count when there are.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Role.objects.get_or_create(name='voter')
+        User.objects.bulk_create([
+            User(username=f'user{number}', email=f'user{number}@example.com') for number in range(30)
+        ])
+
+    def paginator(self, queryset, threshold, cap):
+        paginator = EstimatedCountPaginator(queryset, 10)
+        paginator.estimate_threshold = threshold
+        paginator.filtered_count_cap = cap
+        return paginator
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Writes the SQLite statistics table')
+    def test_unfiltered_count_uses_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                'UPDATE sqlite_stat1 SET stat = %s WHERE tbl = %s',
+                ['500000 1', User._meta.db_table]
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(self.paginator(User.objects.order_by('id'), 1000, 10).count, 500000)
+        # Por debajo del umbral se cuenta la tabla
+        self.assertEqual(self.paginator(User.objects.order_by('id'), 1000000, 10).count, User.objects.count())
+
+    def test_filtered_count_is_capped(self):
+        queryset = User.objects.filter(username__startswith='user').order_by('id')
+        self.assertEqual(self.paginator(queryset, 1000, 10).count, 10)
+        self.assertEqual(self.paginator(queryset, 1000, 100).count, 30)
+
+
+class ReportQueueTest(TestCase):
+    """
+    The report queue keeps a single active job per instance, never runs more
+    than ``max_running`` jobs and gives back the jobs of dead workers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Role.objects.get_or_create(name='voter')
+        client = User.objects.create_user(username='client', email='client@example.com', password='client-password')
+        survey = Survey.objects.create(client=client, title='Survey', description='')
+        cls.instances = [SurveyInstance.objects.create(survey=survey) for _ in range(2)]
+
+    def test_enqueue_returns_the_active_job(self):
+        job, created = enqueue_report(self.instances[0])
+        self.assertTrue(created)
+        self.assertEqual(enqueue_report(self.instances[0]), (job, False))
+
+    def test_claim_respects_max_running(self):
+        first, _ = enqueue_report(self.instances[0])
+        second, _ = enqueue_report(self.instances[1])
+
+        self.assertEqual(claim_next_job(1), first)
+        self.assertIsNone(claim_next_job(1))
+        self.assertEqual(claim_next_job(2), second)
+        first.refresh_from_db()
+        self.assertEqual((first.state, first.attempts), ('running', 1))
+
+    def test_stale_job_is_requeued(self):
+        enqueue_report(self.instances[0])
+        job = claim_next_job(1)
+        ReportJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(claim_next_job(1), job)
+
+
+class TallyDeletionTest(TestCase):
+    """
+    Deletions and admin edits keep the result tallies and revision of an
+    instance in sync, and cascaded deletions cost a bounded number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'admin', 'voter']:
+            Role.objects.get_or_create(name=name)
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin-password'
+        )
+        client = User.objects.create_user(username='client', email='client@example.com', password='client-password')
+        survey = Survey.objects.create(client=client, title='Survey', description='')
+        cls.question = Question.objects.create(survey=survey, content='Single', type='single', order=0)
+        cls.options = [Option.objects.create(question=cls.question, content=f'O{number}') for number in range(2)]
+        cls.instances = [SurveyInstance.objects.create(survey=survey) for _ in range(2)]
+
+    def participate(self, user, instance, option):
+        participation = Participation.objects.create(user=user, instance=instance, state='completed')
+        Answer.objects.create(participation=participation, question=self.question, option=option)
+        record_state_change(instance.id, None, 'completed')
+        record_answers(instance.id, *answer_deltas(participation.answers.all()))
+        return participation
+
+    def voter(self, name):
+        return User.objects.create_user(username=name, email=f'{name}@example.com', password='voter-password')
+
+    def assertTalliesInSync(self):
+        for instance in self.instances:
+            self.assertEqual(verify_tallies(instance), [])
+
+    def test_user_deletion_is_removed_in_bulk(self):
+        voters = [self.voter(f'voter{number}') for number in range(2)]
+        for number, voter in enumerate(voters):
+            for instance in self.instances:
+                self.participate(voter, instance, self.options[number])
+
+        with CaptureQueriesContext(connection) as few:
+            voters[0].delete()
+        for number in range(10):
+            voter = self.voter(f'extra{number}')
+            self.participate(voter, self.instances[0], self.options[0])
+        extras = User.objects.filter(username__startswith='extra')
+        with CaptureQueriesContext(connection) as many:
+            extras.delete()
+
+        self.assertTalliesInSync()
+        self.assertLessEqual(len(many.captured_queries), len(few.captured_queries))
+
+    def test_instance_deletion_skips_the_tallies(self):
+        for number in range(3):
+            self.participate(self.voter(f'voter{number}'), self.instances[0], self.options[0])
+        with CaptureQueriesContext(connection) as context:
+            self.instances[0].delete()
+        self.assertFalse(any('tally' in query['sql'] for query in context.captured_queries if 'UPDATE' in query['sql']))
+        self.assertEqual(verify_tallies(self.instances[1]), [])
+
+    def test_admin_edits_update_tallies_and_revision(self):
+        participation = self.participate(self.voter('voter'), self.instances[0], self.options[0])
+        answer = participation.answers.get()
+        revision = instance_revision(self.instances[0])
+        self.client.force_login(self.admin_user)
+
+        response = self.client.post(reverse('admin:cuestamarket_answer_change', args=[answer.id]), {
+            'participation': participation.id, 'question': self.question.id, 'option': self.options[1].id,
+            'content': '',
+            'selected_options-TOTAL_FORMS': 0, 'selected_options-INITIAL_FORMS': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTalliesInSync()
+        self.assertGreater(instance_revision(self.instances[0]), revision)
+
+        response = self.client.post(reverse('admin:cuestamarket_participation_change', args=[participation.id]), {
+            'user': participation.user_id, 'instance': self.instances[0].id, 'state': 'in_progress',
+            'answers-TOTAL_FORMS': 1, 'answers-INITIAL_FORMS': 1,
+            'answers-0-id': answer.id, 'answers-0-participation': participation.id,
+            'answers-0-question': self.question.id, 'answers-0-option': self.options[1].id, 'answers-0-content': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTalliesInSync()
+        self.assertEqual(ParticipationTally.objects.get(instance=self.instances[0], state='in_progress').count, 1)
+
+
+class StreamingFormatErrorTest(TestCase):
+    """
+    Errors of the streaming export endpoints are returned as JSON whatever
+    the format requested.
+    """
+
+    def test_errors_are_rendered_as_json(self):
+        url = reverse('survey-configuration-export-data', args=[1])
+        for format_params, headers in [
+            ({'format': 'csv'}, {}),
+            ({'format': 'xlsx'}, {}),
+            ({}, {'HTTP_ACCEPT': 'text/csv'}),
+        ]:
+            with self.subTest(format=format_params, headers=headers):
+                response = self.client.get(url, format_params, **headers)
+                self.assertGreaterEqual(response.status_code, 400)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+
+class ChartTimeoutTest(TestCase):
+    """
+    A chart that the render pool does not return in time is cancelled and
+    answered with a 503 instead of a bare 500.
+    """
+
+    def test_render_timeout_returns_503(self):
+        future = Future()
+        executor = mock.Mock(submit=mock.Mock(return_value=future))
+        with mock.patch('cuestamarket.charts._get_executor', return_value=executor), \
+                mock.patch('cuestamarket.charts.CHART_RENDER_TIMEOUT', 0):
+            response = self.client.post(
+                reverse('generar_grafica'), {'data': [[0, 1], [1, 2]]}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('error', response.json())
+        self.assertTrue(future.cancelled())
+
+
+class ReportPdfTest(TestCase):
+    """
+    The PDF of a report is only served through the API, to the client who
+    owns the instance.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'admin', 'voter']:
+            Role.objects.get_or_create(name=name)
+        client_role = Role.objects.get(name='client')
+        cls.owner, cls.other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='password', role=client_role)
+            for name in ['owner', 'other']
+        ]
+        survey = Survey.objects.create(client=cls.owner, title='Survey', description='')
+        cls.instance = SurveyInstance.objects.create(survey=survey, closure_date=timezone.now() + timedelta(days=1))
+        Report.objects.create(instance=cls.instance, summary='Resumen', pdf_route='reports/instance.pdf')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.makedirs(os.path.join(media_root, 'reports'))
+        with open(os.path.join(media_root, 'reports', 'instance.pdf'), 'wb') as pdf:
+            pdf.write(b'%PDF-1.4 report')
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.api = APIClient()
+
+    def test_only_the_owner_downloads_the_pdf(self):
+        url = reverse('survey-instance-report-pdf', args=[self.instance.id])
+        self.assertEqual(self.api.get(url).status_code, 401)
+
+        self.api.force_authenticate(self.other)
+        self.assertEqual(self.api.get(url).status_code, 404)
+
+        self.api.force_authenticate(self.owner)
+        response = self.api.get(url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 report')
+
+        report = self.api.get(reverse('survey-instance-report', args=[self.instance.id])).json()['report']
+        self.assertTrue(report['pdf_url'].endswith(url))
+
+
+class SurveyImportUsersTest(TestCase):
+    """
+    Surveys imported through the API never attach participations to
+    existing accounts nor create users with the names of the file.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'admin', 'voter']:
+            Role.objects.get_or_create(name=name)
+        client_role = Role.objects.get(name='client')
+        cls.importer = User.objects.create_user(
+            username='importer', email='importer@example.com', password='password', role=client_role
+        )
+        cls.admin_user = User.objects.create_superuser(username='admin', email='admin@example.com', password='password')
+        survey = Survey.objects.create(client=cls.admin_user, title='Survey', description='')
+        question = Question.objects.create(survey=survey, content='Single', type='single', order=0)
+        option = Option.objects.create(question=question, content='Yes')
+        instance = SurveyInstance.objects.create(survey=survey)
+        for user in [cls.admin_user, User(username='ghost', email='ghost@example.com')]:
+            user.save()
+            participation = Participation.objects.create(user=user, instance=instance, state='completed')
+            Answer.objects.create(participation=participation, question=question, option=option)
+        cls.export = b''.join(
+            line if isinstance(line, bytes) else line.encode() for line in iter_jsonl(iter_survey_records(survey, [instance]))
+        )
+        # Un participante del fichero que no existe en este sistema
+        User.objects.filter(username='ghost').delete()
+
+    def test_participants_become_placeholders(self):
+        api = APIClient()
+        api.force_authenticate(self.importer)
+        response = api.post(reverse('survey-import-jsonl'), self.export, content_type=JSONL_CONTENT_TYPE)
+        self.assertEqual(response.status_code, 201, response.content)
+
+        participants = User.objects.filter(participations__instance_id__in=response.json()['instance_ids'])
+        survey_id = response.json()['survey_id']
+        self.assertEqual(
+            sorted(participants.values_list('username', 'is_active')),
+            [(f'import:{survey_id}:1', False), (f'import:{survey_id}:2', False)]
+        )
+        self.assertFalse(self.admin_user.participations.filter(instance__survey_id=survey_id).exists())
+        self.assertFalse(User.objects.filter(username='ghost').exists())
+
+
+class ConcurrentParticipationTest(TestCase):
+    """
+    A submission that loses the race to create the participation of a user
+    reuses the one created by the winner instead of failing.
+    """
+
+    def test_lost_race_returns_the_existing_participation(self):
+        Role.objects.get_or_create(name='voter')
+        client = User.objects.create_user(username='client', email='client@example.com', password='password')
+        voter = User.objects.create_user(username='voter', email='voter@example.com', password='password')
+        instance = SurveyInstance.objects.create(survey=Survey.objects.create(client=client, title='Survey', description=''))
+        existing = Participation.objects.create(user=voter, instance=instance, state='in_progress')
+
+        # El envío concurrente no vio la participación en su primera lectura
+        with transaction.atomic(), mock.patch.object(QuerySet, 'first', return_value=None):
+            participation, created = get_or_create_participation(voter, instance)
+        self.assertEqual((participation, created), (existing, False))
+
+
+class CrosstabTest(TestCase):
+    """
+    The crosstabs of the result cube match the same counts made with the
+    ORM, for single and multiple choice questions, filters and states.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'admin', 'voter']:
+            Role.objects.get_or_create(name=name)
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='password', role=Role.objects.get(name='client')
+        )
+        survey = Survey.objects.create(client=cls.owner, title='Survey', description='')
+        cls.instance = SurveyInstance.objects.create(survey=survey, closure_date=timezone.now() + timedelta(days=1))
+        cls.questions, cls.options = [], {}
+        for order, (question_type, options) in enumerate([('single', 3), ('single', 2), ('multiple', 3)]):
+            question = Question.objects.create(survey=survey, content=f'Q{order}', type=question_type, order=order)
+            cls.questions.append(question)
+            cls.options[question.id] = [
+                Option.objects.create(question=question, content=f'Q{order} O{number}') for number in range(options)
+            ]
+        Question.objects.create(survey=survey, content='Open', type='open', order=3)
+
+        single, second, multiple = cls.questions
+        for number in range(15):
+            voter = User.objects.create_user(username=f'voter{number}', email=f'voter{number}@example.com', password='password')
+            participation = Participation.objects.create(
+                user=voter, instance=cls.instance, state='in_progress' if number % 4 == 0 else 'completed'
+            )
+            # Algunas participaciones dejan preguntas sin responder
+            if number % 5 != 4:
+                Answer.objects.create(participation=participation, question=single, option=cls.options[single.id][number % 3])
+            Answer.objects.create(participation=participation, question=second, option=cls.options[second.id][number // 8])
+            answer = Answer.objects.create(participation=participation, question=multiple)
+            for index, option in enumerate(cls.options[multiple.id]):
+                if (number >> index) & 1:
+                    AnswerOption.objects.create(answer=answer, option=option)
+
+    def setUp(self):
+        forget_result_cubes()
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+    def orm_crosstab(self, questions, filters=None, states=None):
+        participations = Participation.objects.filter(instance=self.instance)
+        if states:
+            participations = participations.filter(state__in=states)
+        for question_id, option_ids in (filters or {}).items():
+            participations = participations.filter(
+                Q(answers__question_id=question_id, answers__option_id__in=option_ids)
+                | Q(answers__question_id=question_id, answers__selected_options__option_id__in=option_ids)
+            )
+        participations = Participation.objects.filter(id__in=participations.values('id'))
+
+        def count(cell):
+            chosen = participations
+            for question, option in zip(questions, cell):
+                chosen = chosen.filter(
+                    Q(answers__question=question, answers__option=option)
+                    | Q(answers__question=question, answers__selected_options__option=option)
+                )
+            return chosen.distinct().count()
+
+        shape = [self.options[question.id] for question in questions]
+
+        def nest(prefix, remaining):
+            if not remaining:
+                return count(prefix)
+            return [nest(prefix + [option], remaining[1:]) for option in remaining[0]]
+
+        return participations.count(), nest([], shape)
+
+    def get_crosstab(self, **params):
+        return self.api.get(reverse('survey-instance-crosstab', args=[self.instance.id]), params)
+
+    def assertCrosstab(self, questions, params, filters=None, states=None):
+        response = self.get_crosstab(questions=','.join(str(question.id) for question in questions), **params)
+        self.assertEqual(response.status_code, 200, response.content)
+        participations, counts = self.orm_crosstab(questions, filters, states)
+        self.assertEqual(response.json()['participations'], participations)
+        self.assertEqual(response.json()['counts'], counts)
+
+    def test_two_and_three_way_crosstabs(self):
+        single, second, multiple = self.questions
+        for questions in itertools.permutations(self.questions, 2):
+            with self.subTest(questions=[question.content for question in questions]):
+                self.assertCrosstab(list(questions), {})
+        self.assertCrosstab([single, multiple, second], {})
+
+    def test_filtered_crosstab(self):
+        single, second, multiple = self.questions
+        options = [option.id for option in self.options[multiple.id][:2]]
+        self.assertCrosstab(
+            [single, second], {'filter': f"{multiple.id}:{','.join(map(str, options))}"},
+            filters={multiple.id: options}
+        )
+
+    def test_state_restricted_crosstab(self):
+        single, second, multiple = self.questions
+        self.assertCrosstab([single, multiple], {'state': 'completed'}, states=['completed'])
+
+    def test_invalid_crosstabs_return_400(self):
+        single, second, multiple = self.questions
+        open_question = Question.objects.get(survey=self.instance.survey, type='open')
+        for params in [
+            {'questions': str(single.id)},
+            {'questions': 'a,b'},
+            {'questions': f'{single.id},{open_question.id}'},
+            {'questions': f'{single.id},{second.id}', 'filter': f'{multiple.id}:{self.options[single.id][0].id}'},
+            {'questions': f'{single.id},{second.id}', 'filter': 'nonsense'},
+        ]:
+            with self.subTest(params=params):
+                response = self.get_crosstab(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Invalid crosstab')
+
+
+class TokenBlacklistTest(TestCase):
+    """
+    Blacklisted refresh tokens are rejected whether they were blacklisted by
+    this process or written to the table by another one, and pruning only
+    deletes the tokens that have expired.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Role.objects.get_or_create(name='voter')
+        cls.user = User.objects.create_user(
+            username='voter', email='voter@example.com', password='voter-password', is_active=True
+        )
+
+    def setUp(self):
+        # El filtro y los tokens conocidos son estado del proceso compartido entre tests
+        blacklist_filter.reset()
+        known_patch = mock.patch.dict('cuestamarket.token_state._known_blacklisted', clear=True)
+        known_patch.start()
+        self.addCleanup(known_patch.stop)
+        self.addCleanup(blacklist_filter.reset)
+
+    def refresh(self, token):
+        self.client.cookies['refresh_token'] = str(token)
+        return self.client.post(reverse('token_refresh'))
+
+    def test_logout_blacklists_refresh_token(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+
+        self.client.cookies['refresh_token'] = str(token)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=token['jti']).exists())
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'Invalid token')
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=3600)
+    def test_filter_picks_up_rows_blacklisted_elsewhere(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        blacklist_filter.sync(force=True)
+        FilteredRefreshToken(str(token))
+
+        # Fila escrita por otro worker: este proceso no la ve hasta sincronizar
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        FilteredRefreshToken(str(token))
+
+        blacklist_filter.sync(force=True)
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+        self.assertEqual(self.refresh(token).status_code, 400)
+
+    def test_prune_deletes_only_expired_tokens(self):
+        now = timezone.now()
+        tokens = {}
+        for name, expires_at in [
+            ('expired', now - timedelta(days=1)), ('expired_blacklisted', now - timedelta(days=1)),
+            ('alive', now + timedelta(days=1)), ('alive_blacklisted', now + timedelta(days=1)),
+        ]:
+            tokens[name] = OutstandingToken.objects.create(
+                user=self.user, jti=name, token=name, expires_at=expires_at
+            )
+        for name in ['expired_blacklisted', 'alive_blacklisted']:
+            BlacklistedToken.objects.create(token=tokens[name])
+
+        self.assertEqual(prune_tokens(batch_size=1), (2, 1))
+
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)), {'alive', 'alive_blacklisted'}
+        )
+        self.assertEqual(
+            list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['alive_blacklisted']
+        )
+
+
+class SurveySubmitTest(TestCase):
+    """
+    A partial save followed by a full submission replaces the saved answers,
+    completes the participation and leaves the tallies in sync.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['client', 'voter']:
+            Role.objects.get_or_create(name=name)
+        client = User.objects.create_user(username='client', email='client@example.com', password='client-password')
+        cls.voter = User.objects.create_user(username='voter', email='voter@example.com', password='voter-password')
+        survey = Survey.objects.create(client=client, title='Survey', description='')
+        cls.single = Question.objects.create(survey=survey, content='Single', type='single', order=0)
+        cls.multiple = Question.objects.create(survey=survey, content='Multiple', type='multiple', order=1)
+        cls.open = Question.objects.create(survey=survey, content='Open', type='open', order=2)
+        cls.single_options = [Option.objects.create(question=cls.single, content=f'S{number}') for number in range(2)]
+        cls.multiple_options = [
+            Option.objects.create(question=cls.multiple, content=f'M{number}') for number in range(3)
+        ]
+        cls.instance = SurveyInstance.objects.create(survey=survey, closure_date=timezone.now() + timedelta(days=1))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.voter)
+
+    def submit(self, answers, completed):
+        return self.api.post(
+            reverse('survey-submit', args=[self.instance.id]), {'answers': answers, 'completed': completed},
+            format='json'
+        )
+
+    def saved_answers(self):
+        participation = Participation.objects.get(user=self.voter, instance=self.instance)
+        answers = {answer.question_id: answer for answer in participation.answers.all()}
+        selected = set(
+            AnswerOption.objects.filter(answer__participation=participation).values_list('option_id', flat=True)
+        )
+        return participation, answers, selected
+
+    def test_partial_save_then_full_replace(self):
+        response = self.submit([
+            {'question_id': self.single.id, 'option_id': self.single_options[0].id},
+            {'question_id': self.multiple.id, 'option_ids': [self.multiple_options[0].id, self.multiple_options[1].id]},
+        ], completed=False)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(verify_tallies(self.instance), [])
+
+        participation, answers, selected = self.saved_answers()
+        self.assertEqual(participation.state, 'in_progress')
+        self.assertEqual(set(answers), {self.single.id, self.multiple.id})
+        self.assertEqual(answers[self.single.id].option_id, self.single_options[0].id)
+        self.assertEqual(selected, {self.multiple_options[0].id, self.multiple_options[1].id})
+
+        response = self.submit([
+            {'question_id': self.single.id, 'option_id': self.single_options[1].id},
+            {'question_id': self.multiple.id, 'option_ids': [self.multiple_options[2].id]},
+            {'question_id': self.open.id, 'content': ' Texto libre '},
+        ], completed=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(verify_tallies(self.instance), [])
+
+        participation, answers, selected = self.saved_answers()
+        self.assertEqual(participation.state, 'completed')
+        self.assertEqual(set(answers), {self.single.id, self.multiple.id, self.open.id})
+        self.assertEqual(answers[self.single.id].option_id, self.single_options[1].id)
+        self.assertEqual(answers[self.open.id].content, 'Texto libre')
+        self.assertEqual(selected, {self.multiple_options[2].id})
+        self.assertEqual(Answer.objects.count(), 3)
+
+        # Una participación completada no admite más envíos
+        response = self.submit([{'question_id': self.open.id, 'content': 'Otro'}], completed=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(verify_tallies(self.instance), [])
@@ -0,0 +1,251 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Capacidad inicial y tasa de falsos positivos del filtro de Bloom
+FILTER_CAPACITY = 100000
+FILTER_ERROR_RATE = 0.001
+# Los ids autoincrementales pueden confirmarse fuera de orden entre
+# transacciones concurrentes, así que cada sincronización vuelve a leer las
+# últimas filas ya vistas.
+SYNC_ID_OVERLAP = 100
+# Tokens confirmados en la lista negra que se recuerdan sin consultar la base de datos
+KNOWN_BLACKLISTED_SIZE = 10000
+PRUNE_BATCH_SIZE = 5000
+
+
+class BloomFilter:
+    """
+    A fixed-size bloom filter of strings.
+
+    It answers whether a string may have been added, with no false negatives
+    and a false positive rate close to ``error_rate`` while it holds at most
+    ``capacity`` strings.
+
+    Attributes:
+        capacity (int): The number of strings the filter is sized for.
+        size (int): The number of bits of the filter.
+        hashes (int): The number of bits set per string.
+        count (int): The number of distinct strings added (strings that
+            were already in the filter are not counted again).
+    """
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + number * second) % self.size for number in range(self.hashes)]
+
+    def add(self, value):
+        new = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """
+    In-process filter in front of the refresh token blacklist.
+
+    The filter holds the jti of every blacklisted token that has not expired
+    and is kept up to date by reading the new rows of the blacklist at most
+    every ``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds. Tokens that are not in
+    the filter are valid without querying the database; tokens that may be
+    in it are looked up as usual. Tokens blacklisted by another worker are
+    therefore accepted for at most the sync interval.
+
+    When the filter is full it is rebuilt from the database with twice the
+    capacity, which also drops the tokens that have expired.
+    """
+    def __init__(self, capacity=FILTER_CAPACITY, error_rate=FILTER_ERROR_RATE):
+        self.initial_capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bloom = None
+            self.last_id = 0
+            self.synced_at = None
+            self.rebuilds = 0
+            self.rebuild_seconds = 0.0
+
+    def _add_rows(self, rows):
+        for row_id, jti in rows:
+            self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+
+    def _rebuild(self):
+        start = time.perf_counter()
+        alive = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        capacity = max(self.initial_capacity, 2 * alive.count())
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        self.last_id = 0
+        self._add_rows(alive.order_by().values_list('id', 'token__jti').iterator(chunk_size=PRUNE_BATCH_SIZE))
+        self.rebuilds += 1
+        self.rebuild_seconds = time.perf_counter() - start
+
+    def sync(self, force=False):
+        """
+        Adds to the filter the tokens blacklisted since the last sync.
+        """
+        interval = settings.TOKEN_BLACKLIST_SYNC_INTERVAL
+        now = time.monotonic()
+        if not force and self.bloom is not None and now - self.synced_at < interval:
+            return
+        with self._lock:
+            if not force and self.bloom is not None and now - self.synced_at < interval:
+                return
+            if self.bloom is None or self.bloom.count > self.bloom.capacity:
+                self._rebuild()
+            else:
+                self._add_rows(
+                    BlacklistedToken.objects.filter(id__gt=self.last_id - SYNC_ID_OVERLAP)
+                    .order_by().values_list('id', 'token__jti')
+                )
+            self.synced_at = time.monotonic()
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+
+blacklist_filter = BlacklistFilter()
+
+_known_blacklisted = OrderedDict()
+_metrics_lock = threading.Lock()
+_metrics = {'checks': 0, 'filtered': 0, 'known': 0, 'lookups': 0, 'false_positives': 0}
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def _remember_blacklisted(jti):
+    with _metrics_lock:
+        _known_blacklisted[jti] = True
+        _known_blacklisted.move_to_end(jti)
+        if len(_known_blacklisted) > KNOWN_BLACKLISTED_SIZE:
+            _known_blacklisted.popitem(last=False)
+
+
+def is_blacklisted(jti):
+    """
+    Checks whether a refresh token is in the blacklist.
+
+    Args:
+        jti (str): The ``jti`` claim of the token.
+
+    Returns:
+        bool: True if the token has been blacklisted.
+    """
+    _count('checks')
+    use_filter = settings.TOKEN_BLACKLIST_SYNC_INTERVAL > 0
+    if use_filter:
+        with _metrics_lock:
+            known = jti in _known_blacklisted
+        if known:
+            _count('known')
+            return True
+        if not blacklist_filter.might_contain(jti):
+            _count('filtered')
+            return False
+
+    _count('lookups')
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    if blacklisted:
+        _remember_blacklisted(jti)
+    elif use_filter:
+        _count('false_positives')
+    return blacklisted
+
+
+def blacklist_metrics():
+    """
+    Returns the blacklist check counters of the current process.
+
+    Returns:
+        dict: Checks answered by the filter, by the known tokens and by the
+        database, false positives of the filter, and its size.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    bloom = blacklist_filter.bloom
+    metrics.update({
+        'db_lookup_rate': round(metrics['lookups'] / metrics['checks'], 4) if metrics['checks'] else 0,
+        'filter_tokens': bloom.count if bloom else 0,
+        'filter_capacity': bloom.capacity if bloom else 0,
+        'filter_bytes': len(bloom.bits) if bloom else 0,
+        'filter_rebuilds': blacklist_filter.rebuilds,
+        'filter_rebuild_ms': round(blacklist_filter.rebuild_seconds * 1000, 2),
+    })
+    return metrics
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    A refresh token whose blacklist check goes through ``is_blacklisted``.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        jti = self.payload[api_settings.JTI_CLAIM]
+        _remember_blacklisted(jti)
+        blacklist_filter.add(jti)
+        return result
+
+
+def prune_tokens(batch_size=PRUNE_BATCH_SIZE):
+    """
+    Deletes the outstanding and blacklisted tokens that have expired.
+
+    Rows are deleted in batches of ``batch_size`` so each statement stays
+    short and does not lock the tables for long.
+
+    Returns:
+        tuple: The number of outstanding and blacklisted tokens deleted.
+    """
+    now = timezone.now()
+    outstanding_deleted = blacklisted_deleted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by().values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return outstanding_deleted, blacklisted_deleted
+        blacklisted_deleted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+        outstanding_deleted += OutstandingToken.objects.filter(id__in=ids).delete()[0]
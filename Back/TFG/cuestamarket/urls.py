@@ -14,6 +14,8 @@ from .views import (
     LogoutView,
     UserAdminViewSet,
     RoleListView,
+    DatabaseDiagnosticsView,
+    AuthDiagnosticsView,
     UserProfileView,
     SurveyViewSet,
     SurveyInstanceViewSet,
@@ -55,6 +57,10 @@ urlpatterns = [
     path('users/my-profile', UserProfileView.as_view(), name='my-profile'),
     path('roles', RoleListView.as_view(), name='role-list'),
 
+    # Diagnóstico
+    path('admin/diagnostics/db', DatabaseDiagnosticsView.as_view(), name='diagnostics-db'),
+    path('admin/diagnostics/auth', AuthDiagnosticsView.as_view(), name='diagnostics-auth'),
+
 
     # Encuesta pública y envío
     path('surveys/<int:instance_id>/public/', SurveyPublicAPIView.as_view(), name='survey-public'),
@@ -20,6 +20,8 @@ from .auth_views import (
 from .admin_views import (
     UserAdminViewSet,
     RoleListView,
+    DatabaseDiagnosticsView,
+    AuthDiagnosticsView,
 )
 
 from .profile_views import (
@@ -58,7 +60,7 @@ __all__ = [
     "PasswordResetRequestView", "PasswordResetConfirmView", "ChangePasswordView", "PasswordValidationView",
 
     # Admin
-    "UserAdminViewSet", "RoleListView", "IsAdmin",
+    "UserAdminViewSet", "RoleListView", "IsAdmin", "DatabaseDiagnosticsView", "AuthDiagnosticsView",
 
     # Profile
     "UserProfileView",
@@ -4,6 +4,9 @@ from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
+from ..authentication import auth_metrics
+from ..backends.pool import pool_metrics
+from ..token_state import blacklist_metrics
 from ..models import User, Role
 from ..serializers import UserSerializer, RoleSerializer
 from .auth_views import IsAdmin
@@ -24,11 +27,13 @@ class UserAdminViewSet(viewsets.ModelViewSet):
         permission_classes (list): The list of permissions required to access
             this viewset. It requires the user to be authenticated and to be
             an admin.
+        cursor_ordering (str): The ordering used to paginate the users.
     """
 
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('role')
     serializer_class = UserSerializer
     permission_classes = [IsAdmin]
+    cursor_ordering = 'id'
 
     def update(self, request, *args, **kwargs):
         """
@@ -118,3 +123,63 @@ class RoleListView(APIView):
         roles = Role.objects.all()
         serializer = RoleSerializer(roles, many=True)
         return Response(serializer.data)
+
+
+class DatabaseDiagnosticsView(APIView):
+    """
+    API view for the database connection pool metrics.
+
+    This view reports the persistent connections of the gunicorn worker
+    that serves the request: how many are open, in use and idle, how many
+    were opened and closed, and how long opening them took. It requires the
+    user to have admin permissions to access the endpoint.
+
+    Attributes:
+        permission_classes (list): A list of permission classes that
+            are required to access this view. It requires the user
+            to be an admin.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        """
+        Retrieve the connection pool metrics.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            Response: A Response object containing the metrics of the worker.
+        """
+        return Response(pool_metrics())
+
+
+class AuthDiagnosticsView(APIView):
+    """
+    API view for the authentication metrics.
+
+    This view reports the access tokens validated by the gunicorn worker
+    that serves the request and how long validating them took, the tokens
+    rejected by reason, and how many authenticated users had to be loaded
+    from the database, as well as how many refresh token blacklist checks
+    were answered without querying the database. It requires the user to
+    have admin permissions to access the endpoint.
+
+    Attributes:
+        permission_classes (list): A list of permission classes that
+            are required to access this view. It requires the user
+            to be an admin.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        """
+        Retrieve the authentication metrics.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            Response: A Response object containing the metrics of the worker.
+        """
+        return Response({**auth_metrics(), 'blacklist': blacklist_metrics()})
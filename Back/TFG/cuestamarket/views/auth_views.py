@@ -2,25 +2,23 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.settings import api_settings
 from rest_framework.permissions import BasePermission
 from rest_framework import status
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMultiAlternatives
 from django.contrib.auth.tokens import default_token_generator
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
-from django.utils.encoding import force_bytes
 from mi_tfg import settings
-import os
 from ..models import User
 from datetime import datetime, timedelta, timezone
-from ..utils import send_activation_email
-from ..serializers import RegisterSerializer
+from ..utils import queue_activation_email
+from ..mailer import enqueue_email
+from ..mail_templates import compose_password_reset_email
+from ..serializers import RegisterSerializer, ClaimsTokenObtainPairSerializer
+from ..authentication import add_user_claims
+from ..token_state import FilteredRefreshToken
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -29,7 +27,7 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            send_activation_email(user, request)
+            queue_activation_email(user)
             return Response({"message": "Usuario registrado. Revisa tu email para activar tu cuenta."},
                             status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -61,9 +59,9 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
     Attributes:
         serializer_class (Serializer): The serializer class used for token
-            pair generation, set to TokenObtainPairSerializer.
+            pair generation, set to ClaimsTokenObtainPairSerializer.
     """
-    serializer_class = TokenObtainPairSerializer
+    serializer_class = ClaimsTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
         """
@@ -123,25 +121,9 @@ class PasswordResetRequestView(APIView):
         except User.DoesNotExist:
             return Response({"message": "Si el email está registrado, recibirás un enlace."}, status=status.HTTP_200_OK)
 
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = default_token_generator.make_token(user)
-
-        reset_url = f"{os.getenv('FRONTEND_URL')}/reset-password/{uid}/{token}"
-
-        html_message = render_to_string("emails/password_reset_mail.html", {
-            "user": user,
-            "reset_url": reset_url,
-        })
-
-        plain_message = f"Hola {user.username},\n\nPara cambiar tu contraseña, visita este enlace:\n{reset_url}"
-
-        email_obj = EmailMultiAlternatives(
-            subject="Restablecer contraseña",
-            body=plain_message,
-            to=[user.email],
-        )
-        email_obj.attach_alternative(html_message, "text/html")
-        email_obj.send()
+        # El correo lo envía run_mail_worker; la petición no espera al servidor SMTP
+        subject, plain_message, html_message = compose_password_reset_email(user)
+        enqueue_email(subject, plain_message, user.email, html_message)
 
         return Response({"message": "Si el email está registrado, recibirás un enlace."}, status=status.HTTP_200_OK)
 
@@ -226,8 +208,17 @@ class CookieTokenRefreshView(TokenRefreshView):
         if not refresh_token:
             return Response({'detail': 'No refresh token provided'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            token = RefreshToken(refresh_token)
-            new_access_token = str(token.access_token)
+            token = FilteredRefreshToken(refresh_token)
+            access_token = token.access_token
+            if settings.AUTH_TOKEN_CLAIMS:
+                # Los claims del nuevo token reflejan el rol y estado actuales del usuario
+                user = User.objects.select_related('role').get(
+                    **{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]}
+                )
+                if not user.is_active:
+                    raise ValidationError('Usuario inactivo')
+                add_user_claims(access_token, user)
+            new_access_token = str(access_token)
 
             response = Response({'access_token': new_access_token}, status=status.HTTP_200_OK)
             response.set_cookie(
@@ -257,7 +248,7 @@ class LogoutView(APIView):
         response.delete_cookie('access_token')
         if refresh_token:
             try:
-                RefreshToken(refresh_token).blacklist()
+                FilteredRefreshToken(refresh_token).blacklist()
             except Exception:
                 pass
         return response
@@ -1,45 +1,45 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import io
-import base64
+from django.http import HttpResponse
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
+from ..charts import CHART_FORMATS, CHART_RENDER_TIMEOUT, ChartDataError, ChartTimeoutError, get_chart
 
 @api_view(['POST'])
 def generar_grafica(request):
     """
-    Generates a line plot from the provided data and returns it as a base64-encoded PNG image.
+    Generates a line plot from the provided data and returns the image itself.
 
     Expects a POST request with JSON data containing a 'data' key, which should hold a
     list of lists or a list of dictionaries representing the data to plot. The data should
-    have at least two columns to generate a meaningful line plot.
+    have at least two columns to generate a meaningful line plot. An optional 'format'
+    key selects 'png' (default) or 'svg'.
+
+    Rendered images are cached by a hash of the input data, and can be rendered in a
+    process pool (see CHART_RENDER_PROCESSES) so matplotlib runs outside of the request
+    workers; the request still waits for the image.
 
     Returns:
-        Response: A JSON response with a base64-encoded PNG image of the plot or an error
-        message if the data is insufficient or an exception occurs during processing.
+        HttpResponse: The raw image/png or image/svg+xml bytes of the plot, or a JSON
+        error response if the data is insufficient, the render pool does not answer in
+        time (503) or an exception occurs during processing.
     """
     try:
         data = request.data.get('data')
         if not data:
             return Response({"error": "No se proporcionaron datos"}, status=400)
 
-        df = pd.DataFrame(data)
-        if df.empty or df.shape[1] < 2:
-            return Response({"error": "Datos insuficientes"}, status=400)
+        image_format = request.data.get('format', 'png')
+        if image_format not in CHART_FORMATS:
+            return Response({"error": "Formato no soportado"}, status=400)
 
-        plt.figure(figsize=(8, 6))
-        sns.lineplot(data=df)
-        plt.title("Gráfico Generado")
+        image = get_chart(data, image_format)
+        return HttpResponse(image, content_type=CHART_FORMATS[image_format])
 
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format="png")
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
+    except ChartDataError as e:
+        return Response({"error": str(e)}, status=400)
 
-        return Response({"image": f"data:image/png;base64,{image_base64}"})
+    except ChartTimeoutError as e:
+        return Response({"error": str(e)}, status=503, headers={"Retry-After": str(CHART_RENDER_TIMEOUT)})
 
     except Exception as e:
         return Response({"error": str(e)}, status=500)
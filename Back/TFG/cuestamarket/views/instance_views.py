@@ -1,103 +1,128 @@
+import os
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from ..models import Survey, SurveyInstance, Participation, Question, Answer, Option, AnswerOption, User
-from ..serializers import SurveySerializer, SurveyInstanceSerializer, SurveyInstanceDetailSerializer, QuestionDetailSerializer, QuestionSerializer, ParticipationSerializer
+from ..models import Survey, SurveyInstance, Participation, Question, Answer, Option, AnswerOption, User, Report
+from ..serializers import SurveySerializer, SurveyInstanceSerializer, SurveyInstanceListSerializer, SurveyInstanceDetailSerializer, QuestionDetailSerializer, QuestionSerializer, ParticipationSerializer, ReportSerializer, ReportJobSerializer
 from django.db import transaction
 from django.utils import timezone
 from .auth_views import IsClient
+from ..authentication import TokenUserAuthentication
+from ..stats import instance_statistics, tallied_participation_counts
+from ..tallies import answer_deltas, record_answers, record_answers_change, record_state_change
+from ..conditional import instance_results_etag, not_modified, with_etag
+from ..reports import enqueue_report
+from ..submissions import get_or_create_participation, load_question_map, parse_answers, save_answers
+from ..snapshots import build_snapshot
+from ..renderers import JSONLinesRenderer, PDFRenderer
+from ..survey_transfer import JSONL_CONTENT_TYPE, iter_jsonl, iter_survey_records
+from ..crosstabs import CrosstabError, get_result_cube, parse_crosstab_query
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.settings import api_settings
 
 class SurveyInstanceViewSet(viewsets.ModelViewSet):
     serializer_class = SurveyInstanceSerializer
     permission_classes = [IsAuthenticated]
     
+    # Acciones que serializan instancias y necesitan sus contadores precalculados
+    eager_loading_actions = ['list', 'retrieve', 'by_survey', 'public_open_instances']
+
     def get_queryset(self):
         user = self.request.user
         if user.role.name == 'admin' or user.is_staff:
-            return SurveyInstance.objects.all()
+            queryset = SurveyInstance.objects.all()
         else:
-            return SurveyInstance.objects.filter(survey__client=self.request.user)
+            queryset = SurveyInstance.objects.filter(survey__client_id=user.pk)
+        return self.with_eager_loading(queryset)
+    
+    def with_eager_loading(self, queryset):
+        if self.action in self.eager_loading_actions:
+            return self.get_serializer_class().setup_eager_loading(queryset)
+        return queryset
     
     def get_serializer_class(self):
         if self.action in ['retrieve', 'update', 'partial_update']:
             return SurveyInstanceDetailSerializer
+        if self.action in ['list', 'by_survey', 'public_open_instances']:
+            return SurveyInstanceListSerializer
         return SurveyInstanceSerializer
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], authentication_classes=[TokenUserAuthentication])
     def statistics(self, request, pk=None):
         """Obtener estadísticas avanzadas de la instancia incluyendo respuestas por opción"""
         instance = self.get_object()
+        etag = instance_results_etag(instance, 'statistics')
+        return not_modified(request, etag) or with_etag(Response(instance_statistics(instance)), etag)
+    
+    @action(detail=True, methods=['get'], authentication_classes=[TokenUserAuthentication])
+    def crosstab(self, request, pk=None):
+        """
+        Tabla cruzada de las opciones elegidas en dos o tres preguntas
+        (?questions=3,7[,9]), filtrable por otras respuestas
+        (&filter=<pregunta>:<opción>,<opción>) y por estado (&state=completed)
+        """
+        instance = self.get_object()
+        etag = instance_results_etag(instance, 'crosstab', request.query_params.urlencode())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
         
-        total_participations = instance.participations.count()
-        completed_participations = instance.participations.filter(state='completed').count()
-        in_progress_participations = instance.participations.filter(state='in_progress').count()
-        
-        completion_rate = 0
-        if total_participations > 0:
-            completion_rate = (completed_participations / total_participations) * 100
+        try:
+            data = get_result_cube(instance).crosstab(**parse_crosstab_query(request.query_params))
+        except CrosstabError as e:
+            return Response({
+                'error': 'Invalid crosstab',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return with_etag(Response(data), etag)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def report(self, request, pk=None):
+        """Solicitar (POST) o consultar (GET) la generación del informe PDF de la instancia"""
+        instance = self.get_object()
         
-        questions_stats = []
-        for question in instance.survey.questions.all():
-            answers_count = Answer.objects.filter(
-                participation__instance=instance,
-                question=question
-            ).count()
-            
-            question_stat = {
-                'question_id': question.id,
-                'question_content': question.content,
-                'question_type': question.type,
-                'answers_count': answers_count,
-                'options_stats': []
-            }
-            
-            # Estadísticas por opción para preguntas de opción múltiple
-            if question.type in ['single_choice', 'multiple_choice']:
-                for option in question.options.all():
-                    # Contar cuántas veces se seleccionó esta opción
-                    option_selections = AnswerOption.objects.filter(
-                        answer__participation__instance=instance,
-                        option=option
-                    ).count()
-                    
-                    # Calcular porcentaje
-                    percentage = 0
-                    if completed_participations > 0:
-                        percentage = (option_selections / completed_participations) * 100
-                    
-                    question_stat['options_stats'].append({
-                        'option_id': option.id,
-                        'option_content': option.content,
-                        'selections_count': option_selections,
-                        'percentage': round(percentage, 2)
-                    })
-            
-            # Para preguntas abiertas, mostrar una muestra de respuestas
-            elif question.type == 'open':
-                sample_answers = Answer.objects.filter(
-                    participation__instance=instance,
-                    question=question,
-                    content__isnull=False
-                ).exclude(content='').values_list('content', flat=True)[:5]
-                
-                question_stat['sample_answers'] = list(sample_answers)
-            
-            questions_stats.append(question_stat)
+        if request.method == 'POST':
+            job, created = enqueue_report(instance, request.user)
+            response_status = status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        else:
+            job = instance.report_jobs.order_by('-id').first()
+            response_status = status.HTTP_200_OK
         
+        report = Report.objects.filter(instance=instance).first()
         return Response({
-            'total_participations': total_participations,
-            'completed_participations': completed_participations,
-            'in_progress_participations': in_progress_participations,
-            'completion_rate': round(completion_rate, 2),
-            'creation_date': instance.creation_date,
-            'closure_date': instance.closure_date,
-            'state': instance.state,
-            'questions_statistics': questions_stats
-        })
+            'job': ReportJobSerializer(job).data if job else None,
+            'report': ReportSerializer(report, context={'request': request}).data if report else None
+        }, status=response_status)
     
+    @action(detail=True, methods=['get'], url_path='report/pdf',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, PDFRenderer])
+    def report_pdf(self, request, pk=None):
+        """Descargar el PDF del informe de la instancia (solo su cliente o un administrador)"""
+        instance = self.get_object()
+        report = Report.objects.filter(instance=instance).first()
+        path = os.path.join(settings.MEDIA_ROOT, report.pdf_route) if report else None
+        if path is None or not os.path.isfile(path):
+            return Response({
+                'error': 'Report not found',
+                'message': 'The report of this instance has not been generated yet'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'informe_{instance.id}.pdf')
+    
+    @action(detail=True, methods=['get'], url_path='export',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, JSONLinesRenderer])
+    def export_jsonl(self, request, pk=None):
+        """Exportar la encuesta y esta instancia con sus respuestas en JSON Lines"""
+        instance = self.get_object()
+        records = iter_survey_records(instance.survey, [instance])
+        response = StreamingHttpResponse(iter_jsonl(records), content_type=JSONL_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="instancia_{instance.id}.jsonl"'
+        return response
+
     @action(detail=True, methods=['get'])
     def public_url(self, request, pk=None):
         """Obtener URL pública de la encuesta"""
@@ -116,12 +141,13 @@ class SurveyInstanceViewSet(viewsets.ModelViewSet):
     def public_open_instances(self, request):
         """Endpoint público: listar instancias de encuesta abiertas"""
         now = timezone.now()
-        open_instances = SurveyInstance.objects.filter(
+        open_instances = self.with_eager_loading(SurveyInstance.objects.filter(
             closure_date__isnull=False,
             closure_date__gt=now
-        )
-        serializer = self.get_serializer(open_instances, many=True)
-        return Response(serializer.data)
+        ))
+        page = self.paginate_queryset(open_instances)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='by-survey/(?P<survey_id>[^/.]+)')
     def by_survey(self, request, survey_id=None):
@@ -130,8 +156,9 @@ class SurveyInstanceViewSet(viewsets.ModelViewSet):
             instances = SurveyInstance.objects.filter(survey_id=survey_id)
         else:
             instances = SurveyInstance.objects.filter(survey__client=user, survey_id=survey_id)
-        serializer = self.get_serializer(instances, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(self.with_eager_loading(instances))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class SurveySubmissionAPIView(APIView):
     """API para enviar respuestas de encuesta con manejo completo de AnswerOption"""
@@ -169,20 +196,34 @@ class SurveySubmissionAPIView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             with transaction.atomic():
-                # Crear participación
-                participation = Participation.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    instance=instance,
-                    state='in_progress'
-                )
+                # Crear participación o reutilizar la que el usuario dejó en curso
+                if request.user.is_authenticated:
+                    participation, created = get_or_create_participation(request.user, instance)
+                else:
+                    participation = Participation.objects.create(
+                        user=None,
+                        instance=instance,
+                        state='in_progress'
+                    )
+                    created = True
+
+                if created:
+                    record_state_change(instance.id, None, participation.state)
+                else:
+                    # El envío completo sustituye a las respuestas parciales previas
+                    previous_answers = participation.answers.all()
+                    record_answers(instance.id, *answer_deltas(previous_answers), sign=-1)
+                    previous_answers.delete()
                 
-                # Procesar respuestas
+                # Procesar respuestas (una por pregunta)
+                answered_questions = set()
                 for answer_data in answers:
                     question_id = answer_data.get('question_id')
                     question = instance.survey.questions.filter(id=question_id).first()
                     
-                    if not question:
+                    if not question or question.id in answered_questions:
                         continue
+                    answered_questions.add(question.id)
                     
                     # Crear la respuesta base
                     answer = Answer.objects.create(
@@ -217,9 +258,14 @@ class SurveySubmissionAPIView(APIView):
                             answer.content = text_content
                             answer.save()
                 
-                # Marcar como completada
+                # Marcar como completada y guardar la instantánea de sus respuestas
+                record_state_change(instance.id, participation.state, 'completed')
                 participation.state = 'completed'
+                participation.snapshot = build_snapshot(participation)
                 participation.save()
+
+                # Actualizar los contadores de resultados
+                record_answers(instance.id, *answer_deltas(participation.answers.all()))
             
             return Response({
                 'success': True,
@@ -304,13 +350,10 @@ def submit_survey(request, instance_id):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
-            # Participación autenticada o anónima
+            # Participación autenticada (única por usuario e instancia, también
+            # ante envíos concurrentes) o anónima
             if request.user.is_authenticated:
-                participation, created = Participation.objects.get_or_create(
-                    user=request.user,
-                    instance=instance,
-                    defaults={'state': 'in_progress'}
-                )
+                participation, created = get_or_create_participation(request.user, instance)
 
                 if participation.state == 'completed':
                     return Response({
@@ -323,57 +366,26 @@ def submit_survey(request, instance_id):
                     instance=instance,
                     state='in_progress'
                 )
+                created = True
 
-            # Procesar respuestas
-            for answer_data in answers_data:
-                question_id = answer_data.get('question_id')
-                if not question_id:
-                    continue
-
-                try:
-                    question = Question.objects.get(id=question_id, survey=instance.survey)
-                except Question.DoesNotExist:
-                    continue
-
-                # Eliminar respuestas anteriores de esa pregunta para esta participación
-                Answer.objects.filter(participation=participation, question=question).delete()
-
-                answer = Answer.objects.create(
-                    participation=participation,
-                    question=question
-                )
-
-                if question.type == 'single':
-                    option_id = answer_data.get('option_id') or answer_data.get('selectedOption')
-                    if option_id:
-                        try:
-                            option = Option.objects.get(id=option_id, question=question)
-                            answer.option = option
-                            answer.save()
-                        except Option.DoesNotExist:
-                            continue
-
-                elif question.type == 'multiple':
-                    option_ids = answer_data.get('option_ids') or answer_data.get('selectedOptions') or []
-                    if isinstance(option_ids, list):
-                        for option_id in option_ids:
-                            try:
-                                option = Option.objects.get(id=option_id, question=question)
-                                AnswerOption.objects.create(answer=answer, option=option)
-                            except Option.DoesNotExist:
-                                continue
+            if created:
+                record_state_change(instance.id, None, participation.state)
 
-                elif question.type in ['open', 'text', 'textarea']:
-                    content = answer_data.get('content', '').strip()
-                    if content:
-                        answer.content = content
-                        answer.save()
+            # Validar y guardar todas las respuestas en bloque
+            entries = parse_answers(load_question_map(instance.survey), answers_data)
+            answers_before, answers_after = save_answers(participation, entries, replace=not created)
 
             # Finalizar encuesta si se marcó como completa
             if complete:
+                record_state_change(instance.id, participation.state, 'completed')
                 participation.state = 'completed'
+                # Una participación completada ya no cambia: se guarda la instantánea de sus respuestas
+                participation.snapshot = build_snapshot(participation)
                 participation.save()
 
+            # Actualizar los contadores de resultados
+            record_answers_change(instance.id, answers_before, answers_after)
+
         return Response({
             'success': True,
             'message': 'Respuestas guardadas correctamente.',
@@ -390,21 +402,32 @@ def submit_survey(request, instance_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@authentication_classes([TokenUserAuthentication])
 @permission_classes([AllowAny])
-def survey_stats(request, instance_id):
+def survey_stats(request, instance_id, survey_id=None):
     """Obtener estadísticas básicas de la encuesta"""
     try:
-        instance = get_object_or_404(SurveyInstance, id=instance_id)
+        instances = SurveyInstance.objects.select_related('survey')
+        if survey_id is not None:
+            instances = instances.filter(survey_id=survey_id)
+        instance = get_object_or_404(instances, id=instance_id)
+
+        etag = instance_results_etag(instance, 'survey_stats')
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        participation_counts = tallied_participation_counts(instance)
         
         stats = {
-            'total_participations': instance.participations.count(),
-            'completed_participations': instance.participations.filter(state='completed').count(),
+            'total_participations': sum(participation_counts.values()),
+            'completed_participations': participation_counts.get('completed', 0),
             'creation_date': instance.creation_date,
             'is_active': instance.state == 'open',
             'total_questions': instance.survey.questions.count()
         }
         
-        return Response(stats, status=status.HTTP_200_OK)
+        return with_etag(Response(stats, status=status.HTTP_200_OK), etag)
         
     except Exception as e:
         return Response({
@@ -2,13 +2,27 @@ from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from ..models import Survey, SurveyInstance, Participation, Question, Answer, Option, AnswerOption, User
 from ..serializers import SurveySerializer, SurveyInstanceSerializer, SurveyInstanceDetailSerializer, QuestionDetailSerializer, QuestionSerializer, ParticipationSerializer
 from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from rest_framework.settings import api_settings
 from .auth_views import IsClient
+from ..authentication import TokenUserAuthentication
+from ..exports import EXPORT_STATES, export_headers, iter_export_rows, stream_csv, stream_xlsx
+from ..renderers import CSVRenderer, JSONLinesRenderer, XLSXRenderer
+from ..parsers import JSONLinesParser
+from ..survey_transfer import JSONL_CONTENT_TYPE, SurveyImportError, import_survey, iter_jsonl, iter_survey_records
+from ..survey_cache import get_survey_definition
+from ..conditional import make_etag, not_modified, with_etag
+from ..pagination import KeysetPagination
+from ..survey_writes import copy_questions, create_questions
 
 class SurveyViewSet(viewsets.ModelViewSet):
     """
@@ -17,7 +31,7 @@ class SurveyViewSet(viewsets.ModelViewSet):
     When editing a survey that already has instances, it creates a new survey
     instead of modifying the original to preserve data integrity.
     """
-    queryset = Survey.objects.all()
+    queryset = Survey.objects.prefetch_related('questions__options')
     serializer_class = SurveySerializer
     permission_classes = [IsAuthenticated, IsClient]
 
@@ -65,13 +79,10 @@ class SurveyViewSet(viewsets.ModelViewSet):
             new_survey = Survey.objects.create(**validated_data)
 
             if questions_data:
-                for question in questions_data:
-                    options_data = question.pop('options', []) if 'options' in question else []
-                    new_question = Question.objects.create(survey=new_survey, **question)
-                    for option in options_data:
-                        Option.objects.create(question=new_question, **option)
+                create_questions(new_survey, questions_data)
             else:
-                self._copy_questions_and_options(original_survey, new_survey)
+                copy_questions(original_survey, new_survey)
+        prefetch_related_objects([new_survey], 'questions__options')
 
         response_serializer = self.get_serializer(new_survey)
 
@@ -82,26 +93,6 @@ class SurveyViewSet(viewsets.ModelViewSet):
             'instances_count': original_survey.instances.count()
         }, status=status.HTTP_201_CREATED)
 
-    def _copy_questions_and_options(self, source_survey, target_survey):
-        """
-        Copy questions and their options from source survey to target survey.
-        """
-        for question in source_survey.questions.all():
-            new_question = Question.objects.create(
-                survey=target_survey,
-                content=question.content,
-                type=question.type,
-                order=question.order,
-                is_required=getattr(question, 'is_required', False)
-            )
-            
-            for option in question.options.all():
-                Option.objects.create(
-                    question=new_question,
-                    content=option.content,
-                    order=getattr(option, 'order', option.id)
-                )
-
     @action(detail=True, methods=['get'])
     def can_edit_directly(self, request, pk=None):
         """
@@ -118,6 +109,51 @@ class SurveyViewSet(viewsets.ModelViewSet):
                       else 'Survey has instances. Editing will create a new survey.'
         })
 
+    @action(detail=True, methods=['get'], url_path='export',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, JSONLinesRenderer])
+    def export_jsonl(self, request, pk=None):
+        """
+        Export the survey definition as JSON Lines.
+
+        With ``?responses=true`` every instance is exported with its
+        participations and answers.
+        """
+        survey = self.get_object()
+        instances = survey.instances.order_by('id') if request.query_params.get('responses') == 'true' else []
+        response = StreamingHttpResponse(iter_jsonl(iter_survey_records(survey, instances)), content_type=JSONL_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="encuesta_{survey.id}.jsonl"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[JSONLinesParser, MultiPartParser])
+    def import_jsonl(self, request):
+        """
+        Import a survey exported with ``export`` as a new survey of the user.
+
+        The file is sent as the request body (``application/x-ndjson``) or as
+        the ``file`` field of a multipart form. Participants are imported as
+        placeholder users of the import, never as existing accounts.
+        """
+        lines = request.FILES.get('file') or request.data
+        if not hasattr(lines, 'read'):
+            return Response({
+                'error': 'Missing file',
+                'message': 'Envía el fichero JSON Lines en el cuerpo de la petición o en el campo "file".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            importer = import_survey(lines, request.user)
+        except SurveyImportError as e:
+            return Response({
+                'error': 'Invalid survey file',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'survey_id': importer.survey.id,
+            'instance_ids': [instance.id for instance in importer.instances],
+            **importer.totals
+        }, status=status.HTTP_201_CREATED)
+
 
 class SurveyConfigurationViewSet(viewsets.ViewSet):
 
@@ -146,106 +182,60 @@ class SurveyConfigurationViewSet(viewsets.ViewSet):
     def list_participations(self, request, instance_id=None):
         """Listar participaciones de la instancia"""
         instance = self.get_survey_instance(instance_id)
-        participations = instance.participations.all().order_by('-date')
-        
-        # Paginación
-        page_size = int(request.GET.get('page_size', 20))
-        page = int(request.GET.get('page', 1))
-        start = (page - 1) * page_size
-        end = start + page_size
-        
-        paginated_participations = participations[start:end]
-        serializer = ParticipationSerializer(paginated_participations, many=True)
+        participations = instance.participations.select_related('user__role').defer('snapshot').annotate(answers_total=Count('answers'))
         
-        return Response({
-            'results': serializer.data,
-            'total': participations.count(),
-            'page': page,
-            'page_size': page_size,
-            'has_next': end < participations.count()
-        }) 
-    @action(detail=False, methods=['get'], url_path='(?P<instance_id>[^/.]+)/export-data')
+        # Paginación por cursor: de la más reciente a la más antigua (el id sigue el orden de fecha)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(participations, request, view=self)
+        serializer = ParticipationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='(?P<instance_id>[^/.]+)/export-data',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, XLSXRenderer])
     def export_data(self, request, instance_id=None):
         """Exportar datos de respuestas con soporte completo para preguntas múltiples"""
         instance = self.get_survey_instance(instance_id)
-        
-        export_data = []
-        participations = instance.participations.filter(
-        state__in=['in_progress', 'completed']
-        ).order_by('-date')
+        questions = list(instance.survey.questions.all())
 
-        
-        for participation in participations:
-            row = {
-                'usuario': participation.user.username if participation.user else 'Anónimo',
-                'fecha_participacion': participation.date.strftime('%Y-%m-%d %H:%M:%S'),
-                'estado': participation.state
-            }
-            
-            for question in instance.survey.questions.all():
-                answer = Answer.objects.filter(
-                    participation=participation,
-                    question=question
-                ).first()
-                
-                column_name = f'{question.content}'  
-                
-                if answer:
-                    if question.type == 'multiple':
-                        # Manejar preguntas de opción múltiple
-                        selected_options = answer.selected_options.all()
-                        if selected_options.exists():
-                            # Concatenar todas las opciones separadas por punto y coma
-                            options_text = '; '.join([opt.option.content for opt in selected_options])
-                            row[column_name] = options_text
-                            
-                        else:
-                            row[column_name] = 'Sin opciones seleccionadas'
-                            
-                    elif question.type == 'single':
-                        # Manejar preguntas de opción única
-                        if answer.option:
-                            row[column_name] = answer.option.content
-                        else:
-                            row[column_name] = 'Sin opción seleccionada'
-                            
-                    elif question.type in ['open', 'text', 'textarea']:
-                        # Manejar preguntas de texto libre
-                        if answer.content:
-                            row[column_name] = answer.content
-                        else:
-                            row[column_name] = 'Sin respuesta de texto'
-                            
-                    else:
-                        # Tipo de pregunta no reconocido
-                        row[column_name] = f'Tipo no soportado: {question.type}'
-                else:
-                    # No hay respuesta para esta pregunta
-                    row[column_name] = 'Sin respuesta'
-            
-            export_data.append(row)
+        # Exportación en streaming (?format=csv o ?format=xlsx)
+        export_format = request.query_params.get('format')
+        if export_format in ['csv', 'xlsx']:
+            if export_format == 'csv':
+                response = StreamingHttpResponse(stream_csv(instance, questions), content_type='text/csv; charset=utf-8')
+            else:
+                response = StreamingHttpResponse(stream_xlsx(instance, questions), content_type=XLSXRenderer.media_type)
+            response['Content-Disposition'] = f'attachment; filename="encuesta_{instance.id}.{export_format}"'
+            return response
+
+        headers = export_headers(questions)
+        export_data = [dict(zip(headers, row)) for row in iter_export_rows(instance, questions)]
         
         # Obtener estadísticas adicionales para el reporte
         stats = {
-            'total_questions': instance.survey.questions.count(),
+            'total_questions': len(questions),
             'questions_by_type': {},
             'completion_rate': {}
         }
         
         # Calcular estadísticas por tipo de pregunta
         for question_type in ['single', 'multiple', 'open', 'text', 'textarea']:
-            count = instance.survey.questions.filter(type=question_type).count()
+            count = len([question for question in questions if question.type == question_type])
             if count > 0:
                 stats['questions_by_type'][question_type] = count
         
         # Calcular tasa de finalización por pregunta
-        total_participations = participations.count()
+        participations = instance.participations.filter(state__in=EXPORT_STATES)
+        total_participations = len(export_data)
         if total_participations > 0:
-            for question in instance.survey.questions.all():
-                answered_count = Answer.objects.filter(
-                    participation__in=participations,
-                    question=question
-                ).count()
+            answered_counts = dict(
+                Answer.objects.filter(participation__in=participations)
+                .order_by()
+                .values('question_id')
+                .annotate(total=Count('id'))
+                .values_list('question_id', 'total')
+            )
+            for question in questions:
+                answered_count = answered_counts.get(question.id, 0)
                 completion_percentage = round((answered_count / total_participations) * 100, 2)
                 stats['completion_rate'][f'{question.content}'] = completion_percentage
         
@@ -281,11 +271,13 @@ class SurveyConfigurationViewSet(viewsets.ViewSet):
 
 class SurveyPublicAPIView(APIView):
     """API para obtener encuesta pública"""
+    # Solo lectura: basta con el usuario de los claims del token
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = []
     
     def get(self, request, instance_id):
         try:
-            instance = get_object_or_404(SurveyInstance, id=instance_id)
+            instance = get_object_or_404(SurveyInstance.objects.select_related('survey'), id=instance_id)
             
             if instance.state != 'open':
                 return Response({
@@ -294,8 +286,6 @@ class SurveyPublicAPIView(APIView):
                     'state': instance.state
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            questions = instance.survey.questions.all()
-            
             # Verificar participación del usuario
             user_participation = None
             can_participate = True
@@ -303,33 +293,24 @@ class SurveyPublicAPIView(APIView):
             if request.user.is_authenticated:
                 try:
                     user_participation = Participation.objects.get(
-                        user=request.user,
+                        user_id=request.user.pk,
                         instance=instance
                     )
                     can_participate = user_participation.state != 'completed'
                 except Participation.DoesNotExist:
                     pass
             
-            questions_data = []
-            for question in questions:
-                question_data = {
-                    'id': question.id,
-                    'content': question.content,
-                    'type': question.type,
-                    'order': question.order
-                }
-                
-                if question.type in ['single', 'multiple']:
-                    question_data['options'] = [
-                        {
-                            'id': option.id,
-                            'content': option.content,
-                           
-                        }
-                        for option in question.options.all().order_by('id')  
-                    ]
-                
-                questions_data.append(question_data)
+            etag = make_etag(
+                instance.id, instance.survey.version, instance.state, instance.closure_date,
+                request.user.pk, user_participation.id if user_participation else None,
+                user_participation.state if user_participation else None
+            )
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+            
+            # Definición de la encuesta (cacheada por instancia y versión)
+            questions_data = get_survey_definition(instance)
             
             response_data = {
                 'instance': {
@@ -349,7 +330,7 @@ class SurveyPublicAPIView(APIView):
                 }
             }
             
-            return Response(response_data, status=status.HTTP_200_OK)
+            return with_etag(Response(response_data, status=status.HTTP_200_OK), etag)
             
         except Exception as e:
             return Response({
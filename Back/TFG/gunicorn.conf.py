@@ -0,0 +1,8 @@
+# Configuración de gunicorn (la lee el ENTRYPOINT del Dockerfile).
+# Los mismos valores determinan el tamaño del pool de conexiones a la base de
+# datos en settings.py (DB_POOL_SIZE = workers * threads).
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
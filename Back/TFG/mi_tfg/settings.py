@@ -119,7 +119,54 @@ else:
 
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Conexiones a la base de datos
+# Cada hilo de cada worker de gunicorn mantiene una conexión persistente, así
+# que el tamaño del pool es workers * hilos (ver gunicorn.conf.py).
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 3))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+DB_POOL_SIZE = GUNICORN_WORKERS * GUNICORN_THREADS
+# max_connections de MariaDB (151 por defecto)
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 151))
+
+# Caché
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# CACHE_BACKEND puede ser 'locmem' (memoria local de cada proceso) o 'file'
+# (directorio compartido por todos los workers de gunicorn).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cuestamarket',
+        }
+    }
+else:
+    raise ValueError(f"Unknown cache backend: {CACHE_BACKEND}")
+
+# Email
+# Los correos se guardan en la bandeja de salida (OutgoingEmail) y los envía
+# el worker "python manage.py run_mail_worker" por lotes.
+# MAIL_BACKEND puede ser 'smtp', 'console' (imprime los correos) o 'file'
+# (los guarda en MAIL_FILE_PATH), útiles para pruebas locales.
+MAIL_BACKEND = os.getenv('MAIL_BACKEND', 'smtp')
+if MAIL_BACKEND == 'smtp':
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+elif MAIL_BACKEND == 'console':
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+elif MAIL_BACKEND == 'file':
+    EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+    EMAIL_FILE_PATH = os.getenv('MAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+else:
+    raise ValueError(f"Unknown mail backend: {MAIL_BACKEND}")
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+EMAIL_TIMEOUT = 30
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -177,8 +224,25 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'cuestamarket.authentication.CookieJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'cuestamarket.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
 }
 
+# Tamaño máximo de página que un cliente puede pedir con ?page_size=
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 200))
+
+# Autenticación
+# Segundos que cada proceso reutiliza un usuario autenticado sin consultarlo
+# de nuevo (0 desactiva la caché). Los cambios de rol o desactivaciones hechos
+# en otro worker tardan como máximo este tiempo en aplicarse.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+# Incluir el rol y los indicadores is_active/is_staff como claims del JWT
+AUTH_TOKEN_CLAIMS = os.getenv('AUTH_TOKEN_CLAIMS', 'true').lower() == 'true'
+# Segundos entre sincronizaciones del filtro local de la lista negra de refresh
+# tokens. Un token invalidado en otro worker se acepta como máximo este tiempo.
+# 0 desactiva el filtro y consulta la base de datos en cada comprobación.
+TOKEN_BLACKLIST_SYNC_INTERVAL = float(os.getenv('TOKEN_BLACKLIST_SYNC_INTERVAL', 2))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -192,6 +256,14 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Informes en segundo plano (python manage.py run_report_worker)
+# REPORT_MAX_RUNNING limita los informes que se generan a la vez entre todos los workers.
+REPORT_MAX_RUNNING = int(os.getenv('REPORT_MAX_RUNNING', 1))
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', 600))
+
+# Procesos dedicados a dibujar gráficas (0 = dibujar en el propio worker)
+CHART_RENDER_PROCESSES = int(os.getenv('CHART_RENDER_PROCESSES', 0))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
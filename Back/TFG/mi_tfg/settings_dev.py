@@ -6,7 +6,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'cuestamarket.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3'
     }
 }
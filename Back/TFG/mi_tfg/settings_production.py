@@ -5,11 +5,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'cuestamarket.backends.mysql',
         'NAME': os.getenv('MARIADB_DATABASE'),
         'USER': os.getenv('MARIADB_USER'),
         'PASSWORD': os.getenv('MARIADB_PASSWORD'),
         'HOST': os.getenv('MARIADB_HOST'),
-        'PORT': os.getenv('MARIADB_PORT')
+        'PORT': os.getenv('MARIADB_PORT'),
+        # Conexiones persistentes: cada hilo de gunicorn reutiliza la suya
+        # entre peticiones y se comprueba que siga viva antes de usarla.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
-}
\ No newline at end of file
+}
@@ -32,16 +32,23 @@ const SurveyConfiguration = () => {
     }
   }, [instanceId]);
 
-  const [page, setPage] = useState(1);
+  // Paginación por cursor: null es la primera página
+  const [cursor, setCursor] = useState(null);
   const pageSize = 20;
   const { pagination } = useSelector((state) => state.participations);
-  const total = pagination.total;
+  const total = pagination.count;
+
+  const participationParams = () => ({
+    page_size: pageSize,
+    count: true,
+    ...(cursor && { cursor }),
+  });
 
   useEffect(() => {
     if (instanceId) {
-      loadParticipations(instanceId, { page, page_size: pageSize });
+      loadParticipations(instanceId, participationParams());
     }
-  }, [instanceId, page]);
+  }, [instanceId, cursor]);
 
   const participations = useSelector((state) => state.participations.items);
 
@@ -52,10 +59,7 @@ const SurveyConfiguration = () => {
   const confirmDeleteParticipation = () => {
     if (participationToDelete) {
       removeParticipation(instanceId, participationToDelete).then(() =>
-        loadParticipations(instanceId, {
-          page,
-          page_size: pageSize,
-        })
+        loadParticipations(instanceId, participationParams())
       );
       navigateWithFlash(
         `/encuesta/${surveyId}/configuracion/${instanceId}`,
@@ -157,22 +161,32 @@ const SurveyConfiguration = () => {
               </tbody>
             </table>
 
-            <nav>
-              <ul className="pagination">
-                {[...Array(Math.ceil(total / pageSize)).keys()].map((i) => (
-                  <li
-                    key={i}
-                    className={`page-item ${page === i + 1 ? "active" : ""}`}
+            <nav className="d-flex align-items-center gap-3">
+              <ul className="pagination mb-0">
+                <li
+                  className={`page-item ${pagination.previous ? "" : "disabled"}`}
+                >
+                  <button
+                    className="page-link"
+                    disabled={!pagination.previous}
+                    onClick={() => setCursor(pagination.previous)}
                   >
-                    <button
-                      className="page-link"
-                      onClick={() => setPage(i + 1)}
-                    >
-                      {i + 1}
-                    </button>
-                  </li>
-                ))}
+                    Anterior
+                  </button>
+                </li>
+                <li className={`page-item ${pagination.next ? "" : "disabled"}`}>
+                  <button
+                    className="page-link"
+                    disabled={!pagination.next}
+                    onClick={() => setCursor(pagination.next)}
+                  >
+                    Siguiente
+                  </button>
+                </li>
               </ul>
+              {total !== null && (
+                <span className="text-muted">{total} participaciones</span>
+              )}
             </nav>
           </>
         )}
@@ -59,7 +59,7 @@ const CHART_TYPES = [
 export const SurveyStats = () => {
   const { surveyId, instanceId } = useParams();
   const { loadInstanceById } = useInstance();
-  const { loadParticipations, loadExportData } = useParticipation();
+  const { loadAllParticipations, loadExportData } = useParticipation();
 
   const instance = useSelector((state) => state.instances.currentInstance);
   const questions = instance?.survey_questions || [];
@@ -88,7 +88,7 @@ export const SurveyStats = () => {
     if (instanceId) {
       loadInstanceById(instanceId);
       loadExportData(instanceId);
-      loadParticipations(instanceId, { page: 1, page_size: 1000 });
+      loadAllParticipations(instanceId);
     }
   }, [instanceId]);
 
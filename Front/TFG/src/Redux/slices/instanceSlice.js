@@ -1,12 +1,13 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { instanceService } from '../../services/instanceService';
+import { fetchAllPages } from '../../services/pagination';
 
 // Async Thunks
 export const fetchInstances = createAsyncThunk(
   'instances/fetchInstances',
   async (params = {}, { rejectWithValue }) => {
     try {
-      return await instanceService.getAll(params);
+      return await fetchAllPages((page) => instanceService.getAll({ ...params, ...page }));
     } catch (error) {
       return rejectWithValue(error.message);
     }
@@ -140,7 +141,7 @@ export const fetchInstancesBySurvey = createAsyncThunk(
   'instances/fetchInstancesBySurvey',
   async (surveyId, { rejectWithValue }) => {
     try {
-      return await instanceService.getBySurvey(surveyId);
+      return await fetchAllPages((page) => instanceService.getBySurvey(surveyId, page));
     } catch (error) {
       return rejectWithValue(error.message);
     }
@@ -151,7 +152,7 @@ export const fetchPublicInstances = createAsyncThunk(
   'instances/fetchPublicInstances',
   async (_, { rejectWithValue }) => {
     try {
-      return await instanceService.getPublicInstances();
+      return await fetchAllPages((page) => instanceService.getPublicInstances(page));
     } catch (error) {
       return rejectWithValue(error.message);
     }
@@ -182,10 +183,7 @@ const initialState = {
   error: null,
   operationLoading: false,
   pagination: {
-    page: 1,
-    pageSize: 10,
-    total: 0,
-    hasNext: false,
+    count: 0,
   },
 };
 
@@ -220,14 +218,8 @@ const instanceSlice = createSlice({
       })
       .addCase(fetchInstances.fulfilled, (state, action) => {
         state.loading = false;
-        state.items = action.payload.results || action.payload;
-        if (action.payload.total !== undefined) {
-          state.pagination = {
-            ...state.pagination,
-            total: action.payload.total,
-            hasNext: action.payload.has_next,
-          };
-        }
+        state.items = action.payload;
+        state.pagination.count = action.payload.length;
       })
       .addCase(fetchInstances.rejected, (state, action) => {
         state.loading = false;
@@ -1,6 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { participationService } from '../../services/participationService';
-
+import { cursorFrom, fetchAllPages } from '../../services/pagination';
 
 export const fetchParticipations = createAsyncThunk(
   'participations/fetchParticipations',
@@ -13,6 +13,20 @@ export const fetchParticipations = createAsyncThunk(
   }
 );
 
+// Recorre todas las páginas siguiendo el cursor next
+export const fetchAllParticipations = createAsyncThunk(
+  'participations/fetchAllParticipations',
+  async (instanceId, { rejectWithValue }) => {
+    try {
+      return await fetchAllPages((page) =>
+        participationService.getByInstance(instanceId, page)
+      );
+    } catch (error) {
+      return rejectWithValue(error.message);
+    }
+  }
+);
+
 export const fetchParticipationResults = createAsyncThunk(
   'participations/fetchParticipationResults',
   async (participationId, { rejectWithValue }) => {
@@ -54,10 +68,10 @@ const initialState = {
   loading: false,
   error: null,
   pagination: {
-    page: 1,
     pageSize: 20,
-    total: 0,
-    hasNext: false,
+    next: null,
+    previous: null,
+    count: null,
   },
 };
 
@@ -87,22 +101,40 @@ const participationSlice = createSlice({
       })
       .addCase(fetchParticipations.fulfilled, (state, action) => {
         state.loading = false;
-        state.items = action.payload.results || action.payload;
-        if (action.payload.total !== undefined) {
-          state.pagination = {
-            ...state.pagination,
-            total: action.payload.total,
-            page: action.payload.page,
-            pageSize: action.payload.page_size,
-            hasNext: action.payload.has_next,
-          };
-        }
+        state.items = action.payload.results;
+        state.pagination = {
+          ...state.pagination,
+          next: cursorFrom(action.payload.next),
+          previous: cursorFrom(action.payload.previous),
+          // count solo llega cuando se pide con ?count=true
+          count: action.payload.count ?? state.pagination.count,
+        };
       })
       .addCase(fetchParticipations.rejected, (state, action) => {
         state.loading = false;
         state.error = action.payload;
       })
       
+      // Fetch All Participations
+      .addCase(fetchAllParticipations.pending, (state) => {
+        state.loading = true;
+        state.error = null;
+      })
+      .addCase(fetchAllParticipations.fulfilled, (state, action) => {
+        state.loading = false;
+        state.items = action.payload;
+        state.pagination = {
+          ...state.pagination,
+          next: null,
+          previous: null,
+          count: action.payload.length,
+        };
+      })
+      .addCase(fetchAllParticipations.rejected, (state, action) => {
+        state.loading = false;
+        state.error = action.payload;
+      })
+
       // Fetch Participation Results
       .addCase(fetchParticipationResults.fulfilled, (state, action) => {
         
@@ -112,7 +144,9 @@ const participationSlice = createSlice({
       // Delete Participation
       .addCase(deleteParticipation.fulfilled, (state, action) => {
         state.items = state.items.filter(item => item.id !== action.payload);
-        state.pagination.total = Math.max(0, state.pagination.total - 1);
+        if (state.pagination.count !== null) {
+          state.pagination.count = Math.max(0, state.pagination.count - 1);
+        }
       })
       
       // Export Data
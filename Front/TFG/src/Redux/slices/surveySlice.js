@@ -1,12 +1,13 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { surveyService } from '../../services/surveyService';
+import { fetchAllPages } from '../../services/pagination';
 
 // Async Thunks
 export const fetchSurveys = createAsyncThunk(
   'surveys/fetchSurveys',
-  async (_, { rejectWithValue }) => {
+  async (params = {}, { rejectWithValue }) => {
     try {
-      return await surveyService.getAll();
+      return await fetchAllPages((page) => surveyService.getAll({ ...params, ...page }));
     } catch (error) {
       return rejectWithValue(error.message);
     }
@@ -64,10 +65,7 @@ const initialState = {
   loading: false,
   error: null,
   pagination: {
-    page: 1,
-    pageSize: 10,
-    total: 0,
-    hasNext: false,
+    count: 0,
   },
 };
 
@@ -94,11 +92,8 @@ const surveySlice = createSlice({
       })
       .addCase(fetchSurveys.fulfilled, (state, action) => {
         state.loading = false;
-        state.items = action.payload.results || action.payload;
-        if (action.payload.total !== undefined) {
-          state.pagination.total = action.payload.total;
-          state.pagination.hasNext = action.payload.has_next;
-        }
+        state.items = action.payload;
+        state.pagination.count = action.payload.length;
       })
       .addCase(fetchSurveys.rejected, (state, action) => {
         state.loading = false;
@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from "@reduxjs/toolkit";
 import { userService } from '../../services/userService';
+import { fetchAllPages } from '../../services/pagination';
 
 // Async Thunks
 export const initializeAuth = createAsyncThunk(
@@ -121,7 +122,7 @@ export const fetchUsers = createAsyncThunk(
   'user/fetchUsers',
   async (_, { rejectWithValue }) => {
     try {
-      return await userService.getAll();
+      return await fetchAllPages((page) => userService.getAll(page));
     } catch (error) {
       return rejectWithValue(error);
     }
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 
 
 /**
@@ -12,6 +12,12 @@ const ChartDemo = () => {
     const [error, setError] = useState(null);
     const API_URL = import.meta.env.VITE_API_URL;
 
+    // Libera la URL del gráfico anterior al sustituirlo y al desmontar el componente
+    useEffect(() => {
+        if (!chartImage) return undefined;
+        return () => URL.revokeObjectURL(chartImage);
+    }, [chartImage]);
+
     const generateChart = async () => {
         setLoading(true);
         setError(null);
@@ -31,14 +37,14 @@ const ChartDemo = () => {
                 }),
             });
 
-            const result = await response.json();
-
             if (response.ok) {
 
-                setChartImage(result.image);
+                const image = await response.blob();
+                setChartImage(URL.createObjectURL(image));
 
             } else {
                 
+                const result = await response.json();
                 setError(result.error || "Error desconocido");
             }
         } catch (error) {
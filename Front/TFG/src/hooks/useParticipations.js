@@ -1,6 +1,7 @@
 import { useDispatch, useSelector } from "react-redux";
 import {
   fetchParticipations,
+  fetchAllParticipations,
   fetchParticipationResults,
   deleteParticipation,
   exportParticipationData,
@@ -26,6 +27,10 @@ export const useParticipation = () => {
     return dispatch(fetchParticipations({ instanceId, params }));
   };
 
+  const loadAllParticipations = (instanceId) => {
+    return dispatch(fetchAllParticipations(instanceId));
+  };
+
   const loadParticipationResults = (participationId) => {
     
     return dispatch(fetchParticipationResults(participationId));
@@ -64,6 +69,7 @@ export const useParticipation = () => {
     pagination,
 
     loadParticipations,
+    loadAllParticipations,
     loadParticipationResults,
     removeParticipation,
     loadExportData,
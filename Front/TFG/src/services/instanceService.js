@@ -69,14 +69,22 @@ export const instanceService = {
     });
   },
 
-  async getBySurvey(surveyId) {
-    return await apiClient.get(`/survey-instances/by-survey/${surveyId}/`, {
+  async getBySurvey(surveyId, params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    const endpoint = queryString
+      ? `/survey-instances/by-survey/${surveyId}/?${queryString}`
+      : `/survey-instances/by-survey/${surveyId}/`;
+    return await apiClient.get(endpoint, {
       credentials: "include",
     });
   },
 
-  async getPublicInstances() {
-    return await apiClient.get("/survey-instances/public/open/");
+  async getPublicInstances(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    const endpoint = queryString
+      ? `/survey-instances/public/open/?${queryString}`
+      : "/survey-instances/public/open/";
+    return await apiClient.get(endpoint);
   },
 
   async getExportData(id) {
@@ -0,0 +1,23 @@
+// Página máxima que acepta la API (API_MAX_PAGE_SIZE)
+export const MAX_PAGE_SIZE = 200;
+
+// Extrae el cursor de las URLs next/previous de la paginación por cursor
+export const cursorFrom = (url) =>
+  url ? new URL(url, window.location.origin).searchParams.get("cursor") : null;
+
+// Recorre todas las páginas de un listado siguiendo el cursor next.
+// getPage recibe los parámetros de la página (page_size y cursor).
+export const fetchAllPages = async (getPage) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const data = await getPage({ page_size: MAX_PAGE_SIZE, ...(cursor && { cursor }) });
+    // Los listados sin paginar devuelven directamente la lista
+    if (!data.results) {
+      return data;
+    }
+    items.push(...data.results);
+    cursor = cursorFrom(data.next);
+  } while (cursor);
+  return items;
+};
@@ -83,8 +83,10 @@ export const userService = {
     
     return await apiClient.put('/users/my-profile', data);
   },
-  async getAll() {
-    return await apiClient.get('/admin/users/');
+  async getAll(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    const endpoint = queryString ? `/admin/users/?${queryString}` : '/admin/users/';
+    return await apiClient.get(endpoint);
   },
 async adminUpdate(id, data) {
   return await apiClient.put(`/admin/users/${id}/`, data);